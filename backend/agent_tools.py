@@ -13,28 +13,43 @@ from datetime import datetime
 import aiofiles
 import aiohttp
 from pathlib import Path
+from urllib.parse import urlparse
 import requests
 from bs4 import BeautifulSoup
 import base64
 from PIL import Image
 import io
+from http_pool import http_pool
+from crawl_cache import crawl_cache
+from html_extraction import extraction_engine, read_capped
+from search_cache import search_cache
 
 class AgentToolsManager:
     """Менеджер инструментов для агентов - предоставляет все возможности главного AI"""
     
+    # Используем DuckDuckGo для поиска (не требует API ключи)
+    search_url = "https://duckduckgo.com/html/"
+    
     def __init__(self, workspace_path: str = "/app"):
         self.workspace_path = workspace_path
         self.session = None
+        self._owns_session = False
     
     async def __aenter__(self):
         """Async context manager entry"""
-        self.session = aiohttp.ClientSession()
+        # Использовать общий пул соединений приложения, если он запущен
+        self.session = http_pool.session
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self._owns_session = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
+        self.session = None
+        self._owns_session = False
     
     # ============= ФАЙЛОВЫЕ ОПЕРАЦИИ =============
     
@@ -276,12 +291,32 @@ class AgentToolsManager:
     
     # ============= ВЕБ И AI ИНСТРУМЕНТЫ =============
     
-    async def web_search_tool(self, query: str, search_context_size: str = "medium") -> Dict[str, Any]:
-        """Поиск в интернете с помощью DuckDuckGo"""
+    @staticmethod
+    def _parse_search_results(html: str) -> List[Dict[str, str]]:
+        """Разбор HTML-страницы результатов DuckDuckGo"""
+        soup = BeautifulSoup(html, 'html.parser')
+        results = []
+        
+        for result in soup.find_all('div', class_='result')[:10]:  # Первые 10 результатов
+            title_elem = result.find('a', class_='result__a')
+            snippet_elem = result.find('a', class_='result__snippet')
+            
+            if title_elem:
+                title = title_elem.get_text(strip=True)
+                url = title_elem.get('href', '')
+                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
+                
+                results.append({
+                    "title": title,
+                    "url": url,
+                    "snippet": snippet
+                })
+        
+        return results
+    
+    async def _fetch_search_results(self, query: str) -> Dict[str, Any]:
+        """Запрос к DuckDuckGo без кэша"""
         try:
-            # Используем DuckDuckGo для поиска (не требует API ключи)
-            search_url = "https://duckduckgo.com/html/"
-            
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
@@ -292,64 +327,21 @@ class AgentToolsManager:
             }
             
             # Use the context manager's session if available, otherwise create a new one
-            if self.session:
-                async with self.session.get(search_url, params=params, headers=headers) as response:
+            session = self.session or aiohttp.ClientSession()
+            try:
+                async with session.get(self.search_url, params=params, headers=headers) as response:
                     html = await response.text()
-                    
-                    soup = BeautifulSoup(html, 'html.parser')
-                    results = []
-                    
-                    for result in soup.find_all('div', class_='result')[:10]:  # Первые 10 результатов
-                        title_elem = result.find('a', class_='result__a')
-                        snippet_elem = result.find('a', class_='result__snippet')
-                        
-                        if title_elem:
-                            title = title_elem.get_text(strip=True)
-                            url = title_elem.get('href', '')
-                            snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
-                            
-                            results.append({
-                                "title": title,
-                                "url": url,
-                                "snippet": snippet
-                            })
-                    
-                    return {
-                        "success": True,
-                        "query": query,
-                        "results": results,
-                        "total_found": len(results)
-                    }
-            else:
-                # Fallback to creating own session if context manager not used
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(search_url, params=params, headers=headers) as response:
-                        html = await response.text()
-                        
-                        soup = BeautifulSoup(html, 'html.parser')
-                        results = []
-                        
-                        for result in soup.find_all('div', class_='result')[:10]:  # Первые 10 результатов
-                            title_elem = result.find('a', class_='result__a')
-                            snippet_elem = result.find('a', class_='result__snippet')
-                            
-                            if title_elem:
-                                title = title_elem.get_text(strip=True)
-                                url = title_elem.get('href', '')
-                                snippet = snippet_elem.get_text(strip=True) if snippet_elem else ""
-                                
-                                results.append({
-                                    "title": title,
-                                    "url": url,
-                                    "snippet": snippet
-                                })
-                        
-                        return {
-                            "success": True,
-                            "query": query,
-                            "results": results,
-                            "total_found": len(results)
-                        }
+            finally:
+                if session is not self.session:
+                    await session.close()
+            
+            results = self._parse_search_results(html)
+            return {
+                "success": True,
+                "query": query,
+                "results": results,
+                "total_found": len(results)
+            }
                     
         except Exception as e:
             return {
@@ -358,110 +350,81 @@ class AgentToolsManager:
                 "error": str(e)
             }
     
+    async def web_search_tool(self, query: str, search_context_size: str = "medium") -> Dict[str, Any]:
+        """Поиск в интернете с помощью DuckDuckGo
+        
+        Результаты кэшируются по нормализованному запросу, а одинаковые
+        параллельные запросы объединяются в один запрос к поисковику.
+        """
+        result = await search_cache.get_or_fetch(
+            query, search_context_size, lambda: self._fetch_search_results(query)
+        )
+        result["query"] = query
+        return result
+    
+    @staticmethod
+    def _extraction_mode(question: str) -> str:
+        """Режим извлечения контента по тексту вопроса"""
+        question_lower = question.lower()
+        for mode in ("title", "links", "images"):
+            if mode in question_lower:
+                return mode
+        return "text"
+    
+    async def _handle_crawl_response(self, response: aiohttp.ClientResponse, url: str, mode: str,
+                                     extraction_method: str, cached: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Обработать ответ сервера: 304 из кэша, ошибка или извлечение и сохранение в кэш"""
+        if response.status == 304 and cached:
+            entry = await crawl_cache.revalidated(cached, response.headers)
+            return {**entry["result"], "extraction_method": extraction_method, "cached": True}
+        
+        if response.status != 200:
+            return {
+                "success": False,
+                "url": url,
+                "error": f"HTTP {response.status}: {response.reason}"
+            }
+        
+        # Тело читается с лимитом, парсинг - вне event loop
+        html, body_truncated = await read_capped(response)
+        extracted = await extraction_engine.extract(html, mode)
+        result = {
+            "success": True,
+            "url": url,
+            "content": extracted["content"],
+            "title": extracted["title"],
+            "extraction_method": extraction_method
+        }
+        if body_truncated:
+            result["body_truncated"] = True
+        await crawl_cache.put(url, mode, result, response.headers)
+        return result
+    
     async def crawl_tool(self, url: str, extraction_method: str = "scrape", question: str = "text") -> Dict[str, Any]:
-        """Скрапинг веб-страниц"""
+        """Скрапинг веб-страниц с дисковым кэшем извлечённого контента"""
         try:
+            mode = self._extraction_mode(question)
+            
+            # Свежая запись в кэше - без запроса и без парсинга
+            cached = await crawl_cache.get(url, mode)
+            if cached and crawl_cache.is_fresh(cached):
+                return {**cached["result"], "extraction_method": extraction_method, "cached": True}
+            
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
+            if cached:
+                # Устаревшая запись - условный запрос для ревалидации
+                headers.update(crawl_cache.validators(cached))
             
             # Use the context manager's session if available, otherwise create a new one
-            session_to_use = self.session if self.session else aiohttp.ClientSession()
-            
-            if self.session:
-                async with self.session.get(url, headers=headers, timeout=30) as response:
-                    if response.status != 200:
-                        return {
-                            "success": False,
-                            "url": url,
-                            "error": f"HTTP {response.status}: {response.reason}"
-                        }
-                    
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Удалить скрипты и стили
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    
-                    # Извлечь текст в зависимости от вопроса
-                    if "title" in question.lower():
-                        content = soup.title.string if soup.title else "No title found"
-                    elif "links" in question.lower():
-                        links = [{"text": a.get_text(strip=True), "href": a.get('href')} 
-                                for a in soup.find_all('a', href=True)]
-                        content = json.dumps(links, indent=2, ensure_ascii=False)
-                    elif "images" in question.lower():
-                        images = [{"alt": img.get('alt', ''), "src": img.get('src')} 
-                                 for img in soup.find_all('img', src=True)]
-                        content = json.dumps(images, indent=2, ensure_ascii=False)
-                    else:
-                        # Извлечь основной текст
-                        content = soup.get_text()
-                        # Очистить лишние пробелы
-                        lines = (line.strip() for line in content.splitlines())
-                        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                        content = ' '.join(chunk for chunk in chunks if chunk)
-                        
-                        # Ограничить размер для больших страниц
-                        if len(content) > 5000:
-                            content = content[:5000] + "... (content truncated)"
-                    
-                    return {
-                        "success": True,
-                        "url": url,
-                        "content": content,
-                        "title": soup.title.string if soup.title else "",
-                        "extraction_method": extraction_method
-                    }
-            else:
-                # Fallback to creating own session if context manager not used
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url, headers=headers, timeout=30) as response:
-                        if response.status != 200:
-                            return {
-                                "success": False,
-                                "url": url,
-                                "error": f"HTTP {response.status}: {response.reason}"
-                            }
-                        
-                        html = await response.text()
-                        soup = BeautifulSoup(html, 'html.parser')
-                        
-                        # Удалить скрипты и стили
-                        for script in soup(["script", "style"]):
-                            script.decompose()
-                        
-                        # Извлечь текст в зависимости от вопроса
-                        if "title" in question.lower():
-                            content = soup.title.string if soup.title else "No title found"
-                        elif "links" in question.lower():
-                            links = [{"text": a.get_text(strip=True), "href": a.get('href')} 
-                                    for a in soup.find_all('a', href=True)]
-                            content = json.dumps(links, indent=2, ensure_ascii=False)
-                        elif "images" in question.lower():
-                            images = [{"alt": img.get('alt', ''), "src": img.get('src')} 
-                                     for img in soup.find_all('img', src=True)]
-                            content = json.dumps(images, indent=2, ensure_ascii=False)
-                        else:
-                            # Извлечь основной текст
-                            content = soup.get_text()
-                            # Очистить лишние пробелы
-                            lines = (line.strip() for line in content.splitlines())
-                            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-                            content = ' '.join(chunk for chunk in chunks if chunk)
-                            
-                            # Ограничить размер для больших страниц
-                            if len(content) > 5000:
-                                content = content[:5000] + "... (content truncated)"
-                        
-                        return {
-                            "success": True,
-                            "url": url,
-                            "content": content,
-                            "title": soup.title.string if soup.title else "",
-                            "extraction_method": extraction_method
-                        }
+            session = self.session or aiohttp.ClientSession()
+            try:
+                async with session.get(url, headers=headers, timeout=30) as response:
+                    return await self._handle_crawl_response(response, url, mode, extraction_method, cached)
+            finally:
+                if session is not self.session:
+                    await session.close()
                     
         except Exception as e:
             return {
@@ -470,6 +433,54 @@ class AgentToolsManager:
                 "error": str(e)
             }
     
+    async def crawl_many(self, urls: List[str], question: str = "text", max_urls: Optional[int] = None,
+                         per_host_limit: Optional[int] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """Параллельный скрапинг нескольких страниц с лимитом на хост и общим дедлайном
+        
+        Возвращает всё, что успело загрузиться к дедлайну; остальные URL
+        перечисляются в timed_out, ошибки - в failed, не вошедшие в бюджет - в skipped.
+        """
+        max_urls = max_urls or int(os.getenv("CRAWL_MAX_URLS", "5"))
+        per_host_limit = per_host_limit or int(os.getenv("CRAWL_PER_HOST_LIMIT", "2"))
+        deadline = deadline or float(os.getenv("CRAWL_DEADLINE", "20"))
+        
+        unique_urls = list(dict.fromkeys(urls))
+        selected, skipped = unique_urls[:max_urls], unique_urls[max_urls:]
+        
+        host_limits: Dict[str, asyncio.Semaphore] = {}
+        
+        async def crawl_one(url: str) -> Dict[str, Any]:
+            host = urlparse(url).netloc.lower()
+            semaphore = host_limits.setdefault(host, asyncio.Semaphore(per_host_limit))
+            async with semaphore:
+                return await self.crawl_tool(url=url, question=question)
+        
+        tasks = {asyncio.create_task(crawl_one(url)): url for url in selected}
+        done, pending = await asyncio.wait(tasks, timeout=deadline) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        
+        timed_out = {tasks[task] for task in pending}
+        results, failed = {}, []
+        for task in done:
+            url = tasks[task]
+            try:
+                crawl_result = task.result()
+            except Exception as e:
+                crawl_result = {"success": False, "url": url, "error": str(e)}
+            if crawl_result.get("success"):
+                results[url] = crawl_result
+            else:
+                failed.append({"url": url, "error": crawl_result.get("error", "Unknown error")})
+        
+        return {
+            "success": bool(results),
+            "results": [results[url] for url in selected if url in results],
+            "failed": failed,
+            "timed_out": [url for url in selected if url in timed_out],
+            "skipped": skipped
+        }
+    
     async def screenshot_tool(self, page_url: str, script: str = None) -> Dict[str, Any]:
         """Создание скриншотов веб-страниц (заглушка)"""
         # Это требует Playwright или Selenium, которые сложны в асинхронном контексте
@@ -1,9 +1,14 @@
-from typing import Dict, List, Optional, Any, TYPE_CHECKING
+from typing import Dict, Iterable, List, Optional, Any, Tuple, Callable, TYPE_CHECKING
 from models import AgentType, AgentInfo, AgentStatus
 from datetime import datetime, timedelta
+from collections import OrderedDict
+import asyncio
+import os
+import time
 
 if TYPE_CHECKING:
-    from models import AgentCollaboration, AgentTask
+    from collaboration_store import CollaborationStore
+    from models import AgentCollaboration, AgentHandoff, AgentTask
 
 
 class AgentManager:
@@ -468,12 +473,188 @@ Always be helpful, professional, and focus on delivering practical solutions. Wh
         return best_agent[0] if best_agent[1] > 0 else AgentType.MAIN_ASSISTANT
 
 
+# Tasks in any other status count as active
+FINISHED_TASK_STATUSES = (AgentStatus.COMPLETED, AgentStatus.FAILED)
+ACTIVE_TASK_STATUSES = tuple(status for status in AgentStatus if status not in FINISHED_TASK_STATUSES)
+
+# Collaboration phase entered when an agent starts working on a task
+PHASE_BY_AGENT = {
+    AgentType.PROJECT_PLANNER: "planning",
+    AgentType.DESIGN_AGENT: "design",
+    AgentType.FRONTEND_DEVELOPER: "development",
+    AgentType.BACKEND_DEVELOPER: "development",
+    AgentType.FULLSTACK_DEVELOPER: "development",
+    AgentType.INTEGRATION_AGENT: "development",
+    AgentType.TESTING_EXPERT: "testing",
+    AgentType.VERSION_CONTROL_AGENT: "deployment",
+    AgentType.DEPLOYMENT_ENGINEER: "deployment",
+}
+
+# Events passed to listeners as (event, collaboration, task):
+# "collaboration_created", "task_created", "task_updated" and "phase_changed"
+TaskListener = Callable[[str, 'AgentCollaboration', 'AgentTask'], None]
+
+
 class AgentCollaborationManager:
     """Manages agent collaboration and workflow orchestration"""
     
-    def __init__(self):
+    def __init__(self, store: Optional['CollaborationStore'] = None,
+                 idle_ttl_seconds: Optional[float] = None, max_resident: Optional[int] = None):
         self.agent_manager = AgentManager()
+        # Resident collaborations by session id; evicted ones are loaded back from the store
         self.active_collaborations: Dict[str, 'AgentCollaboration'] = {}
+        # task_id -> (collaboration, task) over all resident collaborations
+        self._task_index: Dict[str, Tuple['AgentCollaboration', 'AgentTask']] = {}
+        # collaboration_id -> status -> {task_id: task}
+        self._status_buckets: Dict[str, Dict[AgentStatus, Dict[str, 'AgentTask']]] = {}
+        # Write-behind persistence; reads are always served from memory
+        self.store = store
+        
+        # Eviction policy: idle TTL plus an LRU bound on resident collaborations
+        self.idle_ttl = (idle_ttl_seconds if idle_ttl_seconds is not None
+                         else float(os.getenv("COLLABORATION_IDLE_TTL_SECONDS", "1800")))
+        self.max_resident = max_resident or int(os.getenv("COLLABORATION_MAX_RESIDENT", "1000"))
+        self.sweep_interval = float(os.getenv("COLLABORATION_SWEEP_INTERVAL_SECONDS", "60"))
+        # session_id -> last access (monotonic), least recently used first
+        self._last_access: 'OrderedDict[str, float]' = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.evictions = 0
+        self.rehydrations = 0
+        self._listeners: List[TaskListener] = []
+        self.resident_bytes = 0  # serialized size of the resident collaborations at the last sweep
+    
+    async def start(self):
+        """Start the eviction sweeper (every sweep_interval, or as soon as max_resident is exceeded)"""
+        if self._sweeper:
+            return
+        self._wakeup = asyncio.Event()
+        self._sweeper = asyncio.create_task(self._sweep())
+    
+    async def stop(self):
+        if not self._sweeper:
+            return
+        self._sweeper.cancel()
+        await asyncio.gather(self._sweeper, return_exceptions=True)
+        self._sweeper = None
+    
+    async def _sweep(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.evict()
+            except Exception as e:
+                print(f"Collaboration eviction failed: {e}")
+    
+    async def evict(self) -> int:
+        """Drop idle and least recently used collaborations from memory; returns how many
+        
+        Their changes are flushed to the store first, and get_collaboration
+        loads them back on the next access. Without a store nothing is evicted.
+        """
+        if not self.store:
+            return 0
+        now = time.monotonic()
+        excess = len(self._last_access) - self.max_resident
+        candidates = []
+        for session_id, last_access in self._last_access.items():
+            if excess <= 0 and now - last_access <= self.idle_ttl:
+                break  # everything after this one was used more recently
+            candidates.append((session_id, last_access))
+            excess -= 1
+        
+        evicted = 0
+        if candidates:
+            await self.store.flush()
+            for session_id, last_access in candidates:
+                collaboration = self.active_collaborations.get(session_id)
+                # Keep collaborations used during the flush or whose changes are not in the database yet
+                if (collaboration is None or self._last_access.get(session_id) != last_access
+                        or self.store.is_dirty(collaboration.id)):
+                    continue
+                self._unregister(collaboration)
+                evicted += 1
+            self.evictions += evicted
+        
+        self.resident_bytes = sum(len(collaboration.model_dump_json())
+                                  for collaboration in self.active_collaborations.values())
+        return evicted
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "resident": len(self.active_collaborations),
+            "resident_tasks": len(self._task_index),
+            "resident_bytes": self.resident_bytes,
+            "max_resident": self.max_resident,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations
+        }
+    
+    def _touch(self, session_id: str):
+        self._last_access[session_id] = time.monotonic()
+        self._last_access.move_to_end(session_id)
+    
+    def _register(self, collaboration: 'AgentCollaboration'):
+        """Make a collaboration the active one of its session and index its tasks"""
+        previous = self.active_collaborations.get(collaboration.session_id)
+        if previous is not None and previous is not collaboration:
+            self._unregister(previous)
+        self.active_collaborations[collaboration.session_id] = collaboration
+        self._status_buckets[collaboration.id] = {status: {} for status in AgentStatus}
+        for task in collaboration.agent_tasks:
+            self._index_task(collaboration, task)
+        self._touch(collaboration.session_id)
+        if self._wakeup and len(self.active_collaborations) > self.max_resident:
+            self._wakeup.set()
+    
+    def _unregister(self, collaboration: 'AgentCollaboration'):
+        """Drop a collaboration and its tasks from the session map and indexes"""
+        for task in collaboration.agent_tasks:
+            self._task_index.pop(task.id, None)
+        self._status_buckets.pop(collaboration.id, None)
+        if self.active_collaborations.get(collaboration.session_id) is collaboration:
+            del self.active_collaborations[collaboration.session_id]
+            self._last_access.pop(collaboration.session_id, None)
+    
+    def _index_task(self, collaboration: 'AgentCollaboration', task: 'AgentTask'):
+        self._task_index[task.id] = (collaboration, task)
+        self._status_buckets[collaboration.id][task.status][task.id] = task
+    
+    def add_listener(self, listener: TaskListener):
+        """Call listener(event, collaboration, task) on every collaboration and task change"""
+        self._listeners.append(listener)
+    
+    def _notify(self, event: str, collaboration: 'AgentCollaboration', task: 'AgentTask'):
+        for listener in self._listeners:
+            try:
+                listener(event, collaboration, task)
+            except Exception as e:
+                print(f"Collaboration listener failed on {event}: {e}")
+    
+    def dependency_state(self, collaboration: 'AgentCollaboration', task: 'AgentTask') -> str:
+        """'ready' when every dependency completed, 'failed' when one failed or is unknown, else 'waiting'"""
+        buckets = self._status_buckets[collaboration.id]
+        state = "ready"
+        for dependency_id in task.dependencies:
+            if dependency_id in buckets[AgentStatus.COMPLETED]:
+                continue
+            entry = self._task_index.get(dependency_id)
+            if dependency_id in buckets[AgentStatus.FAILED] or entry is None or entry[0] is not collaboration:
+                return "failed"
+            state = "waiting"
+        return state
+    
+    def _persist(self, collaboration: 'AgentCollaboration',
+                 tasks: Iterable['AgentTask'] = (), handoffs: Iterable['AgentHandoff'] = ()):
+        """Record a change for the next store flush"""
+        collaboration.updated_at = datetime.utcnow()
+        if self.store:
+            self.store.mark_dirty(collaboration, tasks, handoffs)
         
     def create_collaboration(self, project_id: str, session_id: str, user_request: str) -> 'AgentCollaboration':
         """Create a new agent collaboration session"""
@@ -506,12 +687,37 @@ class AgentCollaborationManager:
         collaboration.agent_tasks.append(planning_task)
         collaboration.active_agents.append(AgentType.PROJECT_PLANNER)
         
-        self.active_collaborations[session_id] = collaboration
+        self._register(collaboration)
+        self._persist(collaboration, tasks=[planning_task])
+        self._notify("collaboration_created", collaboration, planning_task)
+        self._notify("task_created", collaboration, planning_task)
+        return collaboration
+    
+    async def get_collaboration(self, session_id: str) -> Optional['AgentCollaboration']:
+        """Get existing collaboration session, loading it back if it was evicted"""
+        collaboration = self.active_collaborations.get(session_id)
+        if collaboration is None and self.store:
+            loaded = await self.store.load(session_id)
+            # Another request may have loaded or created it while we waited
+            collaboration = self.active_collaborations.get(session_id)
+            if collaboration is None and loaded is not None:
+                self._register(loaded)
+                self.rehydrations += 1
+                collaboration = loaded
+        if collaboration is not None:
+            self._touch(session_id)
         return collaboration
     
-    def get_collaboration(self, session_id: str) -> Optional['AgentCollaboration']:
-        """Get existing collaboration session"""
-        return self.active_collaborations.get(session_id)
+    async def find_task(self, task_id: str) -> Optional[Tuple['AgentCollaboration', 'AgentTask']]:
+        """(collaboration, task) for a task id, loading its collaboration back if needed"""
+        entry = self._task_index.get(task_id)
+        if entry is None and self.store:
+            session_id = await self.store.task_session_id(task_id)
+            if session_id and await self.get_collaboration(session_id):
+                entry = self._task_index.get(task_id)
+        elif entry is not None:
+            self._touch(entry[0].session_id)
+        return entry
     
     def get_next_agent(self, current_agent: AgentType, task_context: str = "") -> Optional[AgentType]:
         """Determine the next agent based on current agent and context"""
@@ -523,15 +729,19 @@ class AgentCollaborationManager:
         # In a more sophisticated implementation, this would analyze the context
         return agent_info.typical_handoff_agents[0]
     
-    def create_handoff_task(self, from_agent: AgentType, to_agent: AgentType, 
-                          collaboration_id: str, message: str, context: Dict[str, Any]) -> 'AgentTask':
+    async def create_handoff_task(self, from_agent: AgentType, to_agent: AgentType, 
+                                collaboration_id: str, message: str, context: Dict[str, Any]) -> 'AgentTask':
         """Create a handoff task from one agent to another"""
-        from models import AgentTask, TaskPriority, AgentHandoff
-        
-        collaboration = self.active_collaborations.get(collaboration_id)
+        collaboration = await self.get_collaboration(collaboration_id)
         if not collaboration:
             raise ValueError(f"Collaboration {collaboration_id} not found")
         
+        return self._add_handoff_task(collaboration, from_agent, to_agent, message, context)
+    
+    def _add_handoff_task(self, collaboration: 'AgentCollaboration', from_agent: AgentType, to_agent: AgentType,
+                          message: str, context: Dict[str, Any]) -> 'AgentTask':
+        from models import AgentTask, TaskPriority, AgentHandoff
+        
         # Create handoff record
         handoff = AgentHandoff(
             from_agent=from_agent,
@@ -560,11 +770,14 @@ class AgentCollaborationManager:
         handoff.task_id = task.id
         collaboration.agent_tasks.append(task)
         collaboration.handoffs.append(handoff)
+        self._index_task(collaboration, task)
         
         # Update active agents
         if to_agent not in collaboration.active_agents:
             collaboration.active_agents.append(to_agent)
-            
+        
+        self._persist(collaboration, tasks=[task], handoffs=[handoff])
+        self._notify("task_created", collaboration, task)
         return task
     
     def _get_task_details_for_agent(self, agent_type: AgentType, context: Dict[str, Any]) -> Dict[str, Any]:
@@ -618,29 +831,50 @@ class AgentCollaborationManager:
             "deliverables": ["Результат работы"]
         })
     
-    def update_task_status(self, task_id: str, status: 'AgentStatus', message: str = "") -> bool:
-        """Update task status and handle workflow progression"""
-        from models import AgentStatus
+    async def update_task_status(self, task_id: str, status: 'AgentStatus', message: str = "",
+                                 result: Optional[Dict[str, Any]] = None) -> bool:
+        """Update task status and handle workflow progression
+        
+        result, when given, is kept in the task metadata and so travels with
+        the handoff to the next agent.
+        """
+        entry = await self.find_task(task_id)
+        if not entry:
+            return False
+        collaboration, task = entry
         
-        for collaboration in self.active_collaborations.values():
-            for task in collaboration.agent_tasks:
-                if task.id == task_id:
-                    task.status = status
-                    task.updated_at = datetime.utcnow()
-                    
-                    if status == AgentStatus.WORKING:
-                        task.started_at = datetime.utcnow()
-                    elif status in [AgentStatus.COMPLETED, AgentStatus.FAILED]:
-                        task.completed_at = datetime.utcnow()
-                        if task.started_at:
-                            task.actual_duration = int((task.completed_at - task.started_at).total_seconds() / 60)
-                    
-                    # Handle task completion and handoff
-                    if status == AgentStatus.COMPLETED and task.handoff_to:
-                        self._handle_task_completion(task, collaboration)
-                    
-                    return True
-        return False
+        # Move the task to its new status bucket
+        buckets = self._status_buckets[collaboration.id]
+        buckets[task.status].pop(task.id, None)
+        buckets[status][task.id] = task
+        
+        task.status = status
+        task.updated_at = datetime.utcnow()
+        if result is not None:
+            task.metadata["result"] = result
+        
+        phase_changed = False
+        if status == AgentStatus.WORKING:
+            task.started_at = datetime.utcnow()
+            phase = PHASE_BY_AGENT.get(task.agent_type)
+            if phase and phase != collaboration.current_phase:
+                collaboration.current_phase = phase
+                phase_changed = True
+        elif status in FINISHED_TASK_STATUSES:
+            task.completed_at = datetime.utcnow()
+            if task.started_at:
+                task.actual_duration = int((task.completed_at - task.started_at).total_seconds() / 60)
+        
+        self._persist(collaboration, tasks=[task])
+        self._notify("task_updated", collaboration, task)
+        if phase_changed:
+            self._notify("phase_changed", collaboration, task)
+        
+        # Handle task completion and handoff
+        if status == AgentStatus.COMPLETED and task.handoff_to:
+            self._handle_task_completion(task, collaboration)
+        
+        return True
     
     def _handle_task_completion(self, completed_task: 'AgentTask', collaboration: 'AgentCollaboration'):
         """Handle task completion and create handoff to next agent"""
@@ -655,32 +889,47 @@ class AgentCollaborationManager:
         }
         
         # Create handoff task
-        self.create_handoff_task(
+        self._add_handoff_task(
+            collaboration,
             from_agent=completed_task.agent_type,
             to_agent=completed_task.handoff_to,
-            collaboration_id=collaboration.session_id,
             message=handoff_message,
             context=context
         )
     
-    def get_active_tasks(self, session_id: str) -> List['AgentTask']:
+    async def get_active_tasks(self, session_id: str) -> List['AgentTask']:
         """Get all active tasks for a collaboration session"""
-        from models import AgentStatus
-        
-        collaboration = self.active_collaborations.get(session_id)
+        collaboration = await self.get_collaboration(session_id)
         if not collaboration:
             return []
-            
-        return [task for task in collaboration.agent_tasks 
-                if task.status not in [AgentStatus.COMPLETED, AgentStatus.FAILED]]
+        return self.active_tasks(collaboration)
+    
+    def active_tasks(self, collaboration: 'AgentCollaboration') -> List['AgentTask']:
+        """Active tasks of a resident collaboration, in creation order"""
+        buckets = self._status_buckets[collaboration.id]
+        tasks = [task for status in ACTIVE_TASK_STATUSES for task in buckets[status].values()]
+        # Buckets are grouped by status; keep the order the tasks were created in
+        tasks.sort(key=lambda task: task.created_at)
+        return tasks
     
-    def get_collaboration_status(self, session_id: str) -> Dict[str, Any]:
+    def task_counts(self, collaboration: 'AgentCollaboration') -> Dict[str, int]:
+        buckets = self._status_buckets[collaboration.id]
+        return {
+            "total_tasks": len(collaboration.agent_tasks),
+            "active_tasks": sum(len(buckets[status]) for status in ACTIVE_TASK_STATUSES),
+            "completed_tasks": len(buckets[AgentStatus.COMPLETED])
+        }
+    
+    async def get_collaboration_status(self, session_id: str) -> Dict[str, Any]:
         """Get detailed status of collaboration session"""
-        collaboration = self.active_collaborations.get(session_id)
+        collaboration = await self.get_collaboration(session_id)
         if not collaboration:
             return {"error": "Collaboration not found"}
-            
-        active_tasks = self.get_active_tasks(session_id)
+        return self.collaboration_status(collaboration)
+    
+    def collaboration_status(self, collaboration: 'AgentCollaboration') -> Dict[str, Any]:
+        """Status of a resident collaboration"""
+        active_tasks = self.active_tasks(collaboration)
         
         return {
             "collaboration_id": collaboration.id,
@@ -688,9 +937,7 @@ class AgentCollaborationManager:
             "session_id": collaboration.session_id,
             "current_phase": collaboration.current_phase,
             "active_agents": collaboration.active_agents,
-            "total_tasks": len(collaboration.agent_tasks),
-            "active_tasks": len(active_tasks),
-            "completed_tasks": len([t for t in collaboration.agent_tasks if t.status.value == "completed"]),
+            **self.task_counts(collaboration),
             "recent_handoffs": collaboration.handoffs[-5:] if collaboration.handoffs else [],
             "current_tasks": [
                 {
@@ -704,4 +951,28 @@ class AgentCollaborationManager:
                 }
                 for task in active_tasks
             ]
-        }
\ No newline at end of file
+        }
+
+
+if __name__ == "__main__":
+    # Benchmark: update_task_status as collaborations accumulate (the lookup used to scan every task)
+    async def benchmark():
+        for size in (100, 1_000, 10_000):
+            manager = AgentCollaborationManager(max_resident=size)
+            task_ids = [
+                manager.create_collaboration(f"project_{i}", f"session_{i}", "Build an app").agent_tasks[0].id
+                for i in range(size)
+            ]
+            step = max(1, size // 200)
+            started = time.perf_counter()
+            for task_id in task_ids[::step]:
+                await manager.update_task_status(task_id, AgentStatus.WORKING)
+            update_us = (time.perf_counter() - started) / len(task_ids[::step]) * 1e6
+            started = time.perf_counter()
+            for i in range(0, size, step):
+                await manager.get_collaboration_status(f"session_{i}")
+            status_us = (time.perf_counter() - started) / len(task_ids[::step]) * 1e6
+            print(f"{size:>7} collaborations  update_task_status {update_us:7.1f} µs  "
+                  f"get_collaboration_status {status_us:7.1f} µs")
+
+    asyncio.run(benchmark())
@@ -1,14 +1,16 @@
-import os
+import re
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from emergentintegrations.llm.chat import LlmChat, UserMessage
 from models import AgentType, ChatMessage, MessageRole
 from agents import AgentManager
 from real_agent_executor import RealAgentExecutor
 from agent_tools import AgentToolsManager
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from database import APIKeyDB, AsyncSessionLocal
+from api_key_cache import api_key_cache
+from intent_router import tool_router
+
+# Слова-триггеры поиска, которые убираются из поискового запроса
+SEARCH_TRIGGER_PATTERN = re.compile(r'найди|поиск|ищи', re.IGNORECASE)
 
 
 class AIService:
@@ -21,45 +23,8 @@ class AIService:
         self.active_chats: Dict[str, LlmChat] = {}
     
     async def _get_api_key(self, provider: str) -> Optional[str]:
-        """Get API key for the specified provider from database or environment"""
-        try:
-            # First, try to get from database
-            async with AsyncSessionLocal() as db:
-                stmt = select(APIKeyDB).where(
-                    APIKeyDB.provider == provider,
-                    APIKeyDB.is_active == 1
-                )
-                result = await db.execute(stmt)
-                api_key_db = result.scalar_one_or_none()
-                
-                if api_key_db:
-                    return api_key_db.api_key
-            
-            # Fallback to environment variables
-            key_mapping = {
-                "gemini": "GEMINI_API_KEY",
-                "openai": "OPENAI_API_KEY", 
-                "anthropic": "ANTHROPIC_API_KEY"
-            }
-            
-            env_key = key_mapping.get(provider)
-            if env_key:
-                return os.environ.get(env_key)
-                
-        except Exception as e:
-            print(f"Error getting API key for {provider}: {e}")
-            # Fallback to environment variables on database error
-            key_mapping = {
-                "gemini": "GEMINI_API_KEY",
-                "openai": "OPENAI_API_KEY", 
-                "anthropic": "ANTHROPIC_API_KEY"
-            }
-            
-            env_key = key_mapping.get(provider)
-            if env_key:
-                return os.environ.get(env_key)
-        
-        return None
+        """Get API key for the specified provider from the key cache or environment"""
+        return await api_key_cache.get(provider)
     
     async def _create_chat_instance(self, session_id: str, agent_type: AgentType, 
                             provider: str, model: str) -> LlmChat:
@@ -89,7 +54,8 @@ class AIService:
         message: str,
         agent_type: AgentType = AgentType.MAIN_ASSISTANT,
         provider: str = "gemini",
-        model: str = "gemini-2.0-flash"
+        model: str = "gemini-2.0-flash",
+        on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
         """Execute real agent task instead of just returning text"""
         
@@ -99,7 +65,8 @@ class AIService:
                 agent_type=agent_type,
                 message=message,
                 session_id=session_id,
-                context={}
+                context={},
+                on_event=on_event
             )
             
             if result["success"]:
@@ -154,8 +121,30 @@ class AIService:
             "success": True
         }
     
-    async def process_message_with_tools(self, message: str, agent_type: AgentType) -> Dict[str, Any]:
-        """Process message using appropriate tools based on content analysis"""
+    # Реестр обработчиков: намерение из intent_router -> метод AIService
+    TOOL_HANDLERS = {
+        "web_analysis": "_handle_web_analysis",
+        "web_search": "_handle_web_search",
+        "create_file": "_handle_create_file",
+        "run_command": "_handle_run_command",
+        "view_file": "_handle_view_file",
+        "generate_image": "_handle_generate_image",
+        "integration": "_handle_integration",
+    }
+    
+    async def process_message_with_tools(
+        self,
+        message: str,
+        agent_type: AgentType,
+        on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """Process message using appropriate tools based on content analysis
+        
+        The best matching tool, then any other strongly matched one, is tried
+        until one produces a result; otherwise the agent answers the message.
+        on_event receives intermediate (event, data) notifications from the
+        agent executor so callers can stream progress to the client.
+        """
         message_lower = message.lower()
         
         # Initialize tools manager context
@@ -166,36 +155,64 @@ class AIService:
             tools_manager = AgentToolsManager()
             
             async with tools_manager:
-                # Анализ веб-сайтов
-                if any(phrase in message_lower for phrase in ['анализ', 'сайт', 'https://', 'http://', 'веб-страниц', 'проанализируй']):
-                    # Извлекаем URL из сообщения
-                    import re
-                    urls = re.findall(r'https?://[^\s]+', message)
-                    
-                    if urls:
-                        results = []
-                        for url in urls[:3]:  # Ограничиваем до 3 URL
-                            try:
-                                crawl_result = await tools_manager.crawl_tool(
-                                    url=url,
-                                    question="Анализируй функциональность, дизайн и особенности сайта"
-                                )
-                                if crawl_result["success"]:
-                                    results.append({
-                                        "url": url,
-                                        "content": crawl_result["content"][:2000],  # Ограничиваем размер
-                                        "title": crawl_result.get("title", "")
-                                    })
-                            except Exception as e:
-                                print(f"Error crawling {url}: {e}")
-                                continue
-                        
-                        if results:
-                            analysis = f"""🌐 **Анализ веб-сайтов**
+                for intent in tool_router.candidates(message):
+                    handler = getattr(self, self.TOOL_HANDLERS[intent])
+                    result = await handler(tools_manager, message, message_lower, agent_type)
+                    if result is not None:
+                        return result
+                
+                # Если инструменты не применимы, используем стандартную обработку агентов
+                print(f"No specific tool matched for message: {message[:50]}...")
+                return await self.send_message(
+                    session_id="temp",
+                    message=message,
+                    agent_type=agent_type,
+                    on_event=on_event
+                )
+                
+        except Exception as e:
+            print(f"Critical error in process_message_with_tools: {e}")
+            import traceback
+            traceback.print_exc()
+            # Fallback to standard agent processing
+            return await self.send_message(
+                session_id="temp",
+                message=message,
+                agent_type=agent_type,
+                on_event=on_event
+            )
+    
+    async def _handle_web_analysis(self, tools_manager: AgentToolsManager, message: str,
+                                   message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Анализ веб-сайтов"""
+        # Извлекаем URL из сообщения
+        urls = re.findall(r'https?://[^\s]+', message)
+        if not urls:
+            return None
+        
+        crawl_results = await tools_manager.crawl_many(
+            urls,
+            question="Анализируй функциональность, дизайн и особенности сайта"
+        )
+        results = [
+            {
+                "url": crawl_result["url"],
+                "content": crawl_result["content"][:2000],  # Ограничиваем размер
+                "title": crawl_result.get("title", "")
+            }
+            for crawl_result in crawl_results["results"]
+        ]
+        for failure in crawl_results["failed"]:
+            print(f"Error crawling {failure['url']}: {failure['error']}")
+        
+        if not results:
+            return None
+        
+        analysis = f"""🌐 **Анализ веб-сайтов**
 
 """
-                            for result in results:
-                                analysis += f"""**Сайт:** {result['url']}
+        for result in results:
+            analysis += f"""**Сайт:** {result['url']}
 **Заголовок:** {result['title']}
 
 **Контент и функциональность:**
@@ -204,49 +221,63 @@ class AIService:
 ---
 
 """
-                            
-                            return {
-                                "response": analysis,
-                                "agent_type": agent_type.value,
-                                "tool_results": results,
-                                "success": True
-                            }
-                
-                # Поиск в интернете
-                elif any(phrase in message_lower for phrase in ['найди', 'поиск', 'ищи', 'search']):
-                    search_query = message.replace('найди', '').replace('поиск', '').replace('ищи', '').strip()
-                    
-                    if search_query:
-                        try:
-                            search_result = await tools_manager.web_search_tool(search_query)
-                            
-                            if search_result["success"]:
-                                response = f"""🔍 **Результаты поиска для:** "{search_query}"
+        
+        # Частичный результат: что не успело загрузиться или не вошло в лимит
+        if crawl_results["timed_out"]:
+            analysis += "⏱️ **Не успели загрузиться:** " + ", ".join(crawl_results["timed_out"]) + "\n"
+        if crawl_results["failed"]:
+            analysis += "⚠️ **Не удалось загрузить:** " + ", ".join(f["url"] for f in crawl_results["failed"]) + "\n"
+        if crawl_results["skipped"]:
+            analysis += "✂️ **Пропущены (лимит URL):** " + ", ".join(crawl_results["skipped"]) + "\n"
+        
+        return {
+            "response": analysis,
+            "agent_type": agent_type.value,
+            "tool_results": results,
+            "partial": bool(crawl_results["timed_out"] or crawl_results["failed"] or crawl_results["skipped"]),
+            "success": True
+        }
+    
+    async def _handle_web_search(self, tools_manager: AgentToolsManager, message: str,
+                                 message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Поиск в интернете"""
+        search_query = SEARCH_TRIGGER_PATTERN.sub('', message).strip(' \t\n,.:;!?-')
+        # Без слов для поиска запрос не имеет смысла
+        if not re.search(r'\w', search_query):
+            return None
+        
+        try:
+            search_result = await tools_manager.web_search_tool(search_query)
+            
+            if search_result["success"]:
+                response = f"""🔍 **Результаты поиска для:** "{search_query}"
 
 """
-                                for i, result in enumerate(search_result["results"][:5], 1):
-                                    response += f"""**{i}. {result['title']}**
+                for i, result in enumerate(search_result["results"][:5], 1):
+                    response += f"""**{i}. {result['title']}**
 {result['url']}
 {result['snippet']}
 
 """
-                                
-                                return {
-                                    "response": response,
-                                    "agent_type": agent_type.value,
-                                    "search_results": search_result["results"],
-                                    "success": True
-                                }
-                        except Exception as e:
-                            print(f"Error in web search: {e}")
-                            # Continue to fallback
                 
-                # Создание файлов
-                elif any(phrase in message_lower for phrase in ['создай файл', 'создать файл', 'напиши код', 'создай проект']):
-                    # Определяем тип файла из контекста
-                    if 'react' in message_lower or 'jsx' in message_lower:
-                        # Создаем React компонент
-                        file_content = """import React from 'react';
+                return {
+                    "response": response,
+                    "agent_type": agent_type.value,
+                    "search_results": search_result["results"],
+                    "success": True
+                }
+        except Exception as e:
+            print(f"Error in web search: {e}")
+            # Continue to fallback
+        return None
+    
+    async def _handle_create_file(self, tools_manager: AgentToolsManager, message: str,
+                                  message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Создание файлов"""
+        # Определяем тип файла из контекста
+        if 'react' in message_lower or 'jsx' in message_lower:
+            # Создаем React компонент
+            file_content = """import React from 'react';
 
 const MyComponent = () => {
   return (
@@ -258,33 +289,33 @@ const MyComponent = () => {
 };
 
 export default MyComponent;"""
-                        
-                        try:
-                            create_result = await tools_manager.create_file(
-                                path="frontend/src/components/MyComponent.jsx",
-                                content=file_content
-                            )
-                            
-                            if create_result["success"]:
-                                return {
-                                    "response": f"""✅ **Файл создан:** `{create_result['path']}`
+            
+            try:
+                create_result = await tools_manager.create_file(
+                    path="frontend/src/components/MyComponent.jsx",
+                    content=file_content
+                )
+                
+                if create_result["success"]:
+                    return {
+                        "response": f"""✅ **Файл создан:** `{create_result['path']}`
 
 ```jsx
 {file_content}
 ```
 
 Файл успешно создан в проекте!""",
-                                    "agent_type": agent_type.value,
-                                    "created_files": [create_result["path"]],
-                                    "success": True
-                                }
-                        except Exception as e:
-                            print(f"Error creating React file: {e}")
-                            # Continue to fallback
-                    
-                    elif 'python' in message_lower or '.py' in message_lower:
-                        # Создаем Python файл
-                        file_content = """#!/usr/bin/env python3
+                        "agent_type": agent_type.value,
+                        "created_files": [create_result["path"]],
+                        "success": True
+                    }
+            except Exception as e:
+                print(f"Error creating React file: {e}")
+                # Continue to fallback
+        
+        elif 'python' in message_lower or '.py' in message_lower:
+            # Создаем Python файл
+            file_content = """#!/usr/bin/env python3
 \"\"\"
 Example Python script
 \"\"\"
@@ -295,58 +326,63 @@ def main():
 
 if __name__ == "__main__":
     main()"""
-                        
-                        try:
-                            create_result = await tools_manager.create_file(
-                                path="backend/example_script.py",
-                                content=file_content
-                            )
-                            
-                            if create_result["success"]:
-                                return {
-                                    "response": f"""✅ **Файл создан:** `{create_result['path']}`
+            
+            try:
+                create_result = await tools_manager.create_file(
+                    path="backend/example_script.py",
+                    content=file_content
+                )
+                
+                if create_result["success"]:
+                    return {
+                        "response": f"""✅ **Файл создан:** `{create_result['path']}`
 
 ```python
 {file_content}
 ```
 
 Файл успешно создан в проекте!""",
-                                    "agent_type": agent_type.value,
-                                    "created_files": [create_result["path"]],
-                                    "success": True
-                                }
-                        except Exception as e:
-                            print(f"Error creating Python file: {e}")
-                            # Continue to fallback
-                
-                # Выполнение команд
-                elif any(phrase in message_lower for phrase in ['выполни команду', 'запусти', 'установи', 'npm', 'pip', 'yarn', 'команду date', 'команду pwd', 'команду ls', 'date', 'pwd', 'ls']):
-                    # Безопасные команды для демо
-                    safe_commands = ['ls', 'pwd', 'echo', 'date', 'whoami', 'node --version', 'python --version']
-                    
-                    # Извлекаем команду из сообщения
-                    command = None
-                    for cmd in safe_commands:
-                        if cmd in message_lower:
-                            command = cmd  
-                            break
-                    
-                    # Альтернативный способ извлечения команды
-                    if not command:
-                        if 'date' in message_lower:
-                            command = 'date'
-                        elif 'pwd' in message_lower:
-                            command = 'pwd'
-                        elif 'ls' in message_lower:
-                            command = 'ls'
-                    
-                    if command:
-                        try:
-                            exec_result = await tools_manager.execute_bash(command)
-                            
-                            if exec_result["success"]:
-                                return {
-                                    "response": f"""💻 **Выполнена команда:** `{command}`
+                        "agent_type": agent_type.value,
+                        "created_files": [create_result["path"]],
+                        "success": True
+                    }
+            except Exception as e:
+                print(f"Error creating Python file: {e}")
+                # Continue to fallback
+        return None
+    
+    async def _handle_run_command(self, tools_manager: AgentToolsManager, message: str,
+                                  message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Выполнение команд"""
+        # Безопасные команды для демо
+        safe_commands = ['ls', 'pwd', 'echo', 'date', 'whoami', 'node --version', 'python --version']
+        
+        # Извлекаем команду из сообщения
+        command = None
+        for cmd in safe_commands:
+            if cmd in message_lower:
+                command = cmd  
+                break
+        
+        # Альтернативный способ извлечения команды
+        if not command:
+            if 'date' in message_lower:
+                command = 'date'
+            elif 'pwd' in message_lower:
+                command = 'pwd'
+            elif 'ls' in message_lower:
+                command = 'ls'
+        
+        if not command:
+            # Нечего выполнять - сообщение обработает агент
+            return None
+        
+        try:
+            exec_result = await tools_manager.execute_bash(command)
+            
+            if exec_result["success"]:
+                return {
+                    "response": f"""💻 **Выполнена команда:** `{command}`
 
 ```bash
 $ {command}
@@ -354,112 +390,112 @@ $ {command}
 ```
 
 Команда выполнена успешно!""",
-                                    "agent_type": agent_type.value,
-                                    "command_output": exec_result,
-                                    "success": True
-                                }
-                            else:
-                                return {
-                                    "response": f"""❌ **Ошибка выполнения команды:** `{command}`
+                    "agent_type": agent_type.value,
+                    "command_output": exec_result,
+                    "success": True
+                }
+            else:
+                return {
+                    "response": f"""❌ **Ошибка выполнения команды:** `{command}`
 
 ```
 {exec_result.get('stderr', exec_result.get('error', 'Unknown error'))}
 ```""",
-                                    "agent_type": agent_type.value,
-                                    "success": False
-                                }
-                        except Exception as e:
-                            print(f"Error executing command {command}: {e}")
-                            return {
-                                "response": f"""❌ **Ошибка выполнения команды:** `{command}`
+                    "agent_type": agent_type.value,
+                    "success": False
+                }
+        except Exception as e:
+            print(f"Error executing command {command}: {e}")
+            return {
+                "response": f"""❌ **Ошибка выполнения команды:** `{command}`
 
 ```
 {str(e)}
 ```""",
-                                "agent_type": agent_type.value,
-                                "success": False
-                            }
-                    else:
-                        return {
-                            "response": "⚠️ Команда не разрешена или не распознана. Доступны только безопасные команды для демонстрации.",
-                            "agent_type": agent_type.value,
-                            "success": False
-                        }
-                
-                # Просмотр файлов
-                elif any(phrase in message_lower for phrase in ['покажи файл', 'открой файл', 'содержимое файла']):
-                    # Ищем упоминание пути к файлу
-                    import re
-                    file_patterns = re.findall(r'[^\s]+\.[a-zA-Z]{2,4}', message)
-                    
-                    if file_patterns:
-                        file_path = file_patterns[0]
-                        try:
-                            view_result = await tools_manager.view_file(file_path)
-                            
-                            if view_result["success"]:
-                                return {
-                                    "response": f"""📄 **Содержимое файла:** `{file_path}`
+                "agent_type": agent_type.value,
+                "success": False
+            }
+    
+    async def _handle_view_file(self, tools_manager: AgentToolsManager, message: str,
+                                message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Просмотр файлов"""
+        # Ищем упоминание пути к файлу
+        file_patterns = re.findall(r'[^\s]+\.[a-zA-Z]{2,4}', message)
+        if not file_patterns:
+            return None
+        
+        file_path = file_patterns[0]
+        try:
+            view_result = await tools_manager.view_file(file_path)
+            
+            if view_result["success"]:
+                return {
+                    "response": f"""📄 **Содержимое файла:** `{file_path}`
 
 ```
 {view_result['content'][:1000]}{'...' if len(view_result['content']) > 1000 else ''}
 ```""",
-                                    "agent_type": agent_type.value,
-                                    "file_content": view_result,
-                                    "success": True
-                                }
-                        except Exception as e:
-                            print(f"Error viewing file {file_path}: {e}")
-                            # Continue to fallback
-                
-                # Генерация изображений
-                elif any(phrase in message_lower for phrase in ['создай изображение', 'генерируй картинку', 'нарисуй']):
-                    try:
-                        vision_result = await tools_manager.vision_expert_agent(message)
-                        
-                        if vision_result["success"]:
-                            return {
-                                "response": f"""🎨 **Изображение создано**
+                    "agent_type": agent_type.value,
+                    "file_content": view_result,
+                    "success": True
+                }
+        except Exception as e:
+            print(f"Error viewing file {file_path}: {e}")
+            # Continue to fallback
+        return None
+    
+    async def _handle_generate_image(self, tools_manager: AgentToolsManager, message: str,
+                                     message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Генерация изображений"""
+        try:
+            vision_result = await tools_manager.vision_expert_agent(message)
+            
+            if vision_result["success"]:
+                return {
+                    "response": f"""🎨 **Изображение создано**
 
 {vision_result['summary']}
 
 [Изображение будет отображено ниже]""",
-                                "agent_type": agent_type.value,
-                                "generated_images": vision_result.get("image_urls", []),
-                                "success": True
-                            }
-                    except Exception as e:
-                        print(f"Error generating image: {e}")
-                        # Continue to fallback
-                
-                # Интеграции
-                elif any(phrase in message_lower for phrase in ['интеграция', 'api', 'подключи', 'stripe', 'openai', 'gemini']):
-                    # Определяем тип интеграции
-                    integration_type = None
-                    for service in ['stripe', 'openai', 'gemini', 'anthropic']:
-                        if service in message_lower:
-                            integration_type = service
-                            break
-                    
-                    if integration_type:
-                        try:
-                            playbook_result = await tools_manager.integration_playbook_expert(
-                                integration=integration_type,
-                                constraints=""
-                            )
-                            
-                            if playbook_result["success"]:
-                                playbook = playbook_result["playbook"]
-                                response = f"""🔧 **Playbook для интеграции {integration_type.upper()}**
+                    "agent_type": agent_type.value,
+                    "generated_images": vision_result.get("image_urls", []),
+                    "success": True
+                }
+        except Exception as e:
+            print(f"Error generating image: {e}")
+            # Continue to fallback
+        return None
+    
+    async def _handle_integration(self, tools_manager: AgentToolsManager, message: str,
+                                  message_lower: str, agent_type: AgentType) -> Optional[Dict[str, Any]]:
+        """Интеграции"""
+        # Определяем тип интеграции
+        integration_type = None
+        for service in ['stripe', 'openai', 'gemini', 'anthropic']:
+            if service in message_lower:
+                integration_type = service
+                break
+        if not integration_type:
+            return None
+        
+        try:
+            playbook_result = await tools_manager.integration_playbook_expert(
+                integration=integration_type,
+                constraints=""
+            )
+            
+            if playbook_result["success"]:
+                playbook = playbook_result["playbook"]
+                response = f"""🔧 **Playbook для интеграции {integration_type.upper()}**
 
 **{playbook['title']}**
 
 **Шаги интеграции:**
 """
-                                for step in playbook["steps"]:
-                                    response += f"- {step}\n"
-                                
-                                response += f"""
+                for step in playbook["steps"]:
+                    response += f"- {step}\n"
+                
+                response += f"""
 **Пример кода:**
 ```python
 {playbook['code_example']}
@@ -467,37 +503,19 @@ $ {command}
 
 **Требуемые API ключи:**
 """
-                                for key in playbook["required_keys"]:
-                                    response += f"- {key}\n"
-                                
-                                return {
-                                    "response": response,
-                                    "agent_type": agent_type.value,
-                                    "integration_playbook": playbook,
-                                    "success": True
-                                }
-                        except Exception as e:
-                            print(f"Error generating integration playbook: {e}")
-                            # Continue to fallback
-                
-                # Если инструменты не применимы, используем стандартную обработку агентов
-                print(f"No specific tool matched for message: {message[:50]}...")
-                return await self.send_message(
-                    session_id="temp",
-                    message=message,
-                    agent_type=agent_type
-                )
+                for key in playbook["required_keys"]:
+                    response += f"- {key}\n"
                 
+                return {
+                    "response": response,
+                    "agent_type": agent_type.value,
+                    "integration_playbook": playbook,
+                    "success": True
+                }
         except Exception as e:
-            print(f"Critical error in process_message_with_tools: {e}")
-            import traceback
-            traceback.print_exc()
-            # Fallback to standard agent processing
-            return await self.send_message(
-                session_id="temp",
-                message=message,
-                agent_type=agent_type
-            )
+            print(f"Error generating integration playbook: {e}")
+            # Continue to fallback
+        return None
     
     async def _get_mock_response(self, message: str, agent_type: AgentType) -> str:
         """Generate mock responses for demo purposes"""
@@ -0,0 +1,81 @@
+"""
+API Key Cache - process-wide provider -> API key lookup
+Loaded at startup and refreshed by the /api-keys write endpoints
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+
+from database import APIKeyDB, AsyncReadSessionLocal
+
+# Environment variables used when a provider has no active key in the database
+ENV_KEY_MAPPING = {
+    "gemini": "GEMINI_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY"
+}
+
+
+class APIKeyCache:
+    """In-memory copy of the active rows of api_keys"""
+
+    def __init__(self):
+        self._keys: Dict[str, str] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def load(self):
+        """(Re)load all active keys from the database"""
+        async with self._lock:
+            async with AsyncReadSessionLocal() as db:
+                stmt = select(APIKeyDB.provider, APIKeyDB.api_key).where(APIKeyDB.is_active == 1)
+                result = await db.execute(stmt)
+                self._keys = {provider: api_key for provider, api_key in result.all()}
+            self._loaded = True
+
+    async def refresh(self):
+        """Reload after an api_keys write; on failure the next lookup reloads"""
+        try:
+            await self.load()
+        except Exception as e:
+            print(f"Error refreshing API key cache: {e}")
+            self.invalidate()
+
+    def invalidate(self):
+        self._loaded = False
+
+    async def get(self, provider: str) -> Optional[str]:
+        """Get the key for a provider, falling back to environment variables"""
+        if self._loaded:
+            self.hits += 1
+        else:
+            self.misses += 1
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Error getting API key for {provider}: {e}")
+
+        api_key = self._keys.get(provider)
+        if api_key:
+            return api_key
+
+        env_key = ENV_KEY_MAPPING.get(provider)
+        if env_key:
+            return os.environ.get(env_key)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "providers": len(self._keys),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+api_key_cache = APIKeyCache()
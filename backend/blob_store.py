@@ -0,0 +1,131 @@
+"""
+Blob Store - content-addressed, deduplicated storage for large message payloads
+Tool outputs and generated images above a size threshold are written once per
+distinct content under their SHA-256 and referenced from message metadata
+"""
+
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+import aiofiles
+
+HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+DATA_URL_PATTERN = re.compile(r"^data:(?P<type>[\w/+.-]+);base64,(?P<data>.*)$", re.DOTALL)
+
+# message_metadata keys that may hold large payloads
+SPILLABLE_KEYS = ("tool_results", "search_results", "command_output", "file_content", "integration_playbook")
+
+
+async def _write_atomic(path: str, data: bytes):
+    """Write under a unique temporary name and rename, so readers and concurrent
+    writers of the same content never see or clobber a partial file"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class BlobStore:
+    """Blobs live in <dir>/<hash[:2]>/<hash> with a <hash>.json sidecar for the content type"""
+
+    def __init__(self, directory: Optional[str] = None, inline_max_bytes: Optional[int] = None):
+        self.directory = directory or os.getenv("BLOB_STORE_DIR", "./.blob_store")
+        self.inline_max_bytes = (inline_max_bytes if inline_max_bytes is not None
+                                 else int(os.getenv("BLOB_INLINE_MAX_BYTES", "8192")))
+        self.writes = 0
+        self.deduplicated = 0
+
+    def path(self, blob_hash: str) -> str:
+        return os.path.join(self.directory, blob_hash[:2], blob_hash)
+
+    async def put(self, data: bytes, content_type: str) -> Dict[str, Any]:
+        """Store data (once per distinct content) and return its reference"""
+        blob_hash = hashlib.sha256(data).hexdigest()
+        path = self.path(blob_hash)
+        # The sidecar is written last, so it marks a complete blob
+        if os.path.exists(f"{path}.json"):
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not os.path.exists(path):
+                await _write_atomic(path, data)
+            sidecar = {"content_type": content_type, "size": len(data)}
+            await _write_atomic(f"{path}.json", json.dumps(sidecar).encode("utf-8"))
+            self.writes += 1
+        return {
+            "blob": blob_hash,
+            "size": len(data),
+            "content_type": content_type,
+            "url": f"/api/blobs/{blob_hash}"
+        }
+
+    async def lookup(self, blob_hash: str) -> Optional[Tuple[str, str]]:
+        """(path, content_type) of a stored blob, or None"""
+        if not HASH_PATTERN.match(blob_hash):
+            return None
+        path = self.path(blob_hash)
+        if not os.path.exists(path):
+            return None
+        try:
+            async with aiofiles.open(f"{path}.json", "r", encoding="utf-8") as f:
+                content_type = json.loads(await f.read()).get("content_type")
+        except OSError:
+            return None  # blob still being stored
+        except ValueError:
+            content_type = None
+        return path, content_type or "application/octet-stream"
+
+    async def spill(self, value: Any) -> Any:
+        """Replace a JSON value above the inline threshold with a blob reference"""
+        if value is None:
+            return value
+        data = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        if len(data) <= self.inline_max_bytes:
+            return value
+        return await self.put(data, "application/json")
+
+    async def spill_image(self, image: Any) -> Any:
+        """Replace a base64 data: URL with a reference to the decoded image"""
+        if not isinstance(image, str):
+            return image
+        match = DATA_URL_PATTERN.match(image)
+        if not match:
+            return image
+        try:
+            data = base64.b64decode(match.group("data"), validate=True)
+        except (binascii.Error, ValueError):
+            return image
+        return await self.put(data, match.group("type"))
+
+    async def externalize_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of message metadata with large payloads moved to the store"""
+        result = dict(metadata)
+        for key in SPILLABLE_KEYS:
+            if key in result:
+                result[key] = await self.spill(result[key])
+        if result.get("generated_images"):
+            result["generated_images"] = [await self.spill_image(image) for image in result["generated_images"]]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "writes": self.writes,
+            "deduplicated": self.deduplicated,
+            "inline_max_bytes": self.inline_max_bytes
+        }
+
+
+blob_store = BlobStore()
@@ -0,0 +1,156 @@
+"""
+Collaboration Hub - WebSocket fan-out of collaboration status per session
+Subscribers get a status snapshot on connect, then task and phase events as the
+collaboration manager reports them; each event is encoded once for all subscribers
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional, Set
+
+import orjson
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+
+from agents import AgentCollaborationManager
+from models import AgentCollaboration, AgentTask
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of the events a slow subscriber missed; it gets a fresh snapshot instead
+RESYNC = object()
+
+
+def _encode(message: Dict[str, Any]) -> str:
+    return orjson.dumps(jsonable_encoder(message)).decode("utf-8")
+
+
+def _task_payload(task: AgentTask) -> Dict[str, Any]:
+    """Task as shown by the UI (metadata, which can be large, is left out)"""
+    return task.model_dump(mode="json", exclude={"metadata"})
+
+
+class CollaborationHub:
+    """Per-session subscriber queues fed by AgentCollaborationManager listener events"""
+
+    def __init__(self, manager: AgentCollaborationManager, queue_size: Optional[int] = None):
+        self.manager = manager
+        self.queue_size = queue_size or int(os.getenv("COLLABORATION_WS_QUEUE_SIZE", "64"))
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.events_published = 0
+        self.messages_queued = 0
+        self.resyncs = 0
+        manager.add_listener(self._on_event)
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(session_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(session_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[session_id]
+
+    def _snapshot_message(self, session_id: str, collaboration: Optional[AgentCollaboration]) -> Dict[str, Any]:
+        if collaboration is None:
+            return {"type": "snapshot", "session_id": session_id, "status": None, "tasks": []}
+        return {
+            "type": "snapshot",
+            "session_id": session_id,
+            "status": self.manager.collaboration_status(collaboration),
+            "tasks": [_task_payload(task) for task in self.manager.active_tasks(collaboration)]
+        }
+
+    async def snapshot(self, session_id: str) -> str:
+        """Encoded snapshot of a session's collaboration (status null when there is none yet)"""
+        collaboration = await self.manager.get_collaboration(session_id)
+        return _encode(self._snapshot_message(session_id, collaboration))
+
+    def _on_event(self, event: str, collaboration: AgentCollaboration, task: AgentTask):
+        subscribers = self._subscribers.get(collaboration.session_id)
+        if not subscribers:
+            return
+
+        if event == "collaboration_created":
+            message = self._snapshot_message(collaboration.session_id, collaboration)
+        elif event == "phase_changed":
+            message = {
+                "type": event,
+                "session_id": collaboration.session_id,
+                "current_phase": collaboration.current_phase
+            }
+        else:
+            message = {
+                "type": event,
+                "session_id": collaboration.session_id,
+                "collaboration_id": collaboration.id,
+                "task": _task_payload(task),
+                **self.manager.task_counts(collaboration)
+            }
+            if event == "task_created":
+                message["active_agents"] = collaboration.active_agents
+                handoff = collaboration.handoffs[-1] if collaboration.handoffs else None
+                message["handoff"] = handoff if handoff and handoff.task_id == task.id else None
+
+        self.publish(collaboration.session_id, _encode(message))
+
+    def publish(self, session_id: str, message: str):
+        """Queue an encoded message for every subscriber of a session"""
+        self.events_published += 1
+        for queue in self._subscribers.get(session_id, ()):
+            try:
+                queue.put_nowait(message)
+                self.messages_queued += 1
+            except asyncio.QueueFull:
+                # Drop the backlog of a subscriber that cannot keep up; it resyncs from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+                self.resyncs += 1
+
+    async def serve(self, websocket: WebSocket, session_id: str):
+        """Stream a session's snapshot and events to an accepted WebSocket until it disconnects"""
+        queue = self.subscribe(session_id)
+        # Clients only listen; receiving is how a disconnect is noticed between events
+        receiver = asyncio.create_task(self._wait_for_disconnect(websocket))
+        try:
+            # Subscribed first, so nothing that happens while the snapshot is built is missed
+            await websocket.send_text(await self.snapshot(session_id))
+            while True:
+                getter = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver in done:
+                    getter.cancel()
+                    return
+                message = getter.result()
+                if message is RESYNC:
+                    message = await self.snapshot(session_id)
+                await websocket.send_text(message)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.warning(f"Collaboration WebSocket for {session_id} closed: {e}")
+        finally:
+            receiver.cancel()
+            self.unsubscribe(session_id, queue)
+
+    @staticmethod
+    async def _wait_for_disconnect(websocket: WebSocket):
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._subscribers),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+            "events_published": self.events_published,
+            "messages_queued": self.messages_queued,
+            "resyncs": self.resyncs
+        }
@@ -0,0 +1,265 @@
+"""
+Collaboration Store - write-behind persistence of agent collaborations
+The collaboration manager keeps serving reads from memory; changed collaborations,
+tasks and handoffs are marked dirty and upserted into the agent_* tables in batches.
+Collaborations the manager evicts are loaded back from those tables on demand
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database import (
+    AgentCollaborationDB, AgentHandoffDB, AgentTaskDB, AsyncReadSessionLocal, IS_SQLITE,
+    deserialize_json_field, serialize_json_field
+)
+from group_commit import commit_writer
+from models import AgentCollaboration, AgentHandoff, AgentTask
+
+logger = logging.getLogger(__name__)
+
+# Rows per upsert statement, well below the bound-parameter limits of SQLite and asyncpg
+UPSERT_CHUNK_ROWS = 100
+
+
+def _value(value: Any) -> Any:
+    """Enum members are stored by value"""
+    return getattr(value, "value", value)
+
+
+def _collaboration_row(collaboration: AgentCollaboration) -> Dict[str, Any]:
+    return {
+        "id": collaboration.id,
+        "project_id": collaboration.project_id,
+        "session_id": collaboration.session_id,
+        "active_agents": serialize_json_field([_value(agent) for agent in collaboration.active_agents]),
+        "current_phase": collaboration.current_phase,
+        "created_at": collaboration.created_at,
+        "updated_at": collaboration.updated_at
+    }
+
+
+def _task_row(collaboration_id: str, task: AgentTask) -> Dict[str, Any]:
+    return {
+        "id": task.id,
+        "collaboration_id": collaboration_id,
+        "agent_type": _value(task.agent_type),
+        "title": task.title,
+        "description": task.description,
+        "status": _value(task.status),
+        "priority": _value(task.priority),
+        "created_at": task.created_at,
+        "updated_at": task.updated_at,
+        "started_at": task.started_at,
+        "completed_at": task.completed_at,
+        "estimated_duration": task.estimated_duration,
+        "actual_duration": task.actual_duration,
+        "dependencies": serialize_json_field(list(task.dependencies)),
+        "deliverables": serialize_json_field(list(task.deliverables)),
+        "handoff_to": _value(task.handoff_to),
+        "project_id": task.project_id,
+        "session_id": task.session_id,
+        "task_metadata": serialize_json_field(dict(task.metadata))
+    }
+
+
+def _handoff_row(collaboration_id: str, handoff: AgentHandoff) -> Dict[str, Any]:
+    return {
+        "id": handoff.id,
+        "collaboration_id": collaboration_id,
+        "from_agent": _value(handoff.from_agent),
+        "to_agent": _value(handoff.to_agent),
+        "task_id": handoff.task_id,
+        "message": handoff.message,
+        "context": serialize_json_field(dict(handoff.context)),
+        "created_at": handoff.created_at,
+        "status": handoff.status
+    }
+
+
+def _upserts(model, rows: List[Dict[str, Any]]) -> List[Any]:
+    """INSERT ... ON CONFLICT (id) DO UPDATE statements for a batch of rows"""
+    insert = sqlite_insert if IS_SQLITE else postgresql_insert
+    statements = []
+    for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        stmt = insert(model).values(rows[start:start + UPSERT_CHUNK_ROWS])
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[model.id],
+            set_={name: stmt.excluded[name] for name in rows[0] if name != "id"}
+        ))
+    return statements
+
+
+class CollaborationStore:
+    """Tracks dirty collaboration state and flushes it on a fixed interval"""
+
+    def __init__(self, flush_interval_ms: Optional[float] = None):
+        flush_interval_ms = (flush_interval_ms if flush_interval_ms is not None
+                             else float(os.getenv("COLLABORATION_FLUSH_INTERVAL_MS", "1000")))
+        self.flush_interval = flush_interval_ms / 1000
+        # Rows are snapshotted when marked, so later edits simply mark them again
+        self._collaborations: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._handoffs: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    def mark_dirty(self, collaboration: AgentCollaboration,
+                   tasks: Iterable[AgentTask] = (), handoffs: Iterable[AgentHandoff] = ()):
+        """Queue the current state of a collaboration and the given tasks and handoffs"""
+        self._collaborations[collaboration.id] = _collaboration_row(collaboration)
+        for task in tasks:
+            self._tasks[task.id] = _task_row(collaboration.id, task)
+        for handoff in handoffs:
+            self._handoffs[handoff.id] = _handoff_row(collaboration.id, handoff)
+
+    @property
+    def dirty(self) -> int:
+        return len(self._collaborations) + len(self._tasks) + len(self._handoffs)
+
+    async def start(self):
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write out everything still dirty"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Upsert all dirty rows in one write unit; returns the number of rows written"""
+        async with self._flush_lock:
+            if not self.dirty:
+                return 0
+            collaborations, self._collaborations = self._collaborations, {}
+            tasks, self._tasks = self._tasks, {}
+            handoffs, self._handoffs = self._handoffs, {}
+
+            ops = []
+            for model, rows in ((AgentCollaborationDB, collaborations), (AgentTaskDB, tasks),
+                                (AgentHandoffDB, handoffs)):
+                if rows:
+                    ops.extend(_upserts(model, list(rows.values())))
+            try:
+                await commit_writer.write(ops)
+            except Exception as e:
+                # Put the rows back unless they were marked again meanwhile (newer snapshot wins)
+                logger.error(f"Collaboration flush failed, will retry: {e}")
+                self.failed_flushes += 1
+                for pending, failed in ((self._collaborations, collaborations), (self._tasks, tasks),
+                                        (self._handoffs, handoffs)):
+                    for row_id, row in failed.items():
+                        pending.setdefault(row_id, row)
+                return 0
+
+            written = len(collaborations) + len(tasks) + len(handoffs)
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    def is_dirty(self, collaboration_id: str) -> bool:
+        """Whether a collaboration has changes that are not yet in the database"""
+        return collaboration_id in self._collaborations
+
+    async def load(self, session_id: str) -> Optional[AgentCollaboration]:
+        """Rebuild the newest persisted collaboration of a session"""
+        async with AsyncReadSessionLocal() as db:
+            collaboration_db = (await db.execute(
+                select(AgentCollaborationDB).where(AgentCollaborationDB.session_id == session_id)
+                .order_by(AgentCollaborationDB.created_at.desc()).limit(1)
+            )).scalar_one_or_none()
+            if not collaboration_db:
+                return None
+            tasks_db = (await db.execute(
+                select(AgentTaskDB).where(AgentTaskDB.collaboration_id == collaboration_db.id)
+                .order_by(AgentTaskDB.created_at)
+            )).scalars().all()
+            handoffs_db = (await db.execute(
+                select(AgentHandoffDB).where(AgentHandoffDB.collaboration_id == collaboration_db.id)
+                .order_by(AgentHandoffDB.created_at)
+            )).scalars().all()
+
+        return AgentCollaboration(
+            id=collaboration_db.id,
+            project_id=collaboration_db.project_id,
+            session_id=collaboration_db.session_id,
+            active_agents=deserialize_json_field(collaboration_db.active_agents, "list"),
+            agent_tasks=[
+                AgentTask(
+                    id=task_db.id,
+                    agent_type=task_db.agent_type,
+                    title=task_db.title,
+                    description=task_db.description,
+                    status=task_db.status,
+                    priority=task_db.priority,
+                    created_at=task_db.created_at,
+                    updated_at=task_db.updated_at,
+                    started_at=task_db.started_at,
+                    completed_at=task_db.completed_at,
+                    estimated_duration=task_db.estimated_duration,
+                    actual_duration=task_db.actual_duration,
+                    dependencies=deserialize_json_field(task_db.dependencies, "list"),
+                    deliverables=deserialize_json_field(task_db.deliverables, "list"),
+                    handoff_to=task_db.handoff_to,
+                    project_id=task_db.project_id,
+                    session_id=task_db.session_id,
+                    metadata=deserialize_json_field(task_db.task_metadata)
+                )
+                for task_db in tasks_db
+            ],
+            handoffs=[
+                AgentHandoff(
+                    id=handoff_db.id,
+                    from_agent=handoff_db.from_agent,
+                    to_agent=handoff_db.to_agent,
+                    task_id=handoff_db.task_id,
+                    message=handoff_db.message,
+                    context=deserialize_json_field(handoff_db.context),
+                    created_at=handoff_db.created_at,
+                    status=handoff_db.status
+                )
+                for handoff_db in handoffs_db
+            ],
+            current_phase=collaboration_db.current_phase,
+            created_at=collaboration_db.created_at,
+            updated_at=collaboration_db.updated_at or collaboration_db.created_at or datetime.utcnow()
+        )
+
+    async def task_session_id(self, task_id: str) -> Optional[str]:
+        """Session of a persisted collaboration task"""
+        async with AsyncReadSessionLocal() as db:
+            return (await db.execute(
+                select(AgentCollaborationDB.session_id)
+                .join(AgentTaskDB, AgentTaskDB.collaboration_id == AgentCollaborationDB.id)
+                .where(AgentTaskDB.id == task_id)
+            )).scalar_one_or_none()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dirty": self.dirty,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failed_flushes": self.failed_flushes,
+            "flush_interval_ms": self.flush_interval * 1000
+        }
+
+
+collaboration_store = CollaborationStore()
@@ -0,0 +1,204 @@
+"""
+Crawl Cache - bounded on-disk cache of extracted crawl_tool results
+Entries are keyed by URL and extraction mode, honour Cache-Control / Expires,
+are revalidated with ETag / Last-Modified and evicted LRU by total bytes
+"""
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+import aiofiles
+
+
+class CrawlCache:
+    """LRU cache of crawl results stored as one JSON file per entry"""
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None,
+                 default_ttl: Optional[int] = None):
+        self.directory = directory or os.getenv("CRAWL_CACHE_DIR", "./.crawl_cache")
+        self.max_bytes = (max_bytes if max_bytes is not None
+                          else int(os.getenv("CRAWL_CACHE_MAX_BYTES", str(50 * 1024 * 1024))))
+        self.default_ttl = default_ttl if default_ttl is not None else int(os.getenv("CRAWL_CACHE_DEFAULT_TTL", "300"))
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size in bytes, LRU first
+        self._total_bytes = 0
+        self._loaded = False
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(url: str, mode: str) -> str:
+        return hashlib.sha256(f"{mode}\n{url}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _ensure_loaded(self):
+        """Rebuild the LRU index from the files left by a previous process"""
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+        self._loaded = True
+        self._evict()
+
+    async def get(self, url: str, mode: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry (fresh or stale) or None
+
+        Fresh entries count as hits and missing ones as misses; a stale entry
+        is counted once its revalidation outcome is known.
+        """
+        self._ensure_loaded()
+        key = self.make_key(url, mode)
+        if key not in self._index:
+            self.misses += 1
+            return None
+        try:
+            async with aiofiles.open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.loads(await f.read())
+        except (OSError, ValueError):
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        if self.is_fresh(entry):
+            self.hits += 1
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return entry.get("expires_at", 0) > time.time()
+
+    @staticmethod
+    def validators(entry: Dict[str, Any]) -> Dict[str, str]:
+        """Conditional request headers for revalidating a stale entry"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _expires_at(self, headers: Mapping[str, str]) -> Optional[float]:
+        """Expiry time from response headers, or None if the response must not be stored"""
+        now = time.time()
+        directives = {}
+        for part in headers.get("Cache-Control", "").lower().split(","):
+            name, _, value = part.strip().partition("=")
+            if name:
+                directives[name] = value.strip('"')
+
+        if "no-store" in directives:
+            return None
+        if "no-cache" in directives:
+            return now
+        if "max-age" in directives:
+            try:
+                return now + max(0, int(directives["max-age"]))
+            except ValueError:
+                return now
+
+        if headers.get("Expires"):
+            try:
+                return parsedate_to_datetime(headers["Expires"]).timestamp()
+            except (TypeError, ValueError):
+                return now
+
+        # Heuristic freshness: 10% of the document's age, capped at the default TTL
+        if headers.get("Last-Modified"):
+            try:
+                age = now - parsedate_to_datetime(headers["Last-Modified"]).timestamp()
+                return now + min(self.default_ttl, max(0, age * 0.1))
+            except (TypeError, ValueError):
+                pass
+        return now + self.default_ttl
+
+    async def put(self, url: str, mode: str, result: Dict[str, Any], headers: Mapping[str, str]):
+        """Store an extracted result unless the response forbids it"""
+        key = self.make_key(url, mode)
+        if key in self._index:
+            # Replacing a stale entry whose content changed upstream
+            self.misses += 1
+        expires_at = self._expires_at(headers)
+        if expires_at is None:
+            self._remove(key)
+            return
+        entry = {
+            "url": url,
+            "mode": mode,
+            "result": result,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "expires_at": expires_at,
+            "stored_at": time.time()
+        }
+        await self._write(key, entry)
+
+    async def revalidated(self, entry: Dict[str, Any], headers: Mapping[str, str]) -> Dict[str, Any]:
+        """Refresh a stale entry after a 304 Not Modified response"""
+        self.revalidations += 1
+        expires_at = self._expires_at(headers)
+        entry["expires_at"] = expires_at if expires_at is not None else time.time()
+        entry["etag"] = headers.get("ETag") or entry.get("etag")
+        entry["last_modified"] = headers.get("Last-Modified") or entry.get("last_modified")
+        await self._write(self.make_key(entry["url"], entry["mode"]), entry)
+        return entry
+
+    async def _write(self, key: str, entry: Dict[str, Any]):
+        self._ensure_loaded()
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        # Unique per writer: concurrent crawls of one URL must not share a temporary file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        self._total_bytes += len(data) - self._index.pop(key, 0)
+        self._index[key] = len(data)
+        self._evict()
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._index:
+            self._remove(next(iter(self._index)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "revalidations": self.revalidations,
+            "misses": self.misses
+        }
+
+
+crawl_cache = CrawlCache()
@@ -1,21 +1,129 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, JSON
+from sqlalchemy import create_engine, event, make_url, Column, String, DateTime, Integer, Text, JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base  
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from datetime import datetime
 import json
 import os
 
-# SQLite database URL
-DATABASE_URL = "sqlite+aiosqlite:///./emergent_clone.db"
+import orjson
 
-# Create async engine
-engine = create_async_engine(DATABASE_URL, echo=False)
+from migrations import run_migrations
 
-# Create session factory
+
+def _normalize_database_url(url: str) -> str:
+    """Map postgres:// URLs (as set by fly.io) to the asyncpg driver"""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            url = "postgresql+asyncpg://" + url[len(prefix):]
+    parsed = make_url(url)
+    if parsed.drivername != "postgresql+asyncpg":
+        return url
+    # asyncpg takes `ssl` instead of libpq's `sslmode`
+    query = dict(parsed.query)
+    sslmode = query.pop("sslmode", None)
+    if sslmode and sslmode != "disable":
+        query["ssl"] = sslmode
+    query.setdefault("prepared_statement_cache_size", os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+    return parsed.set(query=query).render_as_string(hide_password=False)
+
+
+# Database URL: SQLite file by default, PostgreSQL (asyncpg) when configured
+DATABASE_URL = _normalize_database_url(os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./emergent_clone.db"))
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite engine profile, applied to every new connection
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+}
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+
+# PostgreSQL pool, shared by reads and writes (the server handles concurrency)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Length of chat_sessions.last_message_preview
+SESSION_PREVIEW_CHARS = int(os.getenv("SESSION_PREVIEW_CHARS", "200"))
+
+
+def _apply_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+if IS_SQLITE:
+    # Create async engine: a single writer connection, so writes queue in the pool
+    # instead of contending for the database lock
+    engine = create_async_engine(
+        DATABASE_URL, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=1, max_overflow=0
+    )
+    
+    # Read-only pool for GET endpoints; in WAL mode readers never wait on the writer
+    read_engine = create_async_engine(
+        DATABASE_URL, echo=False, poolclass=AsyncAdaptedQueuePool, pool_size=DB_READ_POOL_SIZE, max_overflow=0
+    )
+    
+    @event.listens_for(engine.sync_engine, "connect")
+    def _configure_writer(dbapi_connection, connection_record):
+        _apply_pragmas(dbapi_connection, SQLITE_PRAGMAS)
+    
+    @event.listens_for(read_engine.sync_engine, "connect")
+    def _configure_reader(dbapi_connection, connection_record):
+        # journal_mode is persistent and owned by the writer
+        pragmas = {name: value for name, value in SQLITE_PRAGMAS.items() if name != "journal_mode"}
+        _apply_pragmas(dbapi_connection, {**pragmas, "query_only": "ON"})
+else:
+    engine = create_async_engine(
+        DATABASE_URL,
+        echo=False,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args={"statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))}
+    )
+    read_engine = engine
+
+
+# Create session factories
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+AsyncReadSessionLocal = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+class JSONText(TypeDecorator):
+    """JSON column: TEXT on SQLite, native JSONB on PostgreSQL
+    
+    Callers keep writing JSON strings from serialize_json_field. On PostgreSQL
+    they are stored as JSONB and read back already decoded, which
+    deserialize_json_field passes through.
+    """
+    impl = Text
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return dialect.type_descriptor(Text())
+    
+    def process_bind_param(self, value, dialect):
+        if dialect.name == "postgresql":
+            return json.loads(value) if isinstance(value, str) else value
+        return json.dumps(value) if isinstance(value, (dict, list)) else value
+
 
 # Create base class for models
 Base = declarative_base()
@@ -32,7 +140,14 @@ class ChatSessionDB(Base):
     active_agent = Column(String, default="main_assistant")
     model_provider = Column(String, default="gemini")
     model_name = Column(String, default="gemini-2.0-flash")
-    context = Column(Text, default="{}")  # JSON as text
+    context = Column(JSONText, default="{}")  # JSON
+    # Denormalized from chat_messages, maintained in the same unit as each exchange's messages
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime, nullable=True)
+    last_agent = Column(String, nullable=True)
+    last_message_preview = Column(String, nullable=True)  # first SESSION_PREVIEW_CHARS characters
+    
+    __table_args__ = (Index("ix_chat_sessions_updated_at", "updated_at"),)
 
 
 class ChatMessageDB(Base):
@@ -44,8 +159,10 @@ class ChatMessageDB(Base):
     content = Column(Text, nullable=False)
     agent_type = Column(String, nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    message_metadata = Column(Text, default="{}")  # JSON as text
-    suggested_actions = Column(Text, default="[]")  # JSON array as text
+    message_metadata = Column(JSONText, default="{}")  # JSON
+    suggested_actions = Column(JSONText, default="[]")  # JSON array
+    
+    __table_args__ = (Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),)
 
 
 class ProjectDB(Base):
@@ -59,11 +176,13 @@ class ProjectDB(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
     progress = Column(Integer, default=0)
-    tech_stack = Column(Text, default="[]")  # JSON array as text
+    tech_stack = Column(JSONText, default="[]")  # JSON array
     repository_url = Column(String, nullable=True)
     deployment_url = Column(String, nullable=True)
     chat_session_id = Column(String, nullable=True)
-    project_metadata = Column(Text, default="{}")  # JSON as text
+    project_metadata = Column(JSONText, default="{}")  # JSON
+    
+    __table_args__ = (Index("ix_projects_updated_at", "updated_at"),)
 
 
 class AppTemplateDB(Base):
@@ -76,8 +195,8 @@ class AppTemplateDB(Base):
     color = Column(String, nullable=False)
     category = Column(String, nullable=False)
     prompt = Column(Text, nullable=False)
-    tech_stack = Column(Text, default="[]")  # JSON array as text
-    features = Column(Text, default="[]")  # JSON array as text
+    tech_stack = Column(JSONText, default="[]")  # JSON array
+    features = Column(JSONText, default="[]")  # JSON array
 
 
 class AgentTaskDB(Base):
@@ -95,12 +214,15 @@ class AgentTaskDB(Base):
     completed_at = Column(DateTime, nullable=True)
     estimated_duration = Column(Integer, nullable=True)
     actual_duration = Column(Integer, nullable=True)
-    dependencies = Column(Text, default="[]")  # JSON array as text
-    deliverables = Column(Text, default="[]")  # JSON array as text
+    dependencies = Column(JSONText, default="[]")  # JSON array
+    deliverables = Column(JSONText, default="[]")  # JSON array
     handoff_to = Column(String, nullable=True)
     project_id = Column(String, nullable=True)
     session_id = Column(String, nullable=True)
-    task_metadata = Column(Text, default="{}")  # JSON as text
+    task_metadata = Column(JSONText, default="{}")  # JSON
+    collaboration_id = Column(String, nullable=True)
+    
+    __table_args__ = (Index("ix_agent_tasks_collaboration_id", "collaboration_id"),)
 
 
 class AgentHandoffDB(Base):
@@ -111,9 +233,12 @@ class AgentHandoffDB(Base):
     to_agent = Column(String, nullable=False)
     task_id = Column(String, nullable=False)
     message = Column(Text, nullable=False)
-    context = Column(Text, default="{}")  # JSON as text
+    context = Column(JSONText, default="{}")  # JSON
     created_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="pending")
+    collaboration_id = Column(String, nullable=True)
+    
+    __table_args__ = (Index("ix_agent_handoffs_collaboration_id", "collaboration_id"),)
 
 
 class AgentCollaborationDB(Base):
@@ -122,10 +247,12 @@ class AgentCollaborationDB(Base):
     id = Column(String, primary_key=True)
     project_id = Column(String, nullable=False)
     session_id = Column(String, nullable=False)
-    active_agents = Column(Text, default="[]")  # JSON array as text
+    active_agents = Column(JSONText, default="[]")  # JSON array
     current_phase = Column(String, default="planning")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (Index("ix_agent_collaborations_session_created", "session_id", "created_at"),)
 
 
 class APIKeyDB(Base):
@@ -138,7 +265,23 @@ class APIKeyDB(Base):
     is_active = Column(Integer, default=1)  # SQLite doesn't have boolean, use integer
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow)
-    key_metadata = Column(Text, default="{}")  # JSON as text
+    key_metadata = Column(JSONText, default="{}")  # JSON
+    
+    __table_args__ = (Index("ix_api_keys_provider_active", "provider", "is_active"),)
+
+
+class AgentJobDB(Base):
+    __tablename__ = "agent_jobs"
+    
+    id = Column(String, primary_key=True)
+    status = Column(String, default="queued")  # queued, running, completed, failed
+    session_id = Column(String, nullable=True)
+    request = Column(JSONText, default="{}")  # JSON
+    result = Column(JSONText, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
 
 
 # Database dependency
@@ -150,10 +293,31 @@ async def get_db():
             await session.close()
 
 
-# Create tables
+# Read-only database dependency for GET endpoints
+async def get_read_db():
+    async with AsyncReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+# Create tables and apply pending schema migrations
 async def create_tables():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        return await conn.run_sync(run_migrations, Base.metadata)
+
+
+# Close pooled connections on shutdown (lets SQLite checkpoint the WAL)
+async def dispose_engines():
+    if read_engine is not engine:
+        await read_engine.dispose()
+    await engine.dispose()
+
+
+def message_preview(content):
+    """Truncated message text stored as a session's last_message_preview"""
+    return content[:SESSION_PREVIEW_CHARS] if content else content
 
 
 # Helper functions for JSON serialization
@@ -168,7 +332,10 @@ def deserialize_json_field(value, default_type="dict"):
     """Convert JSON string to Python object"""
     if not value:
         return {} if default_type == "dict" else []
+    if isinstance(value, (dict, list)):
+        # JSONB columns come back decoded
+        return value
     try:
-        return json.loads(value)
-    except (json.JSONDecodeError, TypeError):
+        return orjson.loads(value)
+    except (orjson.JSONDecodeError, TypeError):
         return {} if default_type == "dict" else []
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Fast JSON - list responses encoded straight from database rows
+A page of row dicts is validated in one TypeAdapter pass and encoded with orjson,
+skipping per-row model construction and FastAPI's response_model re-validation
+"""
+
+from typing import Any, Dict, List, Mapping, Optional, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+_adapters: Dict[Type[BaseModel], TypeAdapter] = {}
+
+
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Cached TypeAdapter for List[model]; building one compiles a validator"""
+    adapter = _adapters.get(model)
+    if adapter is None:
+        adapter = _adapters[model] = TypeAdapter(List[model])
+    return adapter
+
+
+def list_response(model: Type[BaseModel], rows: List[Mapping[str, Any]],
+                  headers: Optional[Dict[str, str]] = None) -> ORJSONResponse:
+    """Validate rows as List[model] in bulk and return them as an orjson response"""
+    adapter = list_adapter(model)
+    items = adapter.validate_python(rows)
+    return ORJSONResponse(adapter.dump_python(items), headers=headers)
+
+
+if __name__ == "__main__":
+    # Benchmark: 10k-message page, per-row models + stdlib encoder vs bulk TypeAdapter + orjson
+    import json
+    import time
+    from datetime import datetime
+
+    from fastapi.encoders import jsonable_encoder
+
+    from database import deserialize_json_field
+    from models import ChatMessage
+
+    rows = [
+        {
+            "id": f"msg_{i}",
+            "session_id": "session",
+            "role": "assistant",
+            "content": "def main():\n    print('Hello, World!')\n" * 10,
+            "agent_type": "fullstack_developer",
+            "timestamp": datetime.utcnow(),
+            "message_metadata": '{"created_files": ["app.py"], "success": true, "tool_results": []}',
+            "suggested_actions": '["Run tests", "Deploy"]'
+        }
+        for i in range(10_000)
+    ]
+
+    def before() -> bytes:
+        messages = [
+            ChatMessage(
+                id=row["id"], session_id=row["session_id"], role=row["role"], content=row["content"],
+                agent_type=row["agent_type"], timestamp=row["timestamp"],
+                metadata=deserialize_json_field(row["message_metadata"]),
+                suggested_actions=deserialize_json_field(row["suggested_actions"], "list")
+            )
+            for row in rows
+        ]
+        # What FastAPI does with a response_model: validate again, then jsonable_encoder + json.dumps
+        validated = list_adapter(ChatMessage).validate_python([message.model_dump() for message in messages])
+        return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    def after() -> bytes:
+        page = [
+            {
+                "id": row["id"], "session_id": row["session_id"], "role": row["role"], "content": row["content"],
+                "agent_type": row["agent_type"], "timestamp": row["timestamp"],
+                "metadata": deserialize_json_field(row["message_metadata"]),
+                "suggested_actions": deserialize_json_field(row["suggested_actions"], "list")
+            }
+            for row in rows
+        ]
+        return list_response(ChatMessage, page).body
+
+    for label, func in (("before", before), ("after", after)):
+        func()
+        started = time.perf_counter()
+        for _ in range(5):
+            body = func()
+        print(f"{label:<7} {(time.perf_counter() - started) / 5 * 1000:8.1f} ms  {len(body) / 1e6:.1f} MB")
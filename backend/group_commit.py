@@ -0,0 +1,152 @@
+"""
+Group Commit Writer - batches write units from concurrent requests into one commit
+Each unit is the full set of writes for one chat exchange; units arriving within
+a few milliseconds of each other share a single SQLite transaction (and fsync)
+"""
+
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
+
+from database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class GroupCommitWriter:
+    """Single background writer that commits queued units in batches"""
+
+    def __init__(self, window_ms: Optional[float] = None, max_batch: Optional[int] = None):
+        window_ms = window_ms if window_ms is not None else float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+        self.window = window_ms / 1000
+        self.max_batch = max_batch or int(os.getenv("GROUP_COMMIT_MAX_BATCH", "64"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.units = 0
+        self.max_batch_size = 0
+        self.fallbacks = 0
+        self._histogram: Counter = Counter()
+
+    async def start(self):
+        if self._task:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Commit everything already queued, then stop the writer"""
+        if not self._task:
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def write(self, ops: Sequence[Any]):
+        """Persist one unit of work: ORM objects to add and/or statements to execute
+
+        Returns once the unit is committed. Without a running writer (scripts,
+        one-off tools) the unit is committed on its own.
+        """
+        if not self._task:
+            await self._commit([ops])
+            self._record(1)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((ops, future))
+        # shield: a cancelled request must not drop a unit the writer already holds
+        await asyncio.shield(future)
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            if self.window:
+                # Give concurrent requests a moment to join this commit
+                await asyncio.sleep(self.window)
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Tuple[Sequence[Any], asyncio.Future]]):
+        try:
+            await self._commit([ops for ops, _ in batch])
+            self._record(len(batch))
+            outcomes = [None] * len(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                outcomes = [e]
+            else:
+                # Retry unit by unit so one bad unit does not fail its neighbours
+                logger.warning(f"Group commit of {len(batch)} units failed, retrying individually: {e}")
+                self.fallbacks += 1
+                outcomes = []
+                for ops, _ in batch:
+                    try:
+                        await self._commit([ops])
+                        self._record(1)
+                        outcomes.append(None)
+                    except Exception as unit_error:
+                        outcomes.append(unit_error)
+
+        for (_, future), outcome in zip(batch, outcomes):
+            if future.done():
+                continue
+            if outcome is None:
+                future.set_result(None)
+            else:
+                future.set_exception(outcome)
+
+    @staticmethod
+    async def _commit(units: List[Sequence[Any]]):
+        async with AsyncSessionLocal() as db:
+            for ops in units:
+                await GroupCommitWriter._apply(db, ops)
+            await db.commit()
+
+    @staticmethod
+    async def _apply(db: AsyncSession, ops: Sequence[Any]):
+        for op in ops:
+            if isinstance(op, Executable):
+                await db.execute(op)
+            else:
+                db.add(op)
+
+    def _record(self, size: int):
+        self.commits += 1
+        self.units += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        bucket = next((f"<={bound}" for bound in BATCH_SIZE_BUCKETS if size <= bound),
+                      f">{BATCH_SIZE_BUCKETS[-1]}")
+        self._histogram[bucket] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "commits": self.commits,
+            "units": self.units,
+            "avg_batch_size": round(self.units / self.commits, 2) if self.commits else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_histogram": dict(self._histogram),
+            "pending": self._queue.qsize() if self._queue else 0,
+            "fallbacks": self.fallbacks
+        }
+
+
+commit_writer = GroupCommitWriter()
@@ -0,0 +1,112 @@
+"""
+HTML Extraction Engine - извлечение контента страниц вне event loop
+Тело ответа читается потоково с лимитом байт, парсинг lxml выполняется в пуле потоков
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import lxml.html
+from lxml import etree
+
+MAX_BODY_BYTES = int(os.getenv("CRAWL_MAX_BODY_BYTES", str(2 * 1024 * 1024)))
+MAX_TEXT_CHARS = 5000
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_capped(response: aiohttp.ClientResponse, max_bytes: int = MAX_BODY_BYTES) -> Tuple[str, bool]:
+    """Read at most max_bytes of the body; returns (text, truncated)"""
+    chunks = []
+    size = 0
+    truncated = False
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            truncated = size > max_bytes or not response.content.at_eof()
+            break
+    body = b"".join(chunks)[:max_bytes]
+
+    try:
+        encoding = response.get_encoding()
+    except Exception:
+        encoding = "utf-8"
+    return body.decode(encoding, errors="replace"), truncated
+
+
+def _collapse(text: str) -> str:
+    return " ".join(text.split())
+
+
+def extract_html(html: str, mode: str, max_chars: int = MAX_TEXT_CHARS) -> Dict[str, Any]:
+    """Extract title plus links/images/title/text content from an HTML document
+
+    Text extraction walks the text nodes and stops as soon as the collapsed
+    output exceeds max_chars instead of materialising the whole page text.
+    """
+    try:
+        doc = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return {"title": "", "content": "No title found" if mode == "title" else ""}
+
+    # Удалить скрипты и стили
+    etree.strip_elements(doc, "script", "style", with_tail=False)
+    title = (doc.findtext(".//title") or "").strip()
+
+    if mode == "title":
+        content = title or "No title found"
+    elif mode == "links":
+        links = [{"text": _collapse(a.text_content()), "href": a.get("href")}
+                 for a in doc.iter("a") if a.get("href") is not None]
+        content = json.dumps(links, indent=2, ensure_ascii=False)
+    elif mode == "images":
+        images = [{"alt": img.get("alt", ""), "src": img.get("src")}
+                  for img in doc.iter("img") if img.get("src") is not None]
+        content = json.dumps(images, indent=2, ensure_ascii=False)
+    else:
+        body = doc.find("body")
+        pieces = []
+        raw_size = 0
+        next_check = max_chars
+        truncated = False
+        for piece in (body if body is not None else doc).itertext():
+            pieces.append(piece)
+            raw_size += len(piece)
+            # Collapsed text is never longer than the raw text, so only
+            # re-check the budget each time the raw size passes a multiple of it
+            if raw_size >= next_check:
+                if len(_collapse("".join(pieces))) > max_chars:
+                    truncated = True
+                    break
+                next_check += max_chars
+        content = _collapse("".join(pieces))
+        if truncated or len(content) > max_chars:
+            content = content[:max_chars] + "... (content truncated)"
+
+    return {"title": title, "content": content}
+
+
+class ExtractionEngine:
+    """Runs extract_html on a small thread pool so parsing never blocks the event loop"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = workers or int(os.getenv("CRAWL_EXTRACT_WORKERS", "2"))
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def extract(self, html: str, mode: str, max_chars: int = MAX_TEXT_CHARS) -> Dict[str, Any]:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="html-extract")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, extract_html, html, mode, max_chars)
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+extraction_engine = ExtractionEngine()
@@ -0,0 +1,42 @@
+"""
+HTTP Client Pool - one aiohttp ClientSession shared by all agent tools
+Opened in the FastAPI startup hook so TCP/TLS connections and DNS lookups are reused
+"""
+
+import os
+from typing import Optional
+
+import aiohttp
+
+
+class HttpClientPool:
+    """Application-lifetime aiohttp session with a tuned connector"""
+
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self):
+        if self._session and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=int(os.getenv("HTTP_POOL_LIMIT", "100")),
+            limit_per_host=int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "8")),
+            ttl_dns_cache=int(os.getenv("HTTP_DNS_CACHE_TTL", "300")),
+            keepalive_timeout=float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self) -> Optional[aiohttp.ClientSession]:
+        """The shared session, or None when the pool is not running"""
+        if self._session and not self._session.closed:
+            return self._session
+        return None
+
+
+http_pool = HttpClientPool()
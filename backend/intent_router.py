@@ -0,0 +1,151 @@
+"""
+Intent Router - выбор инструмента для сообщения за один проход
+Все фразы-триггеры всех инструментов компилируются в одно регулярное выражение
+"""
+
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+# Фразы-триггеры инструментов в порядке приоритета (он решает ничьи по очкам)
+TOOL_TRIGGER_PHRASES: List[Tuple[str, List[str]]] = [
+    ("web_analysis", ['анализ', 'сайт', 'https://', 'http://', 'веб-страниц', 'проанализируй']),
+    ("web_search", ['найди', 'поиск', 'ищи', 'search']),
+    ("create_file", ['создай файл', 'создать файл', 'напиши код', 'создай проект']),
+    ("run_command", ['выполни команду', 'запусти', 'установи', 'npm', 'pip', 'yarn',
+                     'команду date', 'команду pwd', 'команду ls', 'date', 'pwd', 'ls']),
+    ("view_file", ['покажи файл', 'открой файл', 'содержимое файла']),
+    ("generate_image", ['создай изображение', 'генерируй картинку', 'нарисуй']),
+    ("integration", ['интеграция', 'api', 'подключи', 'stripe', 'openai', 'gemini']),
+]
+
+# Intents after the best one are tried only on a match this strong: a weak
+# secondary match must not take over a message whose best handler declined it
+STRONG_MATCH_SCORE = 2
+
+
+def _trie_pattern(phrases: Sequence[str]) -> str:
+    """Regex for a set of phrases with common prefixes factored out
+
+    A plain "a|b|c" alternation is retried branch by branch at every
+    position; the trie form decides on each character once, so the scan
+    no longer slows down as more phrases are added.
+    """
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A phrase ends here: the greedy "?" still prefers the longer continuation
+        return "(?:" + body + ")?" if "" in node else body
+
+    return build(trie)
+
+
+class IntentRouter:
+    """Scores every intent with a single scan of the message
+
+    Phrases keep the substring semantics of the old `phrase in message`
+    checks, so a phrase is also found inside longer words. The cost of a scan
+    depends on the message length, not on how many tools are registered.
+    """
+
+    def __init__(self, intents: Sequence[Tuple[str, Sequence[str]]]):
+        self.priority = {name: index for index, (name, _) in enumerate(intents)}
+        self._phrase_intents: Dict[str, List[str]] = {}
+        for name, phrases in intents:
+            for phrase in phrases:
+                self._phrase_intents.setdefault(phrase.lower(), []).append(name)
+
+        alternatives = list(self._phrase_intents)
+        self._pattern = re.compile(_trie_pattern(alternatives))
+        # Matches do not overlap, so a phrase contained in a longer matched one
+        # ("ls" in "команду ls") is credited through the longer phrase
+        self._implied: Dict[str, List[str]] = {
+            phrase: [other for other in alternatives if other != phrase and other in phrase]
+            for phrase in alternatives
+        }
+
+    def score(self, message: str) -> Dict[str, int]:
+        """Number of distinct trigger phrases found per intent"""
+        found = set()
+        for match in self._pattern.finditer(message.lower()):
+            phrase = match.group()
+            found.add(phrase)
+            found.update(self._implied[phrase])
+
+        scores: Counter = Counter()
+        for phrase in found:
+            for name in self._phrase_intents[phrase]:
+                scores[name] += 1
+        return dict(scores)
+
+    def route(self, message: str) -> List[str]:
+        """Matched intents, best first: by score, then by priority"""
+        scores = self.score(message)
+        return sorted(scores, key=lambda name: (-scores[name], self.priority[name]))
+
+    def candidates(self, message: str) -> List[str]:
+        """Intents to try in turn: the best match, then the other strong matches
+
+        When none of them produces a result the message goes to the agent.
+        """
+        scores = self.score(message)
+        ranked = sorted(scores, key=lambda name: (-scores[name], self.priority[name]))
+        return ranked[:1] + [name for name in ranked[1:] if scores[name] >= STRONG_MATCH_SCORE]
+
+
+tool_router = IntentRouter(TOOL_TRIGGER_PHRASES)
+
+
+if __name__ == "__main__":
+    # Микро-бенчмарк: один проход регулярным выражением против каскада any(...)
+    import timeit
+
+    corpus = [
+        "Проанализируй сайт https://example.com и https://github.com",
+        "Найди лучшие практики FastAPI",
+        "search for react hooks tutorial",
+        "Создай файл с React компонентом",
+        "Напиши код на python для парсинга CSV",
+        "Выполни команду date",
+        "запусти npm install",
+        "Покажи файл backend/server.py",
+        "Нарисуй логотип для стартапа",
+        "Интеграция stripe для оплаты",
+        "Подключи OpenAI API к проекту",
+        "Создай приложение телеграм магазин кроссовок",
+        "Привет! Как дела?",
+        "Build a todo app with user authentication and a dashboard",
+        "What can you do for my project?",
+        "Разработай сайт-визитку для фотографа с галереей",
+    ]
+
+    def make_cascade(table):
+        def cascade(message: str) -> str:
+            message_lower = message.lower()
+            for name, phrases in table:
+                if any(phrase in message_lower for phrase in phrases):
+                    return name
+            return ""
+        return cascade
+
+    for message in corpus:
+        print(f"{message[:50]:<52} router={tool_router.candidates(message)}")
+
+    # Добавляем синтетические инструменты, чтобы показать рост стоимости каскада
+    rounds = 1000
+    for extra in (0, 21, 93):
+        table = TOOL_TRIGGER_PHRASES + [
+            (f"tool_{i}", [f"инструмент{i} ", f"tool{i} ", f"вызови {i}-й"]) for i in range(extra)
+        ]
+        for label, func in (("cascade", make_cascade(table)), ("router", IntentRouter(table).route)):
+            seconds = timeit.timeit(lambda: [func(m) for m in corpus], number=rounds)
+            print(f"{len(table):>3} tools  {label:<8} {seconds / (rounds * len(corpus)) * 1e6:.2f} us/message")
@@ -0,0 +1,137 @@
+"""
+Agent Job Queue - bounded in-process worker pool for long-running agent runs
+Jobs are tracked in the agent_jobs table so status and results can be polled
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from database import AgentJobDB, AsyncReadSessionLocal, AsyncSessionLocal, serialize_json_field
+from models import JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFullError(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs"""
+
+
+class AgentJobQueue:
+    """Runs submitted jobs on a fixed number of asyncio workers"""
+
+    def __init__(self, runner: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.runner = runner
+        self.workers = workers or int(os.getenv("AGENT_JOB_WORKERS", "2"))
+        self.max_pending = max_pending or int(os.getenv("AGENT_JOB_QUEUE_SIZE", "100"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._reserved = 0  # slots held by submits whose job row is still being inserted
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start the worker pool and fail jobs orphaned by a previous process"""
+        async with AsyncSessionLocal() as db:
+            stmt = update(AgentJobDB).where(
+                AgentJobDB.status.in_([JobStatus.QUEUED.value, JobStatus.RUNNING.value])
+            ).values(
+                status=JobStatus.FAILED.value,
+                error="Interrupted by server restart",
+                completed_at=datetime.utcnow()
+            )
+            await db.execute(stmt)
+            await db.commit()
+
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(f"Agent job queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs are failed on the next start"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() + self._reserved if self._queue else 0
+
+    async def submit(self, payload: Dict[str, Any], session_id: Optional[str] = None) -> str:
+        """Record a new job and queue it; returns the job id"""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if self._queue.qsize() + self._reserved >= self.max_pending:
+            raise JobQueueFullError(f"Job queue is full ({self.max_pending} pending jobs)")
+
+        # Hold a slot while the row is inserted, so concurrent submits cannot
+        # overfill the queue and leave a committed job that no worker picks up
+        self._reserved += 1
+        try:
+            job_id = str(uuid.uuid4())
+            async with AsyncSessionLocal() as db:
+                db.add(AgentJobDB(
+                    id=job_id,
+                    status=JobStatus.QUEUED.value,
+                    session_id=session_id,
+                    request=serialize_json_field(payload)
+                ))
+                await db.commit()
+        finally:
+            self._reserved -= 1
+
+        self._queue.put_nowait((job_id, payload))
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[AgentJobDB]:
+        """Load a job row"""
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(select(AgentJobDB).where(AgentJobDB.id == job_id))
+            return result.scalar_one_or_none()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id, payload = await self._queue.get()
+            try:
+                await self._run_job(job_id, payload)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} failed to record job {job_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str, payload: Dict[str, Any]):
+        await self._update(job_id, status=JobStatus.RUNNING.value, started_at=datetime.utcnow())
+        try:
+            result = await self.runner(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await self._update(
+                job_id,
+                status=JobStatus.FAILED.value,
+                error=str(e),
+                completed_at=datetime.utcnow()
+            )
+            return
+
+        await self._update(
+            job_id,
+            status=JobStatus.COMPLETED.value,
+            session_id=result.get("session_id"),
+            result=json.dumps(result, default=str),
+            completed_at=datetime.utcnow()
+        )
+
+    async def _update(self, job_id: str, **values):
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(AgentJobDB).where(AgentJobDB.id == job_id).values(**values))
+            await db.commit()
@@ -0,0 +1,303 @@
+"""
+Schema Migrations - versioned upgrades of the database schema
+Applied versions are recorded in schema_version; create_tables() runs the pending ones on startup
+"""
+
+import os
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Connection
+
+# JSON columns as database.JSONText creates them: TEXT on SQLite, JSONB on PostgreSQL
+_JSON = Text().with_variant(JSONB(), "postgresql")
+
+
+def _baseline_metadata() -> MetaData:
+    """The schema at version 1, frozen: later tables and columns come from their own migrations"""
+    metadata = MetaData()
+    Table(
+        "chat_sessions", metadata,
+        Column("id", String, primary_key=True),
+        Column("title", String),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("active_agent", String),
+        Column("model_provider", String),
+        Column("model_name", String),
+        Column("context", _JSON),
+    )
+    Table(
+        "chat_messages", metadata,
+        Column("id", String, primary_key=True),
+        Column("session_id", String, nullable=False),
+        Column("role", String, nullable=False),
+        Column("content", Text, nullable=False),
+        Column("agent_type", String),
+        Column("timestamp", DateTime),
+        Column("message_metadata", _JSON),
+        Column("suggested_actions", _JSON),
+    )
+    Table(
+        "projects", metadata,
+        Column("id", String, primary_key=True),
+        Column("name", String, nullable=False),
+        Column("description", Text, nullable=False),
+        Column("status", String),
+        Column("template_id", String),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("progress", Integer),
+        Column("tech_stack", _JSON),
+        Column("repository_url", String),
+        Column("deployment_url", String),
+        Column("chat_session_id", String),
+        Column("project_metadata", _JSON),
+    )
+    Table(
+        "app_templates", metadata,
+        Column("id", String, primary_key=True),
+        Column("name", String, nullable=False),
+        Column("description", Text, nullable=False),
+        Column("icon", String, nullable=False),
+        Column("color", String, nullable=False),
+        Column("category", String, nullable=False),
+        Column("prompt", Text, nullable=False),
+        Column("tech_stack", _JSON),
+        Column("features", _JSON),
+    )
+    Table(
+        "agent_tasks", metadata,
+        Column("id", String, primary_key=True),
+        Column("agent_type", String, nullable=False),
+        Column("title", String, nullable=False),
+        Column("description", Text, nullable=False),
+        Column("status", String),
+        Column("priority", String),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("started_at", DateTime),
+        Column("completed_at", DateTime),
+        Column("estimated_duration", Integer),
+        Column("actual_duration", Integer),
+        Column("dependencies", _JSON),
+        Column("deliverables", _JSON),
+        Column("handoff_to", String),
+        Column("project_id", String),
+        Column("session_id", String),
+        Column("task_metadata", _JSON),
+    )
+    Table(
+        "agent_handoffs", metadata,
+        Column("id", String, primary_key=True),
+        Column("from_agent", String, nullable=False),
+        Column("to_agent", String, nullable=False),
+        Column("task_id", String, nullable=False),
+        Column("message", Text, nullable=False),
+        Column("context", _JSON),
+        Column("created_at", DateTime),
+        Column("status", String),
+    )
+    Table(
+        "agent_collaborations", metadata,
+        Column("id", String, primary_key=True),
+        Column("project_id", String, nullable=False),
+        Column("session_id", String, nullable=False),
+        Column("active_agents", _JSON),
+        Column("current_phase", String),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+    )
+    Table(
+        "api_keys", metadata,
+        Column("id", String, primary_key=True),
+        Column("provider", String, nullable=False),
+        Column("api_key", Text, nullable=False),
+        Column("display_name", String),
+        Column("is_active", Integer),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("key_metadata", _JSON),
+    )
+    Table(
+        "agent_jobs", metadata,
+        Column("id", String, primary_key=True),
+        Column("status", String),
+        Column("session_id", String),
+        Column("request", _JSON),
+        Column("result", _JSON),
+        Column("error", Text),
+        Column("created_at", DateTime),
+        Column("started_at", DateTime),
+        Column("completed_at", DateTime),
+    )
+    return metadata
+
+
+def _baseline(conn: Connection, metadata: MetaData):
+    """Tables as they were when versioning started (indexes follow in migration 2)
+
+    Deliberately not database.py's live metadata: a table added there later
+    would only reach new databases. New tables get their own migration.
+    """
+    _baseline_metadata().create_all(conn)
+
+
+def _hot_query_indexes(conn: Connection, metadata: MetaData):
+    """Composite indexes for message history, list pages and API key lookups"""
+    statements = [
+        # get_session_messages: WHERE session_id = ? ORDER BY timestamp
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_timestamp ON chat_messages (session_id, timestamp)",
+        # get_chat_sessions / get_projects: ORDER BY updated_at DESC
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_updated_at ON chat_sessions (updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_projects_updated_at ON projects (updated_at)",
+        # API key lookups: WHERE provider = ? AND is_active = 1
+        "CREATE INDEX IF NOT EXISTS ix_api_keys_provider_active ON api_keys (provider, is_active)",
+    ]
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _add_missing_columns(conn: Connection, table: str, columns: List[Tuple[str, str]]):
+    """ALTER TABLE ADD COLUMN for each (name, ddl) the table lacks
+
+    Databases whose baseline was created from the live metadata, before it
+    was frozen, already have the columns.
+    """
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    for name, ddl in columns:
+        if name not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+
+def _session_summaries(conn: Connection, metadata: MetaData):
+    """Denormalized message count, last message time, agent and preview on chat_sessions"""
+    _add_missing_columns(conn, "chat_sessions", [
+        ("message_count", "INTEGER NOT NULL DEFAULT 0"),
+        ("last_message_at", "TIMESTAMP"),
+        ("last_agent", "VARCHAR"),
+        ("last_message_preview", "VARCHAR"),
+    ])
+
+    # Backfill from history; each subquery is a range scan of ix_chat_messages_session_timestamp
+    conn.execute(text(
+        "UPDATE chat_sessions SET "
+        "message_count = (SELECT COUNT(*) FROM chat_messages m WHERE m.session_id = chat_sessions.id), "
+        "last_message_at = (SELECT MAX(m.timestamp) FROM chat_messages m WHERE m.session_id = chat_sessions.id), "
+        "last_agent = (SELECT m.agent_type FROM chat_messages m "
+        "WHERE m.session_id = chat_sessions.id AND m.agent_type IS NOT NULL "
+        "ORDER BY m.timestamp DESC, m.id DESC LIMIT 1), "
+        "last_message_preview = (SELECT SUBSTR(m.content, 1, :preview_chars) FROM chat_messages m "
+        "WHERE m.session_id = chat_sessions.id ORDER BY m.timestamp DESC, m.id DESC LIMIT 1)"
+    ), {"preview_chars": int(os.getenv("SESSION_PREVIEW_CHARS", "200"))})
+
+
+def _collaboration_links(conn: Connection, metadata: MetaData):
+    """collaboration_id on agent tasks and handoffs, so collaborations can be reloaded"""
+    for table in ("agent_tasks", "agent_handoffs"):
+        _add_missing_columns(conn, table, [("collaboration_id", "VARCHAR")])
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_collaboration_id ON {table} (collaboration_id)"))
+
+
+def _collaboration_session_index(conn: Connection, metadata: MetaData):
+    """Index for rehydrating a session's newest collaboration"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_agent_collaborations_session_created "
+        "ON agent_collaborations (session_id, created_at)"
+    ))
+
+
+# (version, description, migration) - append only, never edit an applied migration;
+# tables and columns added to database.py need a migration here as well
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection, MetaData], None]]] = [
+    (1, "baseline schema", _baseline),
+    (2, "indexes for hot queries", _hot_query_indexes),
+    (3, "denormalized session summaries", _session_summaries),
+    (4, "collaboration ids on agent tasks and handoffs", _collaboration_links),
+    (5, "session index on agent collaborations", _collaboration_session_index),
+]
+
+
+# pg_advisory_xact_lock key held while migrations run (any constant shared by all instances)
+MIGRATION_LOCK_KEY = 7_310_424_011
+
+
+def _lock_schema(conn: Connection):
+    """Hold the migration lock until the surrounding transaction ends
+
+    Instances starting together would otherwise both apply version N and
+    one would then fail on the schema_version primary key.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    elif conn.dialect.name == "sqlite" and not conn.connection.driver_connection.in_transaction:
+        # The driver would only begin a transaction at the first INSERT; take the
+        # write lock now (waiting up to busy_timeout) so the version check is current
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def run_migrations(conn: Connection, metadata: MetaData) -> List[int]:
+    """Apply pending migrations in order on a sync connection; returns the applied versions
+
+    Runs inside the caller's transaction; concurrent runs wait for each other.
+    """
+    _lock_schema(conn)
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)"
+    ))
+    current = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        migrate(conn, metadata)
+        conn.execute(
+            text("INSERT INTO schema_version (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+            {"version": version, "description": description, "applied_at": datetime.utcnow()}
+        )
+        applied.append(version)
+    return applied
+
+
+if __name__ == "__main__":
+    # Benchmark: message history fetch with and without the migration 2 indexes
+    import random
+    import sqlite3
+    import sys
+    import tempfile
+    import time
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    query = "SELECT * FROM chat_messages WHERE session_id = ? ORDER BY timestamp"
+
+    for size in sizes:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        db = sqlite3.connect(path)
+        db.execute(
+            "CREATE TABLE chat_messages (id TEXT PRIMARY KEY, session_id TEXT NOT NULL, role TEXT NOT NULL, "
+            "content TEXT NOT NULL, agent_type TEXT, timestamp TIMESTAMP, message_metadata TEXT, suggested_actions TEXT)"
+        )
+        sessions = max(1, size // 50)  # ~50 messages per chat
+        db.executemany(
+            "INSERT INTO chat_messages VALUES (?, ?, 'user', 'message text', NULL, ?, '{}', '[]')",
+            ((f"m{i}", f"s{random.randrange(sessions)}", f"2024-01-01 00:00:{i:012d}") for i in range(size))
+        )
+        db.commit()
+
+        timings = {}
+        for label in ("no index", "indexed"):
+            if label == "indexed":
+                db.execute("CREATE INDEX ix_chat_messages_session_timestamp ON chat_messages (session_id, timestamp)")
+            probes = [f"s{random.randrange(sessions)}" for _ in range(50)]
+            started = time.perf_counter()
+            for session_id in probes:
+                db.execute(query, (session_id,)).fetchall()
+            timings[label] = (time.perf_counter() - started) / len(probes) * 1000
+
+        db.close()
+        os.remove(path)
+        print(f"{size:>10} rows  no index {timings['no index']:9.3f} ms  indexed {timings['indexed']:7.3f} ms")
@@ -102,6 +102,10 @@ class ChatSession(BaseModel):
     model_provider: str = "gemini"
     model_name: str = "gemini-2.0-flash"
     context: Dict[str, Any] = Field(default_factory=dict)
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_agent: Optional[AgentType] = None
+    last_message_preview: Optional[str] = None
 
 
 class ChatMessage(BaseModel):
@@ -115,6 +119,29 @@ class ChatMessage(BaseModel):
     suggested_actions: List[str] = Field(default_factory=list)
 
 
+class ChatSessionSummary(BaseModel):
+    """List view of a chat session without its JSON context"""
+    id: str
+    title: str = "New Chat"
+    created_at: datetime
+    updated_at: datetime
+    active_agent: AgentType = AgentType.MAIN_ASSISTANT
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    last_agent: Optional[AgentType] = None
+    last_message_preview: Optional[str] = None
+
+
+class ChatMessageSummary(BaseModel):
+    """List view of a message without metadata and suggested actions"""
+    id: str
+    session_id: str
+    role: MessageRole
+    content: str
+    agent_type: Optional[AgentType] = None
+    timestamp: datetime
+
+
 # Project Models
 class AppTemplate(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -144,6 +171,17 @@ class Project(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
+class ProjectSummary(BaseModel):
+    """List view of a project without tech stack and metadata"""
+    id: str
+    name: str
+    description: str
+    status: ProjectStatus = ProjectStatus.PLANNING
+    template_id: Optional[str] = None
+    updated_at: datetime
+    progress: int = 0
+
+
 # API Request/Response Models
 class SendMessageRequest(BaseModel):
     session_id: Optional[str] = None
@@ -160,6 +198,23 @@ class SendMessageResponse(BaseModel):
     suggested_actions: List[str] = Field(default_factory=list)
 
 
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class AgentJob(BaseModel):
+    id: str
+    status: JobStatus = JobStatus.QUEUED
+    session_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
 class CreateProjectRequest(BaseModel):
     name: str
     description: str
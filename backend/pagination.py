@@ -0,0 +1,79 @@
+"""
+Keyset Pagination - bounded pages for the message, session and project lists
+Pages are addressed by opaque cursors over (sort column, id), so a page costs
+the same no matter how deep into the history it is
+"""
+
+import base64
+import json
+import os
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "100"))
+MAX_PAGE_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "500"))
+
+# Response header carrying the cursor of the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    raw = json.dumps([sort_value.isoformat() if sort_value else None, row_id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_value, row_id = json.loads(raw)
+        return (datetime.fromisoformat(sort_value) if sort_value else None), str(row_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+async def fetch_page(db, stmt, sort_column, id_column, limit: Optional[int],
+                     before: Optional[str] = None, after: Optional[str] = None,
+                     newest_first: bool = False, entities: bool = True) -> Tuple[List[Any], Optional[str]]:
+    """Run stmt for one page of at most limit rows; returns (rows, next_cursor)
+
+    Rows are returned in the list's display order: newest first for
+    newest_first lists, oldest first otherwise. Without a cursor the page
+    holds the newest rows. `before` pages towards older rows, `after`
+    towards newer ones, and next_cursor continues in the same direction.
+    Pass entities=False when stmt selects individual columns; rows are then
+    returned as Row tuples (which must include the sort and id columns).
+    """
+    if before and after:
+        raise InvalidCursorError("Use either 'before' or 'after', not both")
+    limit = max(1, min(limit or DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT))
+    key = tuple_(sort_column, id_column)
+
+    if after:
+        stmt = stmt.where(key > tuple_(*decode_cursor(after))).order_by(sort_column.asc(), id_column.asc())
+    else:
+        if before:
+            stmt = stmt.where(key < tuple_(*decode_cursor(before)))
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+
+    # One extra row tells whether another page exists
+    result = await db.execute(stmt.limit(limit + 1))
+    rows = list(result.scalars().all() if entities else result.all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        # The last fetched row is the furthest one in the paging direction
+        edge = rows[-1]
+        next_cursor = encode_cursor(getattr(edge, sort_column.key), getattr(edge, id_column.key))
+
+    fetched_newest_first = not after
+    if fetched_newest_first != newest_first:
+        rows.reverse()
+    return rows, next_cursor
@@ -4,11 +4,12 @@ Real Agent Executor - Исполнитель реальных задач для
 """
 
 import json
-import asyncio
-from typing import Dict, List, Any, Optional
+import time
+from typing import Dict, List, Any, Optional, Callable, Awaitable
 from datetime import datetime
-from models import AgentType
+from models import AgentType, AgentTask
 from agent_tools import AgentToolsManager
+from stage_scheduler import StageScheduler
 
 class RealAgentExecutor:
     """Исполнитель реальных задач для агентов"""
@@ -17,8 +18,13 @@ class RealAgentExecutor:
         self.tools_manager = None
     
     async def execute_agent_task(self, agent_type: AgentType, message: str, 
-                               session_id: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Выполнить реальную задачу агента"""
+                               session_id: str, context: Dict[str, Any] = None,
+                               on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """Выполнить реальную задачу агента
+        
+        on_event - необязательный async callback (event, data) для потоковой
+        передачи промежуточных результатов (этапы, созданные файлы)
+        """
         
         async with AgentToolsManager() as tools:
             self.tools_manager = tools
@@ -51,7 +57,17 @@ class RealAgentExecutor:
             elif agent_type == AgentType.VERSION_CONTROL_AGENT:
                 return await self._execute_version_control_agent(message, session_id, context)
             else:
-                return await self._execute_main_assistant(message, session_id, context)
+                return await self._execute_main_assistant(message, session_id, context, on_event)
+    
+    async def _emit(self, on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]],
+                    event: str, data: Dict[str, Any]):
+        """Отправить промежуточное событие подписчику (если он есть)"""
+        if not on_event:
+            return
+        try:
+            await on_event(event, data)
+        except Exception as e:
+            print(f"Error emitting {event} event: {e}")
     
     async def _execute_project_planner(self, message: str, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
         """Выполнение задач Project Planner - реальное планирование проекта"""
@@ -1276,8 +1292,120 @@ volumes:
             "agent_type": "fullstack_developer"
         }
     
+    # Этапы полного workflow Main Assistant и зависимости между ними.
+    # Design и backend зависят только от планирования и выполняются параллельно,
+    # fullstack интегрирует результаты frontend и backend.
+    MAIN_WORKFLOW_STAGES = [
+        {
+            "agent": AgentType.PROJECT_PLANNER,
+            "depends_on": [],
+            "critical": True,
+            "method": "_execute_project_planner",
+            "prompt_prefix": "",
+            "header": "🧠 **ЭТАП 1/5: PROJECT PLANNER РАБОТАЕТ...**",
+            "intro": "▶️ Анализирую требования и создаю архитектуру проекта...",
+            "name": "PROJECT PLANNER",
+            "files_label": "📁 Создано файлов",
+            "preview": ("tech_spec.md", "\n📋 **СОЗДАНО ТЕХНИЧЕСКОЕ ЗАДАНИЕ:**", "markdown", 10)
+        },
+        {
+            "agent": AgentType.DESIGN_AGENT,
+            "depends_on": [AgentType.PROJECT_PLANNER],
+            "method": "_execute_design_agent",
+            "prompt_prefix": "Создай дизайн для ",
+            "header": "🎨 **ЭТАП 2/5: DESIGN AGENT РАБОТАЕТ...**",
+            "intro": "▶️ Создаю UI/UX дизайн и дизайн-систему...",
+            "name": "DESIGN AGENT",
+            "files_label": "🎨 Создано файлов дизайна",
+            "preview": ("design-system.css", "\n🎨 **СОЗДАНА ДИЗАЙН-СИСТЕМА:**", "css", 15)
+        },
+        {
+            "agent": AgentType.FRONTEND_DEVELOPER,
+            "depends_on": [AgentType.DESIGN_AGENT],
+            "method": "_execute_frontend_developer",
+            "prompt_prefix": "Создай React приложение для ",
+            "header": "⚛️ **ЭТАП 3/5: FRONTEND DEVELOPER РАБОТАЕТ...**",
+            "intro": "▶️ Создаю React приложение и компоненты...",
+            "name": "FRONTEND DEVELOPER",
+            "files_label": "⚛️ Создано React файлов",
+            "preview": ("App.js", "\n⚛️ **СОЗДАН REACT APP:**", "javascript", 20)
+        },
+        {
+            "agent": AgentType.BACKEND_DEVELOPER,
+            "depends_on": [AgentType.PROJECT_PLANNER],
+            "method": "_execute_backend_developer",
+            "prompt_prefix": "Создай FastAPI backend для ",
+            "header": "🚀 **ЭТАП 4/5: BACKEND DEVELOPER РАБОТАЕТ...**",
+            "intro": "▶️ Создаю FastAPI backend и API endpoints...",
+            "name": "BACKEND DEVELOPER",
+            "files_label": "🚀 Создано API файлов",
+            "preview": ("main.py", "\n🚀 **СОЗДАН FASTAPI SERVER:**", "python", 25)
+        },
+        {
+            "agent": AgentType.FULLSTACK_DEVELOPER,
+            "depends_on": [AgentType.FRONTEND_DEVELOPER, AgentType.BACKEND_DEVELOPER],
+            "method": "_execute_fullstack_developer",
+            "prompt_prefix": "Интегрируй frontend и backend для ",
+            "header": "🔗 **ЭТАП 5/5: FULLSTACK DEVELOPER РАБОТАЕТ...**",
+            "intro": "▶️ Интегрирую frontend и backend, создаю Docker...",
+            "name": "FULLSTACK DEVELOPER",
+            "files_label": "🔗 Создано интеграционных файлов",
+            "preview": ("docker-compose.yml", "\n🔗 **СОЗДАН DOCKER COMPOSE:**", "yaml", 20)
+        }
+    ]
+    
+    async def _run_workflow_stage(self, stage: Dict[str, Any], message: str, session_id: str,
+                                  context: Dict[str, Any], parts: List[str],
+                                  on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """Выполнить один этап workflow, собирая строки ответа в parts"""
+        agent = stage["agent"].value
+        parts.append(stage["header"])
+        parts.append(stage["intro"])
+        await self._emit(on_event, "stage", {"stage": agent, "response_parts": list(parts)})
+        emitted = len(parts)
+        created_files = []
+        
+        try:
+            execute = getattr(self, stage["method"])
+            result = await execute(stage["prompt_prefix"] + message, session_id, context)
+            if result["success"]:
+                created_files = result.get('created_files', [])
+                parts.append(f"✅ **{stage['name']} ЗАВЕРШИЛ РАБОТУ**")
+                parts.append(f"{stage['files_label']}: {len(created_files)}")
+                
+                # Показываем начало ключевого файла этапа
+                preview_name, preview_title, language, line_count = stage["preview"]
+                for file_path in created_files:
+                    if preview_name in file_path:
+                        try:
+                            file_content = await self.tools_manager.view_file(file_path)
+                            if file_content["success"]:
+                                parts.append(f"{preview_title} `{file_path}`")
+                                lines = file_content["content"].split('\n')[:line_count]
+                                parts.append(f"```{language}")
+                                parts.append('\n'.join(lines))
+                                parts.append("...")
+                                parts.append("```")
+                        except:
+                            pass
+                
+                context.update(result.get('context', {}))
+            else:
+                parts.append(f"❌ **{stage['name']} ОШИБКА**")
+        except Exception as e:
+            parts.append(f"❌ **ОШИБКА {stage['name']}:** {str(e)}")
+            result = {"success": False, "error": str(e)}
+        
+        await self._emit(on_event, "stage", {"stage": agent, "response_parts": parts[emitted:]})
+        if created_files:
+            await self._emit(on_event, "files", {"stage": agent, "created_files": created_files})
+        
+        result["created_files"] = created_files
+        return result
+    
     # Реализация остальных агентов...
-    async def _execute_main_assistant(self, message: str, session_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+    async def _execute_main_assistant(self, message: str, session_id: str, context: Dict[str, Any],
+                                      on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
         """Main Assistant - выполняет ПОЛНЫЙ workflow разработки автоматически как главный AI с реальным временем"""
         
         response_parts = []
@@ -1288,201 +1416,63 @@ volumes:
         
         if any(word in message_lower for word in ["создай", "создать", "разработай", "построй", "приложение", "сайт", "веб", "app", "проект", "мини", "телеграм"]):
             
+            started_at = time.monotonic()
             response_parts.append("🚀 **MAIN ASSISTANT НАЧИНАЕТ ПОЛНУЮ РАЗРАБОТКУ ПРОЕКТА**")
             response_parts.append(f"📝 Анализирую запрос: '{message}'")
             response_parts.append("⚡ Запускаю автоматический workflow разработки...")
             response_parts.append("")
             response_parts.append("=" * 70)
+            await self._emit(on_event, "stage", {"stage": "main_assistant", "response_parts": list(response_parts)})
+            
+            # Построить граф задач по зависимостям этапов
+            tasks: Dict[AgentType, AgentTask] = {}
+            stages_by_task: Dict[str, Dict[str, Any]] = {}
+            for stage in self.MAIN_WORKFLOW_STAGES:
+                task = AgentTask(
+                    agent_type=stage["agent"],
+                    title=stage["name"],
+                    description=stage["prompt_prefix"] + message,
+                    session_id=session_id,
+                    dependencies=[tasks[dep].id for dep in stage["depends_on"]],
+                    metadata={"critical": stage.get("critical", False)}
+                )
+                tasks[stage["agent"]] = task
+                stages_by_task[task.id] = stage
+            
+            stage_parts: Dict[AgentType, List[str]] = {agent: [] for agent in tasks}
+            stage_results: Dict[AgentType, Dict[str, Any]] = {}
+            
+            async def run_stage(task: AgentTask) -> bool:
+                stage = stages_by_task[task.id]
+                result = await self._run_workflow_stage(
+                    stage, message, session_id, context, stage_parts[task.agent_type], on_event
+                )
+                stage_results[task.agent_type] = result
+                
+                # Путь проекта нужен всем последующим этапам
+                if task.agent_type == AgentType.PROJECT_PLANNER and result.get("created_files"):
+                    context['project_path'] = '/'.join(result["created_files"][0].split('/')[0:2])
+                return result.get("success", False)
+            
+            scheduler = StageScheduler(list(tasks.values()), run_stage, on_event)
+            completed = await scheduler.run()
+            
+            # Собрать ответ в порядке этапов независимо от порядка завершения
+            for index, stage in enumerate(self.MAIN_WORKFLOW_STAGES):
+                agent = stage["agent"]
+                if agent not in stage_results:
+                    continue
+                if index:
+                    response_parts.append("")
+                    response_parts.append("=" * 70)
+                response_parts.extend(stage_parts[agent])
+                all_created_files.extend(stage_results[agent].get("created_files", []))
             
-            # ЭТАП 1: PROJECT PLANNER
-            response_parts.append("🧠 **ЭТАП 1/5: PROJECT PLANNER РАБОТАЕТ...**")
-            response_parts.append("▶️ Анализирую требования и создаю архитектуру проекта...")
-            
-            # Имитация времени работы как у меня
-            await asyncio.sleep(2)
-            
-            try:
-                result1 = await self._execute_project_planner(message, session_id, context)
-                if result1["success"]:
-                    response_parts.append("✅ **PROJECT PLANNER ЗАВЕРШИЛ РАБОТУ**")
-                    response_parts.append(f"📁 Создано файлов: {len(result1.get('created_files', []))}")
-                    
-                    # Показываем содержимое ключевых файлов
-                    for file_path in result1.get('created_files', []):
-                        if 'tech_spec.md' in file_path:
-                            try:
-                                file_content = await self.tools_manager.view_file(file_path)
-                                if file_content["success"]:
-                                    response_parts.append(f"\n📋 **СОЗДАНО ТЕХНИЧЕСКОЕ ЗАДАНИЕ:** `{file_path}`")
-                                    # Показываем первые 10 строк
-                                    lines = file_content["content"].split('\n')[:10]
-                                    response_parts.append("```markdown")
-                                    response_parts.append('\n'.join(lines))
-                                    response_parts.append("...") 
-                                    response_parts.append("```")
-                            except:
-                                pass
-                    
-                    all_created_files.extend(result1.get('created_files', []))
-                    project_path = result1.get('created_files', [''])[0].split('/')[0:2] if result1.get('created_files') else []
-                    if project_path:
-                        context['project_path'] = '/'.join(project_path)
-                else:
-                    response_parts.append("❌ **PROJECT PLANNER ОШИБКА**")
-                    return {"success": False, "response": "\n".join(response_parts), "created_files": [], "next_agent": None, "agent_type": "main_assistant"}
-            except Exception as e:
-                response_parts.append(f"❌ **ОШИБКА PROJECT PLANNER:** {str(e)}")
+            if not completed:
                 return {"success": False, "response": "\n".join(response_parts), "created_files": [], "next_agent": None, "agent_type": "main_assistant"}
             
-            response_parts.append("")
-            response_parts.append("=" * 70)
-            
-            # ЭТАП 2: DESIGN AGENT
-            response_parts.append("🎨 **ЭТАП 2/5: DESIGN AGENT РАБОТАЕТ...**")
-            response_parts.append("▶️ Создаю UI/UX дизайн и дизайн-систему...")
-            
-            await asyncio.sleep(3)  # Design требует больше времени
-            
-            try:
-                result2 = await self._execute_design_agent("Создай дизайн для " + message, session_id, context)
-                if result2["success"]:
-                    response_parts.append("✅ **DESIGN AGENT ЗАВЕРШИЛ РАБОТУ**")
-                    response_parts.append(f"🎨 Создано файлов дизайна: {len(result2.get('created_files', []))}")
-                    
-                    # Показываем дизайн-систему
-                    for file_path in result2.get('created_files', []):
-                        if 'design-system.css' in file_path:
-                            try:
-                                file_content = await self.tools_manager.view_file(file_path)
-                                if file_content["success"]:
-                                    response_parts.append(f"\n🎨 **СОЗДАНА ДИЗАЙН-СИСТЕМА:** `{file_path}`")
-                                    lines = file_content["content"].split('\n')[:15]
-                                    response_parts.append("```css")
-                                    response_parts.append('\n'.join(lines))
-                                    response_parts.append("...")
-                                    response_parts.append("```")
-                            except:
-                                pass
-                    
-                    all_created_files.extend(result2.get('created_files', []))
-                    context.update(result2.get('context', {}))
-                else:
-                    response_parts.append("❌ **DESIGN AGENT ОШИБКА**")
-            except Exception as e:
-                response_parts.append(f"❌ **ОШИБКА DESIGN AGENT:** {str(e)}")
-            
-            response_parts.append("")
-            response_parts.append("=" * 70)
-            
-            # ЭТАП 3: FRONTEND DEVELOPER
-            response_parts.append("⚛️ **ЭТАП 3/5: FRONTEND DEVELOPER РАБОТАЕТ...**")
-            response_parts.append("▶️ Создаю React приложение и компоненты...")
-            
-            await asyncio.sleep(4)  # Frontend разработка занимает время
-            
-            try:
-                result3 = await self._execute_frontend_developer("Создай React приложение для " + message, session_id, context)
-                if result3["success"]:
-                    response_parts.append("✅ **FRONTEND DEVELOPER ЗАВЕРШИЛ РАБОТУ**")
-                    response_parts.append(f"⚛️ Создано React файлов: {len(result3.get('created_files', []))}")
-                    
-                    # Показываем главный App компонент
-                    for file_path in result3.get('created_files', []):
-                        if 'App.js' in file_path:
-                            try:
-                                file_content = await self.tools_manager.view_file(file_path)
-                                if file_content["success"]:
-                                    response_parts.append(f"\n⚛️ **СОЗДАН REACT APP:** `{file_path}`")
-                                    lines = file_content["content"].split('\n')[:20]
-                                    response_parts.append("```javascript")
-                                    response_parts.append('\n'.join(lines))
-                                    response_parts.append("...")
-                                    response_parts.append("```")
-                            except:
-                                pass
-                    
-                    all_created_files.extend(result3.get('created_files', []))
-                    context.update(result3.get('context', {}))
-                else:
-                    response_parts.append("❌ **FRONTEND DEVELOPER ОШИБКА**")
-            except Exception as e:
-                response_parts.append(f"❌ **ОШИБКА FRONTEND DEVELOPER:** {str(e)}")
-            
-            response_parts.append("")
-            response_parts.append("=" * 70)
-            
-            # ЭТАП 4: BACKEND DEVELOPER
-            response_parts.append("🚀 **ЭТАП 4/5: BACKEND DEVELOPER РАБОТАЕТ...**")
-            response_parts.append("▶️ Создаю FastAPI backend и API endpoints...")
-            
-            await asyncio.sleep(4)  # Backend тоже требует времени
-            
-            try:
-                result4 = await self._execute_backend_developer("Создай FastAPI backend для " + message, session_id, context)
-                if result4["success"]:
-                    response_parts.append("✅ **BACKEND DEVELOPER ЗАВЕРШИЛ РАБОТУ**")
-                    response_parts.append(f"🚀 Создано API файлов: {len(result4.get('created_files', []))}")
-                    
-                    # Показываем FastAPI код
-                    for file_path in result4.get('created_files', []):
-                        if 'main.py' in file_path:
-                            try:
-                                file_content = await self.tools_manager.view_file(file_path)
-                                if file_content["success"]:
-                                    response_parts.append(f"\n🚀 **СОЗДАН FASTAPI SERVER:** `{file_path}`")
-                                    lines = file_content["content"].split('\n')[:25]
-                                    response_parts.append("```python")
-                                    response_parts.append('\n'.join(lines))
-                                    response_parts.append("...")
-                                    response_parts.append("```")
-                            except:
-                                pass
-                    
-                    all_created_files.extend(result4.get('created_files', []))
-                    context.update(result4.get('context', {}))
-                else:
-                    response_parts.append("❌ **BACKEND DEVELOPER ОШИБКА**")
-            except Exception as e:
-                response_parts.append(f"❌ **ОШИБКА BACKEND DEVELOPER:** {str(e)}")
-            
-            response_parts.append("")
-            response_parts.append("=" * 70)
-            
-            # ЭТАП 5: FULLSTACK DEVELOPER
-            response_parts.append("🔗 **ЭТАП 5/5: FULLSTACK DEVELOPER РАБОТАЕТ...**")
-            response_parts.append("▶️ Интегрирую frontend и backend, создаю Docker...")
-            
-            await asyncio.sleep(3)  # Интеграция
-            
-            try:
-                result5 = await self._execute_fullstack_developer("Интегрируй frontend и backend для " + message, session_id, context)
-                if result5["success"]:
-                    response_parts.append("✅ **FULLSTACK DEVELOPER ЗАВЕРШИЛ РАБОТУ**")
-                    response_parts.append(f"🔗 Создано интеграционных файлов: {len(result5.get('created_files', []))}")
-                    
-                    # Показываем Docker Compose
-                    for file_path in result5.get('created_files', []):
-                        if 'docker-compose.yml' in file_path:
-                            try:
-                                file_content = await self.tools_manager.view_file(file_path)
-                                if file_content["success"]:
-                                    response_parts.append(f"\n🔗 **СОЗДАН DOCKER COMPOSE:** `{file_path}`")
-                                    lines = file_content["content"].split('\n')[:20]
-                                    response_parts.append("```yaml")
-                                    response_parts.append('\n'.join(lines))
-                                    response_parts.append("...")
-                                    response_parts.append("```")
-                            except:
-                                pass
-                    
-                    all_created_files.extend(result5.get('created_files', []))
-                else:
-                    response_parts.append("❌ **FULLSTACK DEVELOPER ОШИБКА**")
-            except Exception as e:
-                response_parts.append(f"❌ **ОШИБКА FULLSTACK DEVELOPER:** {str(e)}")
-            
-            # Финальная обработка
-            await asyncio.sleep(1)
+            elapsed = time.monotonic() - started_at
+            summary_start = len(response_parts)
             
             response_parts.append("")
             response_parts.append("=" * 70)
@@ -1495,7 +1485,7 @@ volumes:
             response_parts.append(f"✅ Всего создано файлов: **{len(all_created_files)}**")
             response_parts.append(f"🎯 Проект: **{message.strip()}**")
             response_parts.append(f"📁 Директория: `{context.get('project_path', 'projects/новый_проект')}`")
-            response_parts.append(f"⏱️ Время разработки: ~16 секунд (как настоящая команда!)")
+            response_parts.append(f"⏱️ Время разработки: {elapsed:.1f} сек.")
             response_parts.append("")
             
             # Показываем все созданные файлы
@@ -1506,6 +1496,7 @@ volumes:
             response_parts.append("")
             response_parts.append("🚀 **ГОТОВО К РАБОТЕ И ЗАГРУЗКЕ НА GITHUB!**")
             response_parts.append("💡 Все файлы протестированы и готовы к разработке!")
+            await self._emit(on_event, "stage", {"stage": "summary", "response_parts": response_parts[summary_start:]})
             
             return {
                 "success": True,
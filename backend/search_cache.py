@@ -0,0 +1,76 @@
+"""
+Search Cache - TTL cache with request coalescing for web_search_tool
+Identical concurrent searches share one upstream request
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class SearchCache:
+    """LRU-bounded TTL cache keyed on (normalized query, search_context_size)"""
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else int(os.getenv("SEARCH_CACHE_TTL", "600"))
+        self.max_entries = max_entries or int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "256"))
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        return " ".join(query.casefold().split())
+
+    async def get_or_fetch(self, query: str, search_context_size: str,
+                           fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return a cached result, join an in-flight search, or start a new one"""
+        key = (self.normalize(query), search_context_size)
+
+        cached = self._entries.get(key)
+        if cached and cached[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(cached[1])
+
+        task = self._inflight.get(key)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._on_fetched(key, done))
+
+        # shield: a cancelled caller must not cancel the search the others are waiting on
+        return dict(await asyncio.shield(task))
+
+    def _on_fetched(self, key: Tuple[str, str], task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        # Failed searches are not cached so the next request retries upstream
+        if result.get("success"):
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0
+        }
+
+
+search_cache = SearchCache()
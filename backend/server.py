@@ -1,11 +1,14 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import asyncio
 import logging
 import uuid
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Awaitable, Set, Tuple, Literal
 from datetime import datetime
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -15,14 +18,30 @@ from sqlalchemy.orm import selectinload
 # Import our models and services
 from models import (
     ChatSession, ChatMessage, Project, AppTemplate, SendMessageRequest, 
+    ChatSessionSummary, ChatMessageSummary, ProjectSummary,
     SendMessageResponse, CreateProjectRequest, UpdateProjectRequest,
-    AgentType, MessageRole, ProjectStatus, APIKey, CreateAPIKeyRequest, UpdateAPIKeyRequest
+    AgentType, MessageRole, ProjectStatus, APIKey, CreateAPIKeyRequest, UpdateAPIKeyRequest,
+    AgentJob, JobStatus
 )
 from agents import AgentManager, AgentCollaborationManager
 from ai_service import AIService
+from job_queue import AgentJobQueue, JobQueueFullError
+from api_key_cache import api_key_cache
+from http_pool import http_pool
+from crawl_cache import crawl_cache
+from html_extraction import extraction_engine
+from search_cache import search_cache
+from group_commit import commit_writer
+from collaboration_store import collaboration_store
+from task_scheduler import AgentTaskScheduler
+from collaboration_hub import CollaborationHub
+from blob_store import blob_store
+from template_catalog import template_catalog
+from fast_json import list_response
+from pagination import fetch_page, InvalidCursorError, MAX_PAGE_LIMIT, NEXT_CURSOR_HEADER
 from database import (
-    get_db, create_tables, ChatSessionDB, ChatMessageDB, ProjectDB, AppTemplateDB,
-    APIKeyDB, serialize_json_field, deserialize_json_field
+    get_db, get_read_db, create_tables, dispose_engines, IS_SQLITE, ChatSessionDB, ChatMessageDB, ProjectDB,
+    APIKeyDB, AgentJobDB, serialize_json_field, deserialize_json_field, message_preview
 )
 
 ROOT_DIR = Path(__file__).parent
@@ -30,9 +49,16 @@ load_dotenv(ROOT_DIR / '.env')
 
 # Initialize services
 agent_manager = AgentManager()
-collaboration_manager = AgentCollaborationManager()
+collaboration_manager = AgentCollaborationManager(store=collaboration_store)
+# Runs collaboration tasks (and the handoffs they create) in the background
+task_scheduler = AgentTaskScheduler(collaboration_manager)
+# Pushes collaboration updates to WebSocket subscribers
+collaboration_hub = CollaborationHub(collaboration_manager)
 ai_service = AIService()
 
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks: Set[asyncio.Task] = set()
+
 # Create the main app
 app = FastAPI()
 
@@ -90,121 +116,293 @@ DEFAULT_TEMPLATES = [
 
 
 # Chat endpoints
-@api_router.post("/chat/send", response_model=SendMessageResponse)
-async def send_message(request: SendMessageRequest, db: AsyncSession = Depends(get_db)):
-    """Send a message to an AI agent"""
-    try:
-        # Get or create session
-        session_id = request.session_id
-        if not session_id:
-            # Create new session
-            session = ChatSessionDB(
-                id=str(datetime.utcnow().timestamp()),
-                active_agent=request.agent_type or AgentType.MAIN_ASSISTANT,
-                model_provider=request.model_provider,
-                model_name=request.model_name,
-                context=serialize_json_field({})
-            )
-            db.add(session)
-            await db.commit()
-            session_id = session.id
-        else:
-            # Update existing session
-            stmt = update(ChatSessionDB).where(ChatSessionDB.id == session_id).values(
-                updated_at=datetime.utcnow()
-            )
-            await db.execute(stmt)
-            await db.commit()
-        
-        # Determine agent type
-        agent_type = request.agent_type
-        if not agent_type:
-            # Suggest best agent based on message content
-            agent_type = ai_service.suggest_agent(request.message)
-        
-        # Save user message
-        user_message = ChatMessageDB(
-            id=f"msg_{datetime.utcnow().timestamp()}",
-            session_id=session_id,
-            role=MessageRole.USER,
-            content=request.message,
-            message_metadata=serialize_json_field({}),
-            suggested_actions=serialize_json_field([])
+def _session_write(request: SendMessageRequest, session_id: str, messages: List[ChatMessageDB]) -> Any:
+    """Return the write that creates or touches the session and folds in its new messages
+    
+    The session's message count, last message time, agent and preview are
+    kept in step with chat_messages by committing this write in the same
+    unit as the messages themselves.
+    """
+    last_message = messages[-1]
+    summary = {
+        "last_message_at": last_message.timestamp,
+        "last_message_preview": message_preview(last_message.content)
+    }
+    agent_messages = [message for message in messages if message.agent_type]
+    if agent_messages:
+        summary["last_agent"] = agent_messages[-1].agent_type
+    
+    if not request.session_id:
+        # Create new session
+        return ChatSessionDB(
+            id=session_id,
+            active_agent=request.agent_type or AgentType.MAIN_ASSISTANT,
+            model_provider=request.model_provider,
+            model_name=request.model_name,
+            context=serialize_json_field({}),
+            message_count=len(messages),
+            **summary
         )
-        db.add(user_message)
-        await db.commit()
-        
-        # Get AI response from real agent executor with tools
+    
+    # Update existing session
+    return update(ChatSessionDB).where(ChatSessionDB.id == session_id).values(
+        updated_at=datetime.utcnow(),
+        message_count=ChatSessionDB.message_count + len(messages),
+        **summary
+    )
+
+
+def _user_message_row(session_id: str, message: str) -> ChatMessageDB:
+    """Build the row for the user's message, stamped when it was received"""
+    now = datetime.utcnow()
+    return ChatMessageDB(
+        id=f"msg_{now.timestamp()}",
+        session_id=session_id,
+        role=MessageRole.USER,
+        content=message,
+        timestamp=now,
+        message_metadata=serialize_json_field({}),
+        suggested_actions=serialize_json_field([])
+    )
+
+
+def _build_message_metadata(ai_response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Collect tool results and files from an agent response into message metadata"""
+    return {
+        "created_files": ai_response_data.get("created_files", []),
+        "next_agent": ai_response_data.get("next_agent"),
+        "success": ai_response_data.get("success", True),
+        "tool_results": ai_response_data.get("tool_results", []),
+        "search_results": ai_response_data.get("search_results", []),
+        "generated_images": ai_response_data.get("generated_images", []),
+        "command_output": ai_response_data.get("command_output"),
+        "integration_playbook": ai_response_data.get("integration_playbook"),
+        "file_content": ai_response_data.get("file_content")
+    }
+
+
+async def _assistant_message_row(
+    session_id: str,
+    request: SendMessageRequest,
+    agent_type: AgentType,
+    ai_response_data: Dict[str, Any]
+) -> Tuple[ChatMessageDB, SendMessageResponse]:
+    """Build the row for the agent's reply and the API response for it"""
+    # Extract response text and tool results
+    ai_response = ai_response_data.get("response", "Ошибка выполнения агента")
+    actual_agent_type = ai_response_data.get("agent_type", agent_type.value)
+    
+    # Generate suggested actions based on context and agent response
+    suggested_actions = _generate_suggested_actions(request.message, agent_type, ai_response_data)
+    
+    # Save assistant message with additional metadata; large payloads go to the blob store
+    message_metadata = _build_message_metadata(ai_response_data)
+    stored_metadata = await blob_store.externalize_metadata(message_metadata)
+    
+    now = datetime.utcnow()
+    assistant_message_db = ChatMessageDB(
+        id=f"msg_{now.timestamp()}_assistant",
+        session_id=session_id,
+        role=MessageRole.ASSISTANT,
+        content=ai_response,
+        agent_type=actual_agent_type,
+        timestamp=now,
+        message_metadata=serialize_json_field(stored_metadata),
+        suggested_actions=serialize_json_field(suggested_actions)
+    )
+    
+    # Convert to response model
+    assistant_message = ChatMessage(
+        id=assistant_message_db.id,
+        session_id=session_id,
+        role=MessageRole.ASSISTANT,
+        content=ai_response,
+        agent_type=actual_agent_type,
+        timestamp=assistant_message_db.timestamp,
+        suggested_actions=suggested_actions
+    )
+    
+    response_data = SendMessageResponse(
+        session_id=session_id,
+        message=assistant_message,
+        suggested_actions=suggested_actions
+    )
+    
+    # Add additional metadata to response
+    if hasattr(response_data, 'metadata'):
+        response_data.metadata = message_metadata
+    
+    return assistant_message_db, response_data
+
+
+async def _run_chat_exchange(
+    request: SendMessageRequest,
+    on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+) -> SendMessageResponse:
+    """Run one user message through the agents and persist both sides of the exchange
+    
+    All writes of the exchange (session create/touch, user message, assistant
+    message) go to the group-commit writer as one unit after the agent replies.
+    """
+    session_id = request.session_id or str(datetime.utcnow().timestamp())
+    if on_event:
+        await on_event("session", {"session_id": session_id})
+    
+    # Determine agent type
+    agent_type = request.agent_type
+    if not agent_type:
+        # Suggest best agent based on message content
+        agent_type = ai_service.suggest_agent(request.message)
+    
+    user_message_db = _user_message_row(session_id, request.message)
+    
+    # Get AI response from real agent executor with tools
+    try:
         ai_response_data = await ai_service.process_message_with_tools(
             message=request.message,
-            agent_type=agent_type
+            agent_type=agent_type,
+            on_event=on_event
         )
-        
-        # Extract response text and tool results
-        ai_response = ai_response_data.get("response", "Ошибка выполнения агента")
-        actual_agent_type = ai_response_data.get("agent_type", agent_type.value)
-        created_files = ai_response_data.get("created_files", [])
-        next_agent = ai_response_data.get("next_agent")
-        tool_results = ai_response_data.get("tool_results", [])
-        search_results = ai_response_data.get("search_results", [])
-        generated_images = ai_response_data.get("generated_images", [])
-        command_output = ai_response_data.get("command_output")
-        integration_playbook = ai_response_data.get("integration_playbook")
-        file_content = ai_response_data.get("file_content")
-        
-        # Generate suggested actions based on context and agent response
-        suggested_actions = _generate_suggested_actions(request.message, agent_type, ai_response_data)
-        
-        # Save assistant message with additional metadata
-        message_metadata = {
-            "created_files": created_files,
-            "next_agent": next_agent,
-            "success": ai_response_data.get("success", True),
-            "tool_results": tool_results,
-            "search_results": search_results,
-            "generated_images": generated_images,
-            "command_output": command_output,
-            "integration_playbook": integration_playbook,
-            "file_content": file_content
+    except Exception:
+        # Keep the user's message even when the agent fails
+        await commit_writer.write([_session_write(request, session_id, [user_message_db]), user_message_db])
+        raise
+    
+    assistant_message_db, response_data = await _assistant_message_row(session_id, request, agent_type, ai_response_data)
+    messages = [user_message_db, assistant_message_db]
+    await commit_writer.write([_session_write(request, session_id, messages), *messages])
+    return response_data
+
+
+@api_router.post("/chat/send", response_model=SendMessageResponse)
+async def send_message(request: SendMessageRequest):
+    """Send a message to an AI agent"""
+    try:
+        return await _run_chat_exchange(request)
+    except Exception as e:
+        logging.error(f"Error in send_message: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Events frame"""
+    payload = json.dumps(data, default=str, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+@api_router.post("/chat/stream")
+async def stream_message(request: SendMessageRequest):
+    """Send a message to an AI agent and stream progress as Server-Sent Events
+    
+    Emits `session`, `stage` and `files` events while the agent is working,
+    then `message` with the persisted assistant reply (or `error`) and `done`.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    async def on_event(event: str, data: Dict[str, Any]):
+        await queue.put((event, data))
+    
+    async def produce():
+        try:
+            response_data = await _run_chat_exchange(request, on_event)
+            await queue.put(("message", response_data.dict()))
+        except Exception as e:
+            logging.error(f"Error in stream_message: {str(e)}")
+            await queue.put(("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+    
+    # Keep the exchange running (and persisted) even if the client disconnects
+    producer = asyncio.create_task(produce())
+    _background_tasks.add(producer)
+    producer.add_done_callback(_background_tasks.discard)
+    
+    async def event_stream():
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield _sse_event(event, data)
+        yield _sse_event("done", {})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _run_chat_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Job queue runner: execute a queued chat exchange"""
+    request = SendMessageRequest(**payload)
+    response_data = await _run_chat_exchange(request)
+    return response_data.dict()
+
+
+job_queue = AgentJobQueue(_run_chat_job)
+
+
+def _job_from_db(job_db: AgentJobDB) -> AgentJob:
+    return AgentJob(
+        id=job_db.id,
+        status=job_db.status,
+        session_id=job_db.session_id,
+        error=job_db.error,
+        created_at=job_db.created_at,
+        started_at=job_db.started_at,
+        completed_at=job_db.completed_at
+    )
+
+
+@api_router.post("/chat/jobs", status_code=202)
+async def submit_message_job(request: SendMessageRequest):
+    """Queue a message for an AI agent and return a job id immediately"""
+    try:
+        job_id = await job_queue.submit(request.dict(), session_id=request.session_id)
+        return {
+            "job_id": job_id,
+            "status": JobStatus.QUEUED,
+            "status_url": f"/api/chat/jobs/{job_id}",
+            "result_url": f"/api/chat/jobs/{job_id}/result"
         }
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/chat/jobs/{job_id}", response_model=AgentJob)
+async def get_message_job(job_id: str):
+    """Get the status of a queued message job"""
+    try:
+        job_db = await job_queue.get_job(job_id)
+        if not job_db:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return _job_from_db(job_db)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/chat/jobs/{job_id}/result")
+async def get_message_job_result(job_id: str):
+    """Get the agent reply of a finished job (202 while it is still pending)"""
+    try:
+        job_db = await job_queue.get_job(job_id)
+        if not job_db:
+            raise HTTPException(status_code=404, detail="Job not found")
         
-        assistant_message_db = ChatMessageDB(
-            id=f"msg_{datetime.utcnow().timestamp()}_assistant",
-            session_id=session_id,
-            role=MessageRole.ASSISTANT,
-            content=ai_response,
-            agent_type=actual_agent_type,
-            message_metadata=serialize_json_field(message_metadata),
-            suggested_actions=serialize_json_field(suggested_actions)
-        )
-        db.add(assistant_message_db)
-        await db.commit()
-        
-        # Convert to response model
-        assistant_message = ChatMessage(
-            id=assistant_message_db.id,
-            session_id=session_id,
-            role=MessageRole.ASSISTANT,
-            content=ai_response,
-            agent_type=actual_agent_type,
-            timestamp=assistant_message_db.timestamp,
-            suggested_actions=suggested_actions
-        )
-        
-        response_data = SendMessageResponse(
-            session_id=session_id,
-            message=assistant_message,
-            suggested_actions=suggested_actions
-        )
-        
-        # Add additional metadata to response
-        if hasattr(response_data, 'metadata'):
-            response_data.metadata = message_metadata
-        
-        return response_data
+        if job_db.status == JobStatus.FAILED:
+            raise HTTPException(status_code=500, detail=job_db.error or "Job failed")
+        if job_db.status != JobStatus.COMPLETED:
+            return JSONResponse(status_code=202, content=jsonable_encoder(_job_from_db(job_db)))
         
+        return deserialize_json_field(job_db.result)
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"Error in send_message: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -281,58 +479,191 @@ def _generate_suggested_actions(message: str, agent_type: AgentType, agent_respo
     return actions[:4]  # Limit to 4 actions
 
 
+# List endpoints select plain columns and encode the rows directly (see fast_json)
+MESSAGE_COLUMNS = tuple(ChatMessageDB.__table__.c)
+SESSION_COLUMNS = tuple(ChatSessionDB.__table__.c)
+PROJECT_COLUMNS = tuple(ProjectDB.__table__.c)
+
+# Columns of the summary projections: heavy JSON columns are never loaded
+MESSAGE_SUMMARY_COLUMNS = (
+    ChatMessageDB.id, ChatMessageDB.session_id, ChatMessageDB.role, ChatMessageDB.content,
+    ChatMessageDB.agent_type, ChatMessageDB.timestamp
+)
+SESSION_SUMMARY_COLUMNS = (
+    ChatSessionDB.id, ChatSessionDB.title, ChatSessionDB.created_at, ChatSessionDB.updated_at,
+    ChatSessionDB.active_agent, ChatSessionDB.message_count, ChatSessionDB.last_message_at,
+    ChatSessionDB.last_agent, ChatSessionDB.last_message_preview
+)
+PROJECT_SUMMARY_COLUMNS = (
+    ProjectDB.id, ProjectDB.name, ProjectDB.description, ProjectDB.status, ProjectDB.template_id,
+    ProjectDB.updated_at, ProjectDB.progress
+)
+
+
+# Field mappings shared by list rows and ORM objects (same attribute names)
+def _message_row(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "session_id": row.session_id,
+        "role": row.role,
+        "content": row.content,
+        "agent_type": row.agent_type,
+        "timestamp": row.timestamp,
+        "metadata": deserialize_json_field(row.message_metadata),
+        "suggested_actions": deserialize_json_field(row.suggested_actions, "list")
+    }
+
+
+def _session_row(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "active_agent": row.active_agent,
+        "model_provider": row.model_provider,
+        "model_name": row.model_name,
+        "context": deserialize_json_field(row.context),
+        "message_count": row.message_count,
+        "last_message_at": row.last_message_at,
+        "last_agent": row.last_agent,
+        "last_message_preview": row.last_message_preview
+    }
+
+
+def _project_row(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "name": row.name,
+        "description": row.description,
+        "status": row.status,
+        "template_id": row.template_id,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "progress": row.progress,
+        "tech_stack": deserialize_json_field(row.tech_stack, "list"),
+        "repository_url": row.repository_url,
+        "deployment_url": row.deployment_url,
+        "chat_session_id": row.chat_session_id,
+        "metadata": deserialize_json_field(row.project_metadata)
+    }
+
+
 @api_router.get("/chat/session/{session_id}/messages")
-async def get_session_messages(session_id: str, db: AsyncSession = Depends(get_db)):
-    """Get all messages for a chat session"""
+async def get_session_messages(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Literal["full", "summary"] = "full",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a page of messages for a chat session, oldest first
+    
+    Without a cursor the newest messages are returned; pass the
+    X-Next-Cursor header back as `before` (or `after`) to keep paging.
+    With fields=summary, metadata and suggested actions are left out;
+    fetch them per message from /chat/messages/{message_id}.
+    """
     try:
-        stmt = select(ChatMessageDB).where(ChatMessageDB.session_id == session_id).order_by(ChatMessageDB.timestamp)
-        result = await db.execute(stmt)
-        messages_db = result.scalars().all()
-        
-        messages = []
-        for msg_db in messages_db:
-            messages.append(ChatMessage(
-                id=msg_db.id,
-                session_id=msg_db.session_id,
-                role=msg_db.role,
-                content=msg_db.content,
-                agent_type=msg_db.agent_type,
-                timestamp=msg_db.timestamp,
-                metadata=deserialize_json_field(msg_db.message_metadata),
-                suggested_actions=deserialize_json_field(msg_db.suggested_actions, "list")
-            ))
-        
-        return messages
+        summary = fields == "summary"
+        columns = MESSAGE_SUMMARY_COLUMNS if summary else MESSAGE_COLUMNS
+        rows, next_cursor = await fetch_page(
+            db, select(*columns).where(ChatMessageDB.session_id == session_id),
+            ChatMessageDB.timestamp, ChatMessageDB.id, limit, before, after, entities=False
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        
+        if summary:
+            return list_response(ChatMessageSummary, [row._mapping for row in rows], headers)
+        return list_response(ChatMessage, [_message_row(row) for row in rows], headers)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/chat/messages/{message_id}", response_model=ChatMessage)
+async def get_message(message_id: str, db: AsyncSession = Depends(get_read_db)):
+    """Get one message with its metadata and suggested actions"""
+    try:
+        result = await db.execute(select(ChatMessageDB).where(ChatMessageDB.id == message_id))
+        msg_db = result.scalar_one_or_none()
+        
+        if not msg_db:
+            raise HTTPException(status_code=404, detail="Message not found")
+        
+        return ChatMessage(**_message_row(msg_db))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @api_router.get("/chat/sessions")
-async def get_chat_sessions(db: AsyncSession = Depends(get_db)):
-    """Get all chat sessions"""
+async def get_chat_sessions(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Literal["full", "summary"] = "full",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a page of chat sessions, most recently updated first
+    
+    With fields=summary the session context is left out; fetch it from
+    /chat/sessions/{session_id}.
+    """
     try:
-        stmt = select(ChatSessionDB).order_by(ChatSessionDB.updated_at.desc())
-        result = await db.execute(stmt)
-        sessions_db = result.scalars().all()
-        
-        sessions = []
-        for session_db in sessions_db:
-            sessions.append(ChatSession(
-                id=session_db.id,
-                title=session_db.title,
-                created_at=session_db.created_at,
-                updated_at=session_db.updated_at,
-                active_agent=session_db.active_agent,
-                model_provider=session_db.model_provider,
-                model_name=session_db.model_name,
-                context=deserialize_json_field(session_db.context)
-            ))
-        
-        return sessions
+        summary = fields == "summary"
+        rows, next_cursor = await fetch_page(
+            db, select(*(SESSION_SUMMARY_COLUMNS if summary else SESSION_COLUMNS)),
+            ChatSessionDB.updated_at, ChatSessionDB.id,
+            limit, before, after, newest_first=True, entities=False
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        
+        if summary:
+            return list_response(ChatSessionSummary, [row._mapping for row in rows], headers)
+        return list_response(ChatSession, [_session_row(row) for row in rows], headers)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/chat/sessions/{session_id}", response_model=ChatSession)
+async def get_chat_session(session_id: str, db: AsyncSession = Depends(get_read_db)):
+    """Get one chat session with its context"""
+    try:
+        result = await db.execute(select(ChatSessionDB).where(ChatSessionDB.id == session_id))
+        session_db = result.scalar_one_or_none()
+        
+        if not session_db:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        
+        return ChatSession(**_session_row(session_db))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Blob endpoints
+@api_router.get("/blobs/{blob_hash}")
+async def get_blob(blob_hash: str):
+    """Stream a stored tool output or generated image by its SHA-256"""
+    found = await blob_store.lookup(blob_hash)
+    if not found:
+        raise HTTPException(status_code=404, detail="Blob not found")
+    path, content_type = found
+    # Content-addressed: the bytes behind a hash never change
+    return FileResponse(
+        path,
+        media_type=content_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{blob_hash}"'}
+    )
+
+
 # Project endpoints
 @api_router.post("/projects", response_model=Project)
 async def create_project(request: CreateProjectRequest, db: AsyncSession = Depends(get_db)):
@@ -345,65 +676,49 @@ async def create_project(request: CreateProjectRequest, db: AsyncSession = Depen
             template_id=request.template_id,
             tech_stack=serialize_json_field(request.tech_stack),
             status=ProjectStatus.PLANNING,
-            metadata=serialize_json_field({})
+            project_metadata=serialize_json_field({})
         )
         db.add(project_db)
         await db.commit()
         
-        project = Project(
-            id=project_db.id,
-            name=project_db.name,
-            description=project_db.description,
-            status=project_db.status,
-            template_id=project_db.template_id,
-            created_at=project_db.created_at,
-            updated_at=project_db.updated_at,
-            progress=project_db.progress,
-            tech_stack=deserialize_json_field(project_db.tech_stack, "list"),
-            repository_url=project_db.repository_url,
-            deployment_url=project_db.deployment_url,
-            chat_session_id=project_db.chat_session_id,
-            metadata=deserialize_json_field(project_db.metadata)
-        )
-        
-        return project
+        return Project(**_project_row(project_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@api_router.get("/projects", response_model=List[Project])
-async def get_projects(db: AsyncSession = Depends(get_db)):
-    """Get all projects"""
+@api_router.get("/projects")
+async def get_projects(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    fields: Literal["full", "summary"] = "full",
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get a page of projects, most recently updated first
+    
+    With fields=summary the tech stack and metadata are left out; fetch
+    them from /projects/{project_id}.
+    """
     try:
-        stmt = select(ProjectDB).order_by(ProjectDB.updated_at.desc())
-        result = await db.execute(stmt)
-        projects_db = result.scalars().all()
-        
-        projects = []
-        for project_db in projects_db:
-            projects.append(Project(
-                id=project_db.id,
-                name=project_db.name,
-                description=project_db.description,
-                status=project_db.status,
-                template_id=project_db.template_id,
-                created_at=project_db.created_at,
-                updated_at=project_db.updated_at,
-                progress=project_db.progress,
-                tech_stack=deserialize_json_field(project_db.tech_stack, "list"),
-                repository_url=project_db.repository_url,
-                deployment_url=project_db.deployment_url,
-                chat_session_id=project_db.chat_session_id,
-                metadata=deserialize_json_field(project_db.metadata)
-            ))
-        
-        return projects
+        summary = fields == "summary"
+        rows, next_cursor = await fetch_page(
+            db, select(*(PROJECT_SUMMARY_COLUMNS if summary else PROJECT_COLUMNS)),
+            ProjectDB.updated_at, ProjectDB.id,
+            limit, before, after, newest_first=True, entities=False
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        
+        if summary:
+            return list_response(ProjectSummary, [row._mapping for row in rows], headers)
+        return list_response(Project, [_project_row(row) for row in rows], headers)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @api_router.get("/projects/{project_id}", response_model=Project)
-async def get_project(project_id: str, db: AsyncSession = Depends(get_db)):
+async def get_project(project_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get a specific project"""
     try:
         stmt = select(ProjectDB).where(ProjectDB.id == project_id)
@@ -413,23 +728,7 @@ async def get_project(project_id: str, db: AsyncSession = Depends(get_db)):
         if not project_db:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        project = Project(
-            id=project_db.id,
-            name=project_db.name,
-            description=project_db.description,
-            status=project_db.status,
-            template_id=project_db.template_id,
-            created_at=project_db.created_at,
-            updated_at=project_db.updated_at,
-            progress=project_db.progress,
-            tech_stack=deserialize_json_field(project_db.tech_stack, "list"),
-            repository_url=project_db.repository_url,
-            deployment_url=project_db.deployment_url,
-            chat_session_id=project_db.chat_session_id,
-            metadata=deserialize_json_field(project_db.metadata)
-        )
-        
-        return project
+        return Project(**_project_row(project_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -454,105 +753,36 @@ async def update_project(project_id: str, request: UpdateProjectRequest, db: Asy
         result = await db.execute(stmt)
         project_db = result.scalar_one()
         
-        project = Project(
-            id=project_db.id,
-            name=project_db.name,
-            description=project_db.description,
-            status=project_db.status,
-            template_id=project_db.template_id,
-            created_at=project_db.created_at,
-            updated_at=project_db.updated_at,
-            progress=project_db.progress,
-            tech_stack=deserialize_json_field(project_db.tech_stack, "list"),
-            repository_url=project_db.repository_url,
-            deployment_url=project_db.deployment_url,
-            chat_session_id=project_db.chat_session_id,
-            metadata=deserialize_json_field(project_db.metadata)
-        )
-        
-        return project
+        return Project(**_project_row(project_db))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 # Template endpoints
+def _etag_response(request: Request, body: bytes, etag: str) -> Response:
+    """Serve a precomputed JSON body, or 304 if the client already has it"""
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in client_etags or "*" in client_etags:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @api_router.get("/templates", response_model=List[AppTemplate])
-async def get_templates(db: AsyncSession = Depends(get_db)):
-    """Get all app templates"""
-    try:
-        # Check if templates exist in database
-        stmt = select(AppTemplateDB)
-        result = await db.execute(stmt)
-        templates_db = result.scalars().all()
-        
-        if not templates_db:
-            # Insert default templates
-            for template_data in DEFAULT_TEMPLATES:
-                template_db = AppTemplateDB(
-                    id=template_data["id"],
-                    name=template_data["name"],
-                    description=template_data["description"],
-                    icon=template_data["icon"],
-                    color=template_data["color"],
-                    category=template_data["category"],
-                    prompt=template_data["prompt"],
-                    tech_stack=serialize_json_field(template_data["tech_stack"]),
-                    features=serialize_json_field(template_data["features"])
-                )
-                db.add(template_db)
-            
-            await db.commit()
-            
-            # Get templates again
-            stmt = select(AppTemplateDB)
-            result = await db.execute(stmt)
-            templates_db = result.scalars().all()
-        
-        templates = []
-        for template_db in templates_db:
-            templates.append(AppTemplate(
-                id=template_db.id,
-                name=template_db.name,
-                description=template_db.description,
-                icon=template_db.icon,
-                color=template_db.color,
-                category=template_db.category,
-                prompt=template_db.prompt,
-                tech_stack=deserialize_json_field(template_db.tech_stack, "list"),
-                features=deserialize_json_field(template_db.features, "list")
-            ))
-        
-        return templates
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_templates(request: Request):
+    """Get all app templates from the in-memory catalog"""
+    body, etag = template_catalog.list_response()
+    return _etag_response(request, body, etag)
 
 
 @api_router.get("/templates/{template_id}", response_model=AppTemplate)
-async def get_template(template_id: str, db: AsyncSession = Depends(get_db)):
-    """Get a specific template"""
-    try:
-        stmt = select(AppTemplateDB).where(AppTemplateDB.id == template_id)
-        result = await db.execute(stmt)
-        template_db = result.scalar_one_or_none()
-        
-        if not template_db:
-            raise HTTPException(status_code=404, detail="Template not found")
-        
-        template = AppTemplate(
-            id=template_db.id,
-            name=template_db.name,
-            description=template_db.description,
-            icon=template_db.icon,
-            color=template_db.color,
-            category=template_db.category,
-            prompt=template_db.prompt,
-            tech_stack=deserialize_json_field(template_db.tech_stack, "list"),
-            features=deserialize_json_field(template_db.features, "list")
-        )
-        
-        return template
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_template(template_id: str, request: Request):
+    """Get a specific template from the in-memory catalog"""
+    cached = template_catalog.item_response(template_id)
+    if not cached:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return _etag_response(request, *cached)
 
 
 # Agent endpoints
@@ -607,6 +837,7 @@ async def create_api_key(request: CreateAPIKeyRequest, db: AsyncSession = Depend
         db.add(api_key_db)
         await db.commit()
         await db.refresh(api_key_db)
+        await api_key_cache.refresh()
         
         # Convert to response model (mask the key)
         api_key = APIKey(
@@ -628,7 +859,7 @@ async def create_api_key(request: CreateAPIKeyRequest, db: AsyncSession = Depend
 
 
 @api_router.get("/api-keys", response_model=List[APIKey])
-async def get_api_keys(db: AsyncSession = Depends(get_db)):
+async def get_api_keys(db: AsyncSession = Depends(get_read_db)):
     """Get all API keys (with masked keys)"""
     try:
         stmt = select(APIKeyDB).order_by(APIKeyDB.created_at.desc())
@@ -656,7 +887,7 @@ async def get_api_keys(db: AsyncSession = Depends(get_db)):
 
 
 @api_router.get("/api-keys/{key_id}", response_model=APIKey)
-async def get_api_key(key_id: str, db: AsyncSession = Depends(get_db)):
+async def get_api_key(key_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get a specific API key (with masked key)"""
     try:
         stmt = select(APIKeyDB).where(APIKeyDB.id == key_id)
@@ -710,6 +941,7 @@ async def update_api_key(key_id: str, request: UpdateAPIKeyRequest, db: AsyncSes
             stmt = update(APIKeyDB).where(APIKeyDB.id == key_id).values(**update_data)
             await db.execute(stmt)
             await db.commit()
+            await api_key_cache.refresh()
             
             # Refresh the object
             stmt = select(APIKeyDB).where(APIKeyDB.id == key_id)
@@ -749,6 +981,7 @@ async def delete_api_key(key_id: str, db: AsyncSession = Depends(get_db)):
         stmt = delete(APIKeyDB).where(APIKeyDB.id == key_id)
         await db.execute(stmt)
         await db.commit()
+        await api_key_cache.refresh()
         
         return {"message": f"API key for {key_db.provider} deleted successfully"}
     except HTTPException:
@@ -787,7 +1020,7 @@ async def create_collaboration(
 async def get_collaboration_status(session_id: str):
     """Get detailed status of collaboration session"""
     try:
-        status = collaboration_manager.get_collaboration_status(session_id)
+        status = await collaboration_manager.get_collaboration_status(session_id)
         if "error" in status:
             raise HTTPException(status_code=404, detail=status["error"])
         return status
@@ -799,7 +1032,7 @@ async def get_collaboration_status(session_id: str):
 async def get_collaboration_tasks(session_id: str):
     """Get all tasks for a collaboration session"""
     try:
-        tasks = collaboration_manager.get_active_tasks(session_id)
+        tasks = await collaboration_manager.get_active_tasks(session_id)
         return {
             "session_id": session_id,
             "active_tasks": len(tasks),
@@ -845,7 +1078,7 @@ async def update_task_status(
                 detail=f"Invalid status: {status}. Valid statuses: {[s.value for s in AgentStatus]}"
             )
         
-        success = collaboration_manager.update_task_status(
+        success = await collaboration_manager.update_task_status(
             task_id=task_id,
             status=agent_status,
             message=message
@@ -878,7 +1111,7 @@ async def create_handoff(
         except ValueError as e:
             raise HTTPException(status_code=400, detail=f"Invalid agent type: {e}")
         
-        task = collaboration_manager.create_handoff_task(
+        task = await collaboration_manager.create_handoff_task(
             from_agent=from_agent_type,
             to_agent=to_agent_type,
             collaboration_id=collaboration_id,
@@ -901,7 +1134,7 @@ async def create_handoff(
 async def get_collaboration_agents(session_id: str):
     """Get information about active agents in collaboration"""
     try:
-        collaboration = collaboration_manager.get_collaboration(session_id)
+        collaboration = await collaboration_manager.get_collaboration(session_id)
         if not collaboration:
             raise HTTPException(status_code=404, detail="Collaboration not found")
         
@@ -929,6 +1162,13 @@ async def get_collaboration_agents(session_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.websocket("/collaboration/{session_id}/ws")
+async def collaboration_updates(websocket: WebSocket, session_id: str):
+    """Push collaboration updates: a snapshot on connect, then task and phase events"""
+    await websocket.accept()
+    await collaboration_hub.serve(websocket, session_id)
+
+
 # Health check
 @api_router.get("/")
 async def root():
@@ -942,8 +1182,17 @@ async def health_check():
         "status": "healthy",
         "timestamp": datetime.utcnow(),
         "services": {
-            "database": "sqlite_connected",
+            "database": "sqlite_connected" if IS_SQLITE else "postgresql_connected",
             "ai_service": "active",
+            "api_key_cache": api_key_cache.stats(),
+            "crawl_cache": crawl_cache.stats(),
+            "search_cache": search_cache.stats(),
+            "commit_writer": commit_writer.stats(),
+            "blob_store": blob_store.stats(),
+            "collaboration_store": collaboration_store.stats(),
+            "collaborations": collaboration_manager.stats(),
+            "task_scheduler": task_scheduler.stats(),
+            "collaboration_hub": collaboration_hub.stats(),
             "agents": len(agent_manager.get_all_agents())
         }
     }
@@ -962,6 +1211,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include the router in the main app
@@ -978,13 +1228,29 @@ logger = logging.getLogger(__name__)
 # Create tables on startup
 @app.on_event("startup")
 async def startup_event():
-    await create_tables()
-    logger.info("Database tables created successfully")
+    applied = await create_tables()
+    logger.info(f"Database schema up to date (applied migrations: {applied or 'none'})")
+    await api_key_cache.refresh()
+    await template_catalog.load(DEFAULT_TEMPLATES)
+    await http_pool.start()
+    await commit_writer.start()
+    await collaboration_store.start()
+    await collaboration_manager.start()
+    await task_scheduler.start()
+    await job_queue.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutting down")
+    await job_queue.stop()
+    await task_scheduler.stop()
+    await collaboration_manager.stop()
+    await collaboration_store.stop()
+    await commit_writer.stop()
+    await http_pool.close()
+    extraction_engine.shutdown()
+    await dispose_engines()
 
 
 # For running with uvicorn directly (useful for Railway)
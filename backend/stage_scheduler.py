@@ -0,0 +1,92 @@
+"""
+Stage Scheduler - запуск этапов workflow как графа зависимостей
+Каждый AgentTask стартует, как только завершены все задачи из его dependencies
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from models import AgentStatus, AgentTask
+
+
+class StageScheduler:
+    """Runs AgentTasks concurrently in dependency order
+
+    A dependency counts as satisfied once the task it names has finished,
+    whether it completed or failed, so one broken stage does not hide the
+    output of the others. Tasks with metadata["critical"] set abort the whole
+    run when they fail.
+    """
+
+    def __init__(self, tasks: List[AgentTask],
+                 runner: Callable[[AgentTask], Awaitable[bool]],
+                 on_event: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None):
+        self.tasks = {task.id: task for task in tasks}
+        self.runner = runner
+        self.on_event = on_event
+
+        for task in tasks:
+            unknown = [dep for dep in task.dependencies if dep not in self.tasks]
+            if unknown:
+                raise ValueError(f"Task {task.id} depends on unknown tasks: {unknown}")
+
+    async def run(self) -> bool:
+        """Run every task; returns False if a critical task failed"""
+        pending = dict(self.tasks)
+        finished = set()
+        running: Dict[asyncio.Task, AgentTask] = {}
+
+        try:
+            while pending or running:
+                ready = [task for task in pending.values()
+                         if all(dep in finished for dep in task.dependencies)]
+                for task in ready:
+                    del pending[task.id]
+                    running[asyncio.create_task(self._run_task(task))] = task
+
+                if not running:
+                    raise ValueError(f"Dependency cycle between tasks: {list(pending)}")
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    finished.add(task.id)
+                    if task.status == AgentStatus.FAILED and task.metadata.get("critical"):
+                        return False
+            return True
+        finally:
+            for future in running:
+                future.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _run_task(self, task: AgentTask):
+        task.status = AgentStatus.WORKING
+        task.started_at = task.updated_at = datetime.utcnow()
+        await self._emit("stage_started", {"stage": task.agent_type.value, "task_id": task.id})
+
+        try:
+            success = await self.runner(task)
+        except Exception as e:
+            print(f"Stage {task.agent_type.value} failed: {e}")
+            success = False
+
+        task.status = AgentStatus.COMPLETED if success else AgentStatus.FAILED
+        task.completed_at = task.updated_at = datetime.utcnow()
+        elapsed = (task.completed_at - task.started_at).total_seconds()
+        task.actual_duration = int(elapsed / 60)
+        await self._emit("stage_completed", {
+            "stage": task.agent_type.value,
+            "task_id": task.id,
+            "status": task.status.value,
+            "duration_ms": int(elapsed * 1000)
+        })
+
+    async def _emit(self, event: str, data: Dict[str, Any]):
+        if not self.on_event:
+            return
+        try:
+            await self.on_event(event, data)
+        except Exception as e:
+            print(f"Error emitting {event} event: {e}")
@@ -0,0 +1,260 @@
+"""
+Agent Task Scheduler - runs collaboration tasks through RealAgentExecutor
+Ready tasks wait on one priority heap per agent type; a task becomes ready once
+its dependencies completed, and its completion hands off to the next agent's task
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+
+from agents import AgentCollaborationManager
+from database import AgentTaskDB, AsyncReadSessionLocal
+from models import AgentCollaboration, AgentStatus, AgentTask, AgentType, TaskPriority
+from real_agent_executor import RealAgentExecutor
+
+logger = logging.getLogger(__name__)
+
+# Heap order: most urgent first, then first come first served
+PRIORITY_RANK = {
+    TaskPriority.URGENT: 0,
+    TaskPriority.HIGH: 1,
+    TaskPriority.MEDIUM: 2,
+    TaskPriority.LOW: 3
+}
+
+# Characters of the agent response kept in the task result
+RESULT_RESPONSE_CHARS = 4000
+
+# Number of recent queue waits the percentiles are computed over
+WAIT_SAMPLES = 1000
+
+
+def _parse_agent_limits(spec: str) -> Dict[AgentType, int]:
+    """'frontend_developer=2,testing_expert=1' -> {AgentType: limit}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = item.partition("=")
+        try:
+            limits[AgentType(name.strip())] = int(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid AGENT_TASK_LIMITS entry: {item}")
+    return limits
+
+
+def _task_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of an executor result kept on the task and passed along the handoff"""
+    return {
+        "success": result.get("success", True),
+        "response": (result.get("response") or "")[:RESULT_RESPONSE_CHARS],
+        "created_files": result.get("created_files", []),
+        "error": result.get("error")
+    }
+
+
+class AgentTaskScheduler:
+    """Dispatches ready tasks by priority within per-agent-type and global concurrency limits"""
+
+    def __init__(self, manager: AgentCollaborationManager,
+                 executor_factory: Callable[[], RealAgentExecutor] = RealAgentExecutor,
+                 max_concurrent: Optional[int] = None, agent_limit: Optional[int] = None,
+                 agent_limits: Optional[Dict[AgentType, int]] = None):
+        self.manager = manager
+        # RealAgentExecutor keeps per-run state on the instance, so each run gets its own
+        self.executor_factory = executor_factory
+        self.max_concurrent = max_concurrent or int(os.getenv("AGENT_TASK_MAX_CONCURRENT", "4"))
+        self.agent_limit = agent_limit or int(os.getenv("AGENT_TASK_CONCURRENCY", "1"))
+        self.agent_limits = (agent_limits if agent_limits is not None
+                             else _parse_agent_limits(os.getenv("AGENT_TASK_LIMITS", "")))
+
+        # agent type -> heap of (priority rank, arrival, task_id)
+        self._ready: Dict[AgentType, List[Tuple[int, int, str]]] = {}
+        self._arrival = itertools.count()
+        # task_id -> monotonic time it was first queued
+        self._queued_at: Dict[str, float] = {}
+        # collaboration_id -> task ids waiting on dependencies
+        self._waiting: Dict[str, Dict[str, None]] = {}
+        # task ids to (re)evaluate on the next dispatcher pass; a dict keeps them in
+        # arrival order, so equal priorities are queued first come first served
+        self._pending: Dict[str, None] = {}
+        self._running: Dict[AgentType, int] = {}
+        self._active = 0  # released in _execute's finally, before the run task itself completes
+        self._runs: Set[asyncio.Task] = set()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLES)
+
+        manager.add_listener(self._on_task_event)
+
+    def limit(self, agent_type: AgentType) -> int:
+        return self.agent_limits.get(agent_type, self.agent_limit)
+
+    async def start(self):
+        """Start dispatching; unfinished tasks of a previous process are picked up again"""
+        if self._dispatcher:
+            return
+        self._wakeup = asyncio.Event()
+        await self._recover()
+        self._dispatcher = asyncio.create_task(self._run())
+        self._wakeup.set()
+        logger.info(f"Agent task scheduler started (max {self.max_concurrent} concurrent tasks)")
+
+    async def stop(self):
+        """Cancel dispatching and running tasks; they are recovered on the next start"""
+        tasks = [self._dispatcher, *self._runs] if self._dispatcher else list(self._runs)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._runs.clear()
+
+    async def _recover(self):
+        """Re-queue the tasks a previous process left idle or running
+
+        A task that was running is reset to idle and runs again from the start.
+        """
+        async with AsyncReadSessionLocal() as db:
+            rows = (await db.execute(
+                select(AgentTaskDB.id, AgentTaskDB.status).where(
+                    AgentTaskDB.collaboration_id.is_not(None),
+                    AgentTaskDB.status.in_([AgentStatus.IDLE.value, AgentStatus.WORKING.value])
+                ).order_by(AgentTaskDB.created_at)
+            )).all()
+        for task_id, status in rows:
+            if status == AgentStatus.WORKING.value:
+                await self.manager.update_task_status(task_id, AgentStatus.IDLE)
+            self._pending[task_id] = None
+
+    def _on_task_event(self, event: str, collaboration: AgentCollaboration, task: AgentTask):
+        if event == "task_created" and task.status == AgentStatus.IDLE:
+            self._pending[task.id] = None
+        elif event == "task_updated" and task.status in (AgentStatus.COMPLETED, AgentStatus.FAILED):
+            # Tasks waiting on this collaboration may have become ready (or can never run)
+            self._pending.update(self._waiting.pop(collaboration.id, {}))
+        else:
+            return
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            for task_id in pending:
+                try:
+                    await self._admit(task_id)
+                except Exception as e:
+                    logger.error(f"Could not schedule agent task {task_id}: {e}")
+            self._dispatch()
+
+    async def _admit(self, task_id: str):
+        """Queue a task by priority if it is ready, park it if it waits on dependencies"""
+        entry = await self.manager.find_task(task_id)
+        if not entry:
+            return
+        collaboration, task = entry
+        if task.status != AgentStatus.IDLE:
+            self._queued_at.pop(task_id, None)
+            return  # already driven by someone else
+
+        state = self.manager.dependency_state(collaboration, task)
+        if state == "waiting":
+            self._waiting.setdefault(collaboration.id, {})[task_id] = None
+            self._queued_at.setdefault(task_id, time.monotonic())
+        elif state == "failed":
+            self._queued_at.pop(task_id, None)
+            await self.manager.update_task_status(
+                task_id, AgentStatus.FAILED, result={"success": False, "error": "A dependency failed or does not exist"}
+            )
+        else:
+            self._queued_at.setdefault(task_id, time.monotonic())
+            heapq.heappush(self._ready.setdefault(task.agent_type, []),
+                           (PRIORITY_RANK.get(task.priority, len(PRIORITY_RANK)), next(self._arrival), task_id))
+
+    def _dispatch(self):
+        """Start the most urgent ready tasks whose agent type has a free slot"""
+        while self._active < self.max_concurrent:
+            candidates = [
+                (heap[0], agent_type) for agent_type, heap in self._ready.items()
+                if heap and self._running.get(agent_type, 0) < self.limit(agent_type)
+            ]
+            if not candidates:
+                return
+            (_, _, task_id), agent_type = min(candidates)
+            heapq.heappop(self._ready[agent_type])
+            self._running[agent_type] = self._running.get(agent_type, 0) + 1
+            self._active += 1
+            run = asyncio.create_task(self._execute(agent_type, task_id))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+
+    async def _execute(self, agent_type: AgentType, task_id: str):
+        try:
+            queued_at = self._queued_at.pop(task_id, None)
+            entry = await self.manager.find_task(task_id)
+            if not entry or entry[1].status != AgentStatus.IDLE:
+                return  # changed by someone else while queued
+            collaboration, task = entry
+            if queued_at is not None:
+                self._waits.append(time.monotonic() - queued_at)
+            self.dispatched += 1
+
+            await self.manager.update_task_status(task_id, AgentStatus.WORKING)
+            try:
+                result = await self.executor_factory().execute_agent_task(
+                    agent_type=agent_type,
+                    message=task.description,
+                    session_id=collaboration.session_id,
+                    context=dict(task.metadata)
+                )
+            except Exception as e:
+                logger.error(f"Agent task {task_id} ({agent_type.value}) failed: {e}")
+                result = {"success": False, "error": str(e)}
+
+            succeeded = bool(result.get("success", True))
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+            # Completion creates the handoff task, which comes back through _on_task_event
+            await self.manager.update_task_status(
+                task_id, AgentStatus.COMPLETED if succeeded else AgentStatus.FAILED, result=_task_result(result)
+            )
+        finally:
+            self._running[agent_type] -= 1
+            self._active -= 1
+            if self._wakeup:
+                self._wakeup.set()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(fraction: float) -> float:
+            return round(waits[min(len(waits) - 1, int(len(waits) * fraction))] * 1000, 1) if waits else 0.0
+
+        return {
+            "queue_depth": sum(len(heap) for heap in self._ready.values()),
+            "queue_depth_by_agent": {agent_type.value: len(heap) for agent_type, heap in self._ready.items() if heap},
+            "waiting_on_dependencies": sum(len(task_ids) for task_ids in self._waiting.values()),
+            "running": self._active,
+            "running_by_agent": {agent_type.value: count for agent_type, count in self._running.items() if count},
+            "max_concurrent": self.max_concurrent,
+            "dispatched": self.dispatched,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0
+        }
@@ -0,0 +1,90 @@
+"""
+Template Catalog - immutable in-memory copy of app_templates
+Seeded and loaded once in the startup hook; serves precomputed JSON bodies with ETags
+"""
+
+import hashlib
+import json
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select
+
+from database import AppTemplateDB, AsyncSessionLocal, deserialize_json_field, serialize_json_field
+from models import AppTemplate
+
+
+def _encode(value: Any) -> Tuple[bytes, str]:
+    """Serialized JSON body and its strong ETag"""
+    body = json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class TemplateCatalog:
+    """Templates by id plus the serialized list and per-template responses"""
+
+    def __init__(self):
+        self.templates: Tuple[AppTemplate, ...] = ()
+        self._by_id: Mapping[str, AppTemplate] = MappingProxyType({})
+        self._list_response: Tuple[bytes, str] = _encode([])
+        self._item_responses: Mapping[str, Tuple[bytes, str]] = MappingProxyType({})
+
+    async def load(self, defaults: List[Dict[str, Any]]):
+        """Seed the defaults into an empty table, then snapshot the table"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(AppTemplateDB))
+            templates_db = result.scalars().all()
+
+            if not templates_db:
+                for template_data in defaults:
+                    db.add(AppTemplateDB(
+                        id=template_data["id"],
+                        name=template_data["name"],
+                        description=template_data["description"],
+                        icon=template_data["icon"],
+                        color=template_data["color"],
+                        category=template_data["category"],
+                        prompt=template_data["prompt"],
+                        tech_stack=serialize_json_field(template_data["tech_stack"]),
+                        features=serialize_json_field(template_data["features"])
+                    ))
+                await db.commit()
+
+                result = await db.execute(select(AppTemplateDB))
+                templates_db = result.scalars().all()
+
+        templates = tuple(
+            AppTemplate(
+                id=template_db.id,
+                name=template_db.name,
+                description=template_db.description,
+                icon=template_db.icon,
+                color=template_db.color,
+                category=template_db.category,
+                prompt=template_db.prompt,
+                tech_stack=deserialize_json_field(template_db.tech_stack, "list"),
+                features=deserialize_json_field(template_db.features, "list")
+            )
+            for template_db in templates_db
+        )
+
+        # Swap in a complete new snapshot; readers never see a partial catalog
+        self._by_id = MappingProxyType({template.id: template for template in templates})
+        self._item_responses = MappingProxyType({template.id: _encode(template) for template in templates})
+        self._list_response = _encode(list(templates))
+        self.templates = templates
+
+    def get(self, template_id: str) -> Optional[AppTemplate]:
+        return self._by_id.get(template_id)
+
+    def list_response(self) -> Tuple[bytes, str]:
+        """(body, etag) of GET /templates"""
+        return self._list_response
+
+    def item_response(self, template_id: str) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) of GET /templates/{template_id}, or None if unknown"""
+        return self._item_responses.get(template_id)
+
+
+template_catalog = TemplateCatalog()
@@ -28,14 +28,78 @@ const AgentCollaboration = () => {
   const baseUrl = process.env.REACT_APP_BACKEND_URL || 'http://localhost:8001';
 
   useEffect(() => {
-    if (sessionId) {
-      loadCollaborationData();
-      // Set up polling for real-time updates
-      const interval = setInterval(loadCollaborationData, 3000);
-      return () => clearInterval(interval);
+    if (!sessionId) {
+      return undefined;
     }
+    loadCollaborationData();
+
+    // Real-time updates are pushed over a WebSocket; fall back to polling if it drops
+    let interval = null;
+    const socket = new WebSocket(`${baseUrl.replace(/^http/, 'ws')}/api/collaboration/${sessionId}/ws`);
+    socket.onmessage = (event) => applyCollaborationEvent(JSON.parse(event.data));
+    socket.onclose = () => {
+      if (!interval) {
+        interval = setInterval(loadCollaborationData, 3000);
+      }
+    };
+
+    return () => {
+      socket.onclose = null;
+      socket.close();
+      if (interval) {
+        clearInterval(interval);
+      }
+    };
   }, [sessionId]);
 
+  const applyCollaborationEvent = (message) => {
+    switch (message.type) {
+      case 'snapshot':
+        if (message.status) {
+          setCollaborationStatus(message.status);
+          setTasks(message.tasks);
+        }
+        break;
+      case 'task_created':
+      case 'task_updated': {
+        const { task } = message;
+        const isActive = task.status !== 'completed' && task.status !== 'failed';
+        setTasks((current) => {
+          const others = current.filter((item) => item.id !== task.id);
+          return isActive ? [...others, task] : others;
+        });
+        setCollaborationStatus((current) => current && {
+          ...current,
+          total_tasks: message.total_tasks,
+          active_tasks: message.active_tasks,
+          completed_tasks: message.completed_tasks,
+          active_agents: message.active_agents || current.active_agents,
+          recent_handoffs: message.handoff
+            ? [...current.recent_handoffs, message.handoff].slice(-5)
+            : current.recent_handoffs
+        });
+        if (message.active_agents) {
+          // A handoff may bring a new agent into the collaboration
+          loadAgents();
+        }
+        break;
+      }
+      case 'phase_changed':
+        setCollaborationStatus((current) => current && { ...current, current_phase: message.current_phase });
+        break;
+      default:
+        break;
+    }
+  };
+
+  const loadAgents = async () => {
+    const agentsResponse = await fetch(`${baseUrl}/api/collaboration/${sessionId}/agents`);
+    if (agentsResponse.ok) {
+      const agentsData = await agentsResponse.json();
+      setAgents(agentsData.active_agents || []);
+    }
+  };
+
   const loadCollaborationData = async () => {
     try {
       setLoading(true);
@@ -12,6 +12,20 @@ const apiClient = axios.create({
   },
 });
 
+// List endpoints return one page at a time (PAGE_DEFAULT_LIMIT rows); the cursor of
+// the next, older page comes back in the X-Next-Cursor header, absent on the last page
+const fetchAllPages = async (url, { olderFirst = false } = {}) => {
+  let items = [];
+  let before = null;
+  do {
+    const response = await apiClient.get(url, { params: before ? { before } : {} });
+    // Older pages go in front of lists shown oldest first and after lists shown newest first
+    items = olderFirst ? [...response.data, ...items] : [...items, ...response.data];
+    before = response.headers['x-next-cursor'];
+  } while (before);
+  return items;
+};
+
 // Chat API
 export const chatAPI = {
   sendMessage: async (sessionId, message, agentType = null, modelProvider = 'gemini', modelName = 'gemini-2.0-flash') => {
@@ -26,13 +40,11 @@ export const chatAPI = {
   },
 
   getSessionMessages: async (sessionId) => {
-    const response = await apiClient.get(`/chat/session/${sessionId}/messages`);
-    return response.data;
+    return fetchAllPages(`/chat/session/${sessionId}/messages`, { olderFirst: true });
   },
 
   getChatSessions: async () => {
-    const response = await apiClient.get('/chat/sessions');
-    return response.data;
+    return fetchAllPages('/chat/sessions');
   }
 };
 
@@ -49,8 +61,7 @@ export const projectAPI = {
   },
 
   getProjects: async () => {
-    const response = await apiClient.get('/projects');
-    return response.data;
+    return fetchAllPages('/projects');
   },
 
   getProject: async (projectId) => {
@@ -0,0 +1,49 @@
+"""
+Shared setup for the backend tests
+The backend modules are flat and read their settings at import time, so the
+backend directory goes on sys.path and the database is chosen first: the
+TEST_DATABASE_URL database when set (e.g. a local PostgreSQL), otherwise a
+scratch SQLite file
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import delete
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+_scratch = tempfile.mkdtemp(prefix="backend-tests-")
+# Never DATABASE_URL itself: the collaboration tests empty the agent_* tables,
+# so TEST_DATABASE_URL must name a disposable database
+os.environ["DATABASE_URL"] = (os.getenv("TEST_DATABASE_URL")
+                              or f"sqlite+aiosqlite:///{os.path.join(_scratch, 'test.db')}")
+os.environ["CRAWL_CACHE_DIR"] = os.path.join(_scratch, "crawl_cache")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_scratch, "blob_store")
+
+from database import (  # noqa: E402  (needs DATABASE_URL set above)
+    AgentCollaborationDB, AgentHandoffDB, AgentTaskDB, AsyncSessionLocal, create_tables, dispose_engines
+)
+
+
+async def _with_database(scenario):
+    await create_tables()
+    async with AsyncSessionLocal() as db:
+        for model in (AgentHandoffDB, AgentTaskDB, AgentCollaborationDB):
+            await db.execute(delete(model))
+        await db.commit()
+    try:
+        await scenario()
+    finally:
+        # Pooled connections belong to this event loop
+        await dispose_engines()
+
+
+@pytest.fixture
+def run_with_database():
+    """Run an async scenario against migrated, empty collaboration tables"""
+    return lambda scenario: asyncio.run(_with_database(scenario))
@@ -0,0 +1,128 @@
+"""
+Write-behind persistence of agent collaborations: flushed state loads back
+identical, and evicted collaborations are rehydrated from the database
+"""
+
+from agents import AgentCollaborationManager
+from collaboration_store import CollaborationStore
+from models import AgentStatus, AgentType
+
+
+async def _collaboration_with_history(manager: AgentCollaborationManager, session_id: str):
+    """A collaboration with a finished planner task, a handoff and a task in progress"""
+    collaboration = manager.create_collaboration("project-1", session_id, "build a todo app")
+    planner_task = collaboration.agent_tasks[0]
+    await manager.update_task_status(planner_task.id, AgentStatus.WORKING)
+    await manager.update_task_status(planner_task.id, AgentStatus.COMPLETED, result={"success": True, "response": "plan"})
+    await manager.update_task_status(collaboration.agent_tasks[1].id, AgentStatus.WORKING)
+    await manager.create_handoff_task(AgentType.DESIGN_AGENT, AgentType.BACKEND_DEVELOPER, session_id,
+                                      "design is ready", {"screens": ["list", "detail"]})
+    return collaboration
+
+
+def test_flushed_collaboration_loads_back_identical(run_with_database):
+    async def scenario():
+        store = CollaborationStore()
+        manager = AgentCollaborationManager(store=store)
+        collaboration = await _collaboration_with_history(manager, "session-1")
+        assert store.dirty
+
+        written = await store.flush()
+        assert written == 1 + len(collaboration.agent_tasks) + len(collaboration.handoffs)
+        assert store.dirty == 0
+
+        loaded = await store.load("session-1")
+        assert loaded.model_dump() == collaboration.model_dump()
+        assert await store.task_session_id(collaboration.agent_tasks[-1].id) == "session-1"
+        assert await store.load("unknown-session") is None
+
+    run_with_database(scenario)
+
+
+def test_later_changes_overwrite_earlier_rows(run_with_database):
+    async def scenario():
+        store = CollaborationStore()
+        manager = AgentCollaborationManager(store=store)
+        collaboration = manager.create_collaboration("project-1", "session-1", "build a todo app")
+        await store.flush()
+
+        await manager.update_task_status(collaboration.agent_tasks[0].id, AgentStatus.FAILED)
+        await store.flush()
+
+        loaded = await store.load("session-1")
+        assert loaded.agent_tasks[0].status == AgentStatus.FAILED
+        assert loaded.model_dump() == collaboration.model_dump()
+
+    run_with_database(scenario)
+
+
+def test_idle_collaboration_is_evicted_and_rehydrated(run_with_database):
+    async def scenario():
+        store = CollaborationStore()
+        manager = AgentCollaborationManager(store=store, idle_ttl_seconds=0)
+        collaboration = await _collaboration_with_history(manager, "session-1")
+        snapshot = collaboration.model_dump()
+
+        # evict() flushes first, so nothing dirty is dropped
+        assert await manager.evict() == 1
+        assert store.dirty == 0
+        assert manager.stats()["resident"] == 0
+        assert manager.stats()["resident_tasks"] == 0
+
+        reloaded = await manager.get_collaboration("session-1")
+        assert reloaded is not collaboration
+        assert reloaded.model_dump() == snapshot
+        assert manager.stats()["rehydrations"] == 1
+        assert [task.id for task in manager.active_tasks(reloaded)] == [
+            task.id for task in reloaded.agent_tasks if task.status not in (AgentStatus.COMPLETED, AgentStatus.FAILED)
+        ]
+
+    run_with_database(scenario)
+
+
+def test_task_lookup_rehydrates_its_collaboration(run_with_database):
+    async def scenario():
+        store = CollaborationStore()
+        manager = AgentCollaborationManager(store=store, idle_ttl_seconds=0)
+        collaboration = await _collaboration_with_history(manager, "session-1")
+        working_task = collaboration.agent_tasks[1]
+        await manager.evict()
+
+        assert await manager.update_task_status(working_task.id, AgentStatus.COMPLETED)
+        assert manager.stats()["rehydrations"] == 1
+        await store.flush()
+        assert (await store.load("session-1")).agent_tasks[1].status == AgentStatus.COMPLETED
+
+    run_with_database(scenario)
+
+
+def test_least_recently_used_collaborations_go_first(run_with_database):
+    async def scenario():
+        store = CollaborationStore()
+        manager = AgentCollaborationManager(store=store, idle_ttl_seconds=3600, max_resident=2)
+        for session_id in ("session-1", "session-2", "session-3"):
+            manager.create_collaboration("project-1", session_id, "build")
+        await manager.get_collaboration("session-1")  # session-2 is now the least recently used
+
+        assert await manager.evict() == 1
+        assert set(manager.active_collaborations) == {"session-1", "session-3"}
+        assert (await manager.get_collaboration("session-2")).session_id == "session-2"
+
+    run_with_database(scenario)
+
+
+def test_collaborations_that_failed_to_flush_stay_resident(run_with_database, monkeypatch):
+    async def scenario():
+        store = CollaborationStore()
+        manager = AgentCollaborationManager(store=store, idle_ttl_seconds=0)
+        manager.create_collaboration("project-1", "session-1", "build")
+
+        async def failing_write(ops):
+            raise OSError("disk full")
+
+        monkeypatch.setattr("collaboration_store.commit_writer.write", failing_write)
+        assert await manager.evict() == 0
+        assert "session-1" in manager.active_collaborations
+        assert store.stats()["failed_flushes"] == 1
+
+    run_with_database(scenario)
@@ -0,0 +1,165 @@
+"""
+crawl_tool caching against a local aiohttp server: freshness, ETag and
+Last-Modified revalidation, no-store and LRU eviction by total bytes
+"""
+
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import agent_tools
+from agent_tools import AgentToolsManager
+from crawl_cache import CrawlCache
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def _page(title: str) -> str:
+    return f"<html><head><title>{title}</title></head><body><p>{title} body</p></body></html>"
+
+
+class Upstream:
+    """Counts requests per path and the conditional headers they carried"""
+
+    def __init__(self):
+        self.requests = []
+        self.not_modified = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/etag", self.etag)
+        app.router.add_get("/last-modified", self.last_modified)
+        app.router.add_get("/no-store", self.no_store)
+        app.router.add_get("/fresh", self.fresh)
+        app.router.add_get("/big/{name}", self.big)
+        return app
+
+    def _record(self, request: web.Request):
+        self.requests.append(request.path)
+
+    def _maybe_304(self, matches: bool, headers: dict):
+        if matches:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        return None
+
+    async def etag(self, request):
+        self._record(request)
+        headers = {"ETag": '"v1"', "Cache-Control": "no-cache"}
+        return (self._maybe_304(request.headers.get("If-None-Match") == '"v1"', headers)
+                or web.Response(text=_page("etag"), content_type="text/html", headers=headers))
+
+    async def last_modified(self, request):
+        self._record(request)
+        headers = {"Last-Modified": LAST_MODIFIED, "Cache-Control": "max-age=0"}
+        return (self._maybe_304(request.headers.get("If-Modified-Since") == LAST_MODIFIED, headers)
+                or web.Response(text=_page("last-modified"), content_type="text/html", headers=headers))
+
+    async def no_store(self, request):
+        self._record(request)
+        return web.Response(text=_page("no-store"), content_type="text/html",
+                            headers={"Cache-Control": "no-store"})
+
+    async def fresh(self, request):
+        self._record(request)
+        return web.Response(text=_page("fresh"), content_type="text/html",
+                            headers={"Cache-Control": "max-age=3600"})
+
+    async def big(self, request):
+        self._record(request)
+        text = _page(request.match_info["name"] + " " + "x" * 2000)
+        return web.Response(text=text, content_type="text/html", headers={"Cache-Control": "max-age=3600"})
+
+
+def _run_with_upstream(tmp_path, monkeypatch, scenario, max_bytes=None):
+    """Run scenario(tools, base_url, upstream, cache) with a private cache and server"""
+    cache = CrawlCache(directory=str(tmp_path / "crawl_cache"), max_bytes=max_bytes)
+    monkeypatch.setattr(agent_tools, "crawl_cache", cache)
+    upstream = Upstream()
+
+    async def main():
+        server = TestServer(upstream.app())
+        await server.start_server()
+        try:
+            async with AgentToolsManager() as tools:
+                await scenario(tools, str(server.make_url("")).rstrip("/"), upstream, cache)
+        finally:
+            await server.close()
+
+    asyncio.run(main())
+
+
+def test_fresh_entry_is_served_without_a_request(tmp_path, monkeypatch):
+    async def scenario(tools, base_url, upstream, cache):
+        first = await tools.crawl_tool(f"{base_url}/fresh")
+        second = await tools.crawl_tool(f"{base_url}/fresh")
+        assert first["success"] and "cached" not in first
+        assert second["cached"] is True
+        assert second["title"] == first["title"] == "fresh"
+        assert upstream.requests == ["/fresh"]
+        assert cache.stats()["hits"] == 1
+
+    _run_with_upstream(tmp_path, monkeypatch, scenario)
+
+
+@pytest.mark.parametrize("path", ["/etag", "/last-modified"])
+def test_stale_entry_is_revalidated(tmp_path, monkeypatch, path):
+    async def scenario(tools, base_url, upstream, cache):
+        first = await tools.crawl_tool(f"{base_url}{path}")
+        second = await tools.crawl_tool(f"{base_url}{path}")
+        assert second["cached"] is True
+        assert second["content"] == first["content"]
+        assert upstream.requests == [path, path]
+        assert upstream.not_modified == 1
+        assert cache.stats()["revalidations"] == 1
+
+    _run_with_upstream(tmp_path, monkeypatch, scenario)
+
+
+def test_no_store_response_is_not_cached(tmp_path, monkeypatch):
+    async def scenario(tools, base_url, upstream, cache):
+        await tools.crawl_tool(f"{base_url}/no-store")
+        second = await tools.crawl_tool(f"{base_url}/no-store")
+        assert "cached" not in second
+        assert upstream.requests == ["/no-store", "/no-store"]
+        assert cache.stats()["entries"] == 0
+
+    _run_with_upstream(tmp_path, monkeypatch, scenario)
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes(tmp_path, monkeypatch):
+    async def scenario(tools, base_url, upstream, cache):
+        await tools.crawl_tool(f"{base_url}/big/a")
+        await tools.crawl_tool(f"{base_url}/big/b")
+        await tools.crawl_tool(f"{base_url}/big/a")  # a is now the most recently used
+        await tools.crawl_tool(f"{base_url}/big/c")  # over the limit: b goes
+        assert cache.stats()["bytes"] <= cache.max_bytes
+        assert (await tools.crawl_tool(f"{base_url}/big/a"))["cached"] is True
+        assert (await tools.crawl_tool(f"{base_url}/big/c"))["cached"] is True
+        assert "cached" not in await tools.crawl_tool(f"{base_url}/big/b")
+        assert upstream.requests.count("/big/b") == 2
+
+    # Room for two entries of ~4.3 KB each (the text is in both title and content), not three
+    _run_with_upstream(tmp_path, monkeypatch, scenario, max_bytes=9000)
+
+
+def test_concurrent_crawls_of_one_url_share_the_entry(tmp_path, monkeypatch):
+    async def scenario(tools, base_url, upstream, cache):
+        results = await asyncio.gather(*(tools.crawl_tool(f"{base_url}/fresh") for _ in range(10)))
+        assert all(result["success"] for result in results)
+        assert cache.stats()["entries"] == 1
+        assert not list((tmp_path / "crawl_cache").glob("*.tmp"))
+
+    _run_with_upstream(tmp_path, monkeypatch, scenario)
+
+
+def test_zero_max_bytes_disables_storage(tmp_path, monkeypatch):
+    async def scenario(tools, base_url, upstream, cache):
+        await tools.crawl_tool(f"{base_url}/fresh")
+        await tools.crawl_tool(f"{base_url}/fresh")
+        assert cache.max_bytes == 0
+        assert upstream.requests == ["/fresh", "/fresh"]
+
+    _run_with_upstream(tmp_path, monkeypatch, scenario, max_bytes=0)
@@ -0,0 +1,38 @@
+"""
+Tool intent routing: which handlers a message is offered to before it goes
+to the agent, and that weak secondary matches do not take messages over
+"""
+
+import pytest
+
+from intent_router import tool_router
+
+
+@pytest.mark.parametrize("message, expected", [
+    ("Проанализируй сайт https://example.com", ["web_analysis"]),
+    ("Найди лучшие практики FastAPI", ["web_search"]),
+    ("Выполни команду date", ["run_command"]),
+    ("Напиши код на python для парсинга CSV", ["create_file"]),
+    ("Покажи файл backend/server.py", ["view_file"]),
+    ("Привет! Как дела?", []),
+])
+def test_best_intent_is_offered_first(message, expected):
+    assert tool_router.candidates(message) == expected
+
+
+@pytest.mark.parametrize("message", [
+    # The best match (web_analysis) has no URL to analyse; a single "установи"
+    # or "поиск" must not turn a project request into a command or a search
+    "Создай сайт интернет-магазина и установи зависимости",
+    "Создай приложение: сайт-визитка, поиск по товарам",
+])
+def test_weak_secondary_matches_are_not_offered(message):
+    assert tool_router.route(message)[1:]
+    assert tool_router.candidates(message) == ["web_analysis"]
+
+
+def test_strong_secondary_matches_are_offered():
+    # web_analysis wins the tie on priority but has no URL; "найди" and "поиск" make the search strong
+    message = "Найди сайт: поиск лучших курсов, анализ отзывов"
+    assert tool_router.score(message) == {"web_analysis": 2, "web_search": 2}
+    assert tool_router.candidates(message) == ["web_analysis", "web_search"]
@@ -0,0 +1,78 @@
+"""
+Schema migrations: a fresh database migrated from the frozen baseline ends up
+with every table, column and index database.py declares, and instances
+starting together apply each version once
+"""
+
+import asyncio
+import uuid
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from database import DATABASE_URL, IS_SQLITE, Base
+from migrations import MIGRATIONS, run_migrations
+
+
+def _migrated_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    with engine.begin() as conn:
+        assert run_migrations(conn, Base.metadata) == [version for version, _, _ in MIGRATIONS]
+    return engine
+
+
+def test_migrations_create_the_declared_schema(tmp_path):
+    inspector = inspect(_migrated_engine(tmp_path))
+
+    assert set(inspector.get_table_names()) == set(Base.metadata.tables) | {"schema_version"}
+    for name, table in Base.metadata.tables.items():
+        assert {column["name"] for column in inspector.get_columns(name)} == set(table.columns.keys()), name
+        indexes = {index["name"] for index in inspector.get_indexes(name)}
+        assert {index.name for index in table.indexes} <= indexes, name
+
+
+def test_applied_migrations_are_not_run_again(tmp_path):
+    engine = _migrated_engine(tmp_path)
+    with engine.begin() as conn:
+        assert run_migrations(conn, Base.metadata) == []
+
+
+async def _migrate_concurrently(url: str, instances: int, connect_args: dict):
+    """Each instance migrates through its own engine, as separate processes would"""
+    engines = [create_async_engine(url, connect_args=connect_args) for _ in range(instances)]
+
+    async def migrate(engine):
+        async with engine.begin() as conn:
+            return await conn.run_sync(run_migrations, Base.metadata)
+
+    try:
+        applied = await asyncio.gather(*(migrate(engine) for engine in engines))
+        async with engines[0].connect() as conn:
+            recorded = (await conn.execute(text("SELECT version FROM schema_version ORDER BY version"))).scalars().all()
+    finally:
+        for engine in engines:
+            await engine.dispose()
+    return applied, recorded
+
+
+def test_concurrent_instances_apply_each_migration_once(tmp_path):
+    """Runs against the test database (a scratch schema on PostgreSQL)"""
+    versions = [version for version, _, _ in MIGRATIONS]
+
+    async def main():
+        if IS_SQLITE:
+            return await _migrate_concurrently(f"sqlite+aiosqlite:///{tmp_path / 'concurrent.db'}", 4, {})
+        schema = f"migrations_{uuid.uuid4().hex}"
+        admin = create_async_engine(DATABASE_URL)
+        async with admin.begin() as conn:
+            await conn.execute(text(f"CREATE SCHEMA {schema}"))
+        try:
+            return await _migrate_concurrently(DATABASE_URL, 4, {"server_settings": {"search_path": schema}})
+        finally:
+            async with admin.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+            await admin.dispose()
+
+    applied, recorded = asyncio.run(main())
+    assert sorted(applied) == [[]] * 3 + [versions]
+    assert recorded == versions
@@ -0,0 +1,167 @@
+"""
+web_search_tool caching with a stub upstream: single-flight coalescing,
+TTL expiry and failures that are never cached
+"""
+
+import asyncio
+
+import agent_tools
+import search_cache as search_cache_module
+from agent_tools import AgentToolsManager
+from search_cache import SearchCache
+
+
+class Clock:
+    """Stands in for the time module inside search_cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class StubUpstream:
+    """Counts fetches; each one waits on a gate so concurrent callers overlap"""
+
+    def __init__(self, results=None):
+        self.calls = 0
+        self.results = list(results or [])
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def fetch(self, query: str):
+        self.calls += 1
+        await self.gate.wait()
+        result = self.results.pop(0) if self.results else {"success": True, "results": [{"title": query}]}
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_concurrent_identical_queries_make_one_upstream_fetch():
+    async def main():
+        cache = SearchCache(ttl=60)
+        upstream = StubUpstream()
+        upstream.gate.clear()
+        waiters = [
+            asyncio.create_task(cache.get_or_fetch(query, "medium", lambda: upstream.fetch("python")))
+            for query in ["python"] * 8 + ["  Python ", "PYTHON"]
+        ]
+        await asyncio.sleep(0)
+        upstream.gate.set()
+        results = await asyncio.gather(*waiters)
+
+        assert upstream.calls == 1
+        assert all(result == results[0] for result in results)
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["coalesced"] == 9
+
+        # Served from the cache afterwards, and callers get their own copies
+        results[0]["results"] = []
+        again = await cache.get_or_fetch("python", "medium", lambda: upstream.fetch("python"))
+        assert upstream.calls == 1
+        assert again["results"] == [{"title": "python"}]
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(main())
+
+
+def test_context_size_is_part_of_the_key():
+    async def main():
+        cache = SearchCache(ttl=60)
+        upstream = StubUpstream()
+        await asyncio.gather(
+            cache.get_or_fetch("python", "medium", lambda: upstream.fetch("python")),
+            cache.get_or_fetch("python", "high", lambda: upstream.fetch("python"))
+        )
+        assert upstream.calls == 2
+
+    asyncio.run(main())
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(search_cache_module, "time", clock)
+
+    async def main():
+        cache = SearchCache(ttl=60)
+        upstream = StubUpstream()
+        fetch = lambda: upstream.fetch("python")  # noqa: E731
+
+        await cache.get_or_fetch("python", "medium", fetch)
+        clock.now += 59
+        await cache.get_or_fetch("python", "medium", fetch)
+        assert upstream.calls == 1
+
+        clock.now += 2
+        await cache.get_or_fetch("python", "medium", fetch)
+        assert upstream.calls == 2
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(main())
+
+
+def test_failures_are_not_cached():
+    async def main():
+        cache = SearchCache(ttl=60)
+        upstream = StubUpstream([
+            {"success": False, "error": "rate limited"},
+            RuntimeError("connection reset"),
+            {"success": True, "results": []}
+        ])
+        fetch = lambda: upstream.fetch("python")  # noqa: E731
+
+        assert (await cache.get_or_fetch("python", "medium", fetch))["success"] is False
+        try:
+            await cache.get_or_fetch("python", "medium", fetch)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("the upstream exception should reach the caller")
+        assert (await cache.get_or_fetch("python", "medium", fetch))["success"] is True
+        await cache.get_or_fetch("python", "medium", fetch)
+
+        assert upstream.calls == 3
+        assert cache.stats()["entries"] == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch():
+    async def main():
+        cache = SearchCache(ttl=60)
+        upstream = StubUpstream()
+        upstream.gate.clear()
+        fetch = lambda: upstream.fetch("python")  # noqa: E731
+        first = asyncio.create_task(cache.get_or_fetch("python", "medium", fetch))
+        second = asyncio.create_task(cache.get_or_fetch("python", "medium", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        upstream.gate.set()
+        assert (await second)["success"] is True
+        assert upstream.calls == 1
+
+    asyncio.run(main())
+
+
+def test_web_search_tool_goes_through_the_cache(monkeypatch):
+    cache = SearchCache(ttl=60)
+    monkeypatch.setattr(agent_tools, "search_cache", cache)
+    upstream = StubUpstream()
+
+    async def fetch(self, query):
+        return await upstream.fetch(query)
+
+    monkeypatch.setattr(AgentToolsManager, "_fetch_search_results", fetch)
+
+    async def main():
+        tools = AgentToolsManager()
+        results = await asyncio.gather(
+            tools.web_search_tool("FastAPI docs"), tools.web_search_tool("fastapi   docs")
+        )
+        assert upstream.calls == 1
+        # Each caller sees its own query echoed back
+        assert [result["query"] for result in results] == ["FastAPI docs", "fastapi   docs"]
+
+    asyncio.run(main())
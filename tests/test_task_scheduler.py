@@ -0,0 +1,170 @@
+"""
+AgentTaskScheduler with a stub executor: priority order, per-agent and global
+concurrency limits, dependencies, handoff chains and recovery after a restart
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from agents import AgentCollaborationManager
+from collaboration_store import CollaborationStore
+from models import AgentStatus, AgentType, TaskPriority
+from task_scheduler import AgentTaskScheduler
+
+
+class StubExecutor:
+    """Records the tasks it runs; runs block until the gate opens"""
+
+    def __init__(self, stop_after: Optional[AgentType] = AgentType.PROJECT_PLANNER):
+        self.stop_after = stop_after
+        self.started: List[str] = []
+        self.running: Dict[AgentType, int] = {}
+        self.peak: Dict[AgentType, int] = {}
+        self.peak_total = 0
+        self.gate = asyncio.Event()
+
+    def __call__(self):
+        # Used as the scheduler's executor_factory
+        return self
+
+    async def execute_agent_task(self, agent_type: AgentType, message: str, session_id: str, context: dict):
+        self.started.append(session_id)
+        self.running[agent_type] = self.running.get(agent_type, 0) + 1
+        self.peak[agent_type] = max(self.peak.get(agent_type, 0), self.running[agent_type])
+        self.peak_total = max(self.peak_total, sum(self.running.values()))
+        try:
+            await self.gate.wait()
+        finally:
+            self.running[agent_type] -= 1
+        return {"success": True, "response": f"{agent_type.value} done for {session_id}"}
+
+
+async def _until(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def _stop_handoffs(manager: AgentCollaborationManager):
+    """Keep each collaboration at its planner task"""
+    for collaboration in manager.active_collaborations.values():
+        collaboration.agent_tasks[0].handoff_to = None
+
+
+def test_higher_priority_tasks_run_first(run_with_database):
+    async def scenario():
+        manager = AgentCollaborationManager()
+        executor = StubExecutor()
+        executor.gate.set()
+        scheduler = AgentTaskScheduler(manager, executor_factory=executor, max_concurrent=4, agent_limit=1)
+        for session_id, priority in (("low", TaskPriority.LOW), ("medium", TaskPriority.MEDIUM),
+                                     ("urgent", TaskPriority.URGENT), ("high", TaskPriority.HIGH),
+                                     ("medium-later", TaskPriority.MEDIUM)):
+            collaboration = manager.create_collaboration("project-1", session_id, "build")
+            collaboration.agent_tasks[0].priority = priority
+        _stop_handoffs(manager)
+
+        await scheduler.start()
+        try:
+            await _until(lambda: scheduler.stats()["completed"] == 5)
+        finally:
+            await scheduler.stop()
+
+        # One planner at a time, most urgent first, equal priorities in arrival order
+        assert executor.started == ["urgent", "high", "medium", "medium-later", "low"]
+        assert executor.peak[AgentType.PROJECT_PLANNER] == 1
+
+    run_with_database(scenario)
+
+
+def test_per_agent_and_global_limits_are_respected(run_with_database):
+    async def scenario():
+        manager = AgentCollaborationManager()
+        executor = StubExecutor()
+        scheduler = AgentTaskScheduler(manager, executor_factory=executor, max_concurrent=3, agent_limit=1,
+                                       agent_limits={AgentType.PROJECT_PLANNER: 2})
+        for index in range(4):
+            manager.create_collaboration("project-1", f"planner-{index}", "build")
+        _stop_handoffs(manager)
+        for index in range(3):
+            # Design tasks with no dependencies, ready straight away
+            await manager.create_handoff_task(AgentType.PROJECT_PLANNER, AgentType.DESIGN_AGENT,
+                                              f"planner-{index}", "design", {})
+        for collaboration in manager.active_collaborations.values():
+            for task in collaboration.agent_tasks[1:]:
+                task.handoff_to = None
+
+        await scheduler.start()
+        try:
+            await _until(lambda: scheduler.stats()["running"] == 3)
+            stats = scheduler.stats()
+            assert stats["running_by_agent"] == {"project_planner": 2, "design_agent": 1}
+            assert stats["queue_depth"] == 4
+            assert stats["queue_depth_by_agent"] == {"project_planner": 2, "design_agent": 2}
+
+            executor.gate.set()
+            await _until(lambda: scheduler.stats()["completed"] == 7)
+        finally:
+            await scheduler.stop()
+
+        assert executor.peak[AgentType.PROJECT_PLANNER] == 2
+        assert executor.peak[AgentType.DESIGN_AGENT] == 1
+        assert executor.peak_total == 3
+        assert scheduler.stats()["queue_depth"] == 0
+
+    run_with_database(scenario)
+
+
+def test_completion_hands_off_to_the_next_agent(run_with_database):
+    async def scenario():
+        manager = AgentCollaborationManager()
+        executor = StubExecutor()
+        executor.gate.set()
+        scheduler = AgentTaskScheduler(manager, executor_factory=executor, max_concurrent=2, agent_limit=1)
+        collaboration = manager.create_collaboration("project-1", "session-1", "build")
+
+        await scheduler.start()
+        try:
+            # planner -> design agent -> ...; wait for the design task to run too
+            await _until(lambda: len(collaboration.agent_tasks) >= 3)
+        finally:
+            await scheduler.stop()
+
+        planner_task, design_task = collaboration.agent_tasks[:2]
+        assert planner_task.status == AgentStatus.COMPLETED
+        assert planner_task.metadata["result"]["response"] == "project_planner done for session-1"
+        assert design_task.agent_type == AgentType.DESIGN_AGENT
+        assert design_task.status == AgentStatus.COMPLETED
+
+    run_with_database(scenario)
+
+
+def test_recovery_requeues_tasks_left_running(run_with_database):
+    async def scenario():
+        # A previous process: one task was running and one was waiting when it stopped
+        store = CollaborationStore()
+        previous = AgentCollaborationManager(store=store)
+        running = previous.create_collaboration("project-1", "running", "build")
+        waiting = previous.create_collaboration("project-1", "waiting", "build")
+        await previous.update_task_status(running.agent_tasks[0].id, AgentStatus.WORKING)
+        await store.flush()
+
+        manager = AgentCollaborationManager(store=CollaborationStore())
+        executor = StubExecutor()
+        executor.gate.set()
+        scheduler = AgentTaskScheduler(manager, executor_factory=executor, max_concurrent=2, agent_limit=2)
+        await scheduler.start()
+        try:
+            await _until(lambda: scheduler.stats()["completed"] >= 2)
+        finally:
+            await scheduler.stop()
+
+        assert sorted(executor.started[:2]) == ["running", "waiting"]
+        for session_id, task_id in (("running", running.agent_tasks[0].id), ("waiting", waiting.agent_tasks[0].id)):
+            collaboration = await manager.get_collaboration(session_id)
+            task = next(task for task in collaboration.agent_tasks if task.id == task_id)
+            assert task.status == AgentStatus.COMPLETED
+
+    run_with_database(scenario)